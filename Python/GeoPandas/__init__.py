@@ -0,0 +1,51 @@
+""" GeoPandas recipes
+
+    Importing this package doesn't import any of the recipes (or geopandas,
+    shapely, or pyproj).  Each name below is loaded from its recipe the first
+    time it is used, eg
+
+        from GeoPandas import MValueStore """
+
+from _lazy_exports import lazy_exports
+
+# {name: recipe module}
+_EXPORTS = {
+    'load_m_values': 'lrs_in_geopandas',
+    'LRSDataset': 'lrs_dataset',
+    'MValueStore': 'm_value_store',
+    'build_event_geometry': 'route_events',
+    'write_event_geometry': 'route_events',
+    'scan_lrs': 'lrs_integrity',
+    'route_handling': 'lrs_integrity',
+    'load_route_handling': 'lrs_integrity',
+    'polygon_to_events': 'parallel_overlay',
+    'assign_districts': 'parallel_overlay',
+    'square_tiles': 'lrs_tiles',
+    'district_tiles': 'lrs_tiles',
+    'run_tiled': 'lrs_tiles',
+    'nearest_routes': 'lrs_tiles',
+    'locate_points': 'lrs_tiles',
+    'LRSIndex': 'measure_service',
+    'MeasureService': 'measure_service',
+    'parse_coordinates': 'parse_coordinates',
+    'event_points': 'parse_coordinates',
+    'diff_lrs': 'lrs_migration',
+    'migrate_events': 'lrs_migration',
+    'parse_rte_nm': 'route_catalog',
+    'build_route_catalog': 'route_catalog',
+    'save_route_catalog': 'route_catalog',
+    'load_route_catalog': 'route_catalog',
+    'route_ids': 'route_catalog',
+    'opposite_routes': 'route_catalog',
+    'route_gaps': 'along_route',
+    'nearest_along_route': 'along_route',
+    'to_opposite_route': 'along_route',
+    'route_extents': 'sliding_windows',
+    'make_windows': 'sliding_windows',
+    'sliding_windows': 'sliding_windows',
+    'top_windows': 'sliding_windows',
+    'CoarseLRS': 'coarse_lrs',
+    'select_nearby_routes': 'select_nearby_routes'
+}
+
+__getattr__, __dir__, __all__ = lazy_exports(__name__, __file__, _EXPORTS)
@@ -0,0 +1,188 @@
+#===============================================================================
+# Distance along the route between located features
+#===============================================================================
+# How do I find the distance along the route from each crash to the next one,
+# or to the closest signal?
+#
+# Once features have an RTE_NM and MP (from get_point_mp() or locate_points()
+# in lrs_tiles.py), the distance between two of them along the route is just
+# the difference of their MPs.  Checking every pair with nested loops, though,
+# takes hours for a few million features.
+#
+# The functions below sort the features by route and MP once with np.lexsort
+# and then work on whole arrays:
+#
+#   route_gaps() - The distance to the previous and next feature on the same
+#                  route, eg the spacing between signs
+#   nearest_along_route() - The k closest targets on the same route to each
+#                           feature, eg the closest signal to each crash
+#
+# Targets are found with np.searchsorted on a single int64 key made from the
+# route code and the MP in thousandths (see misc/fixed_measures.py), so only
+# the k targets on either side of each feature are checked.
+#
+# On divided routes, a target on the other side of the median is on the
+# opposite route and has that route's MPs.  to_opposite_route() moves targets
+# onto their opposite route (RTE_OPPOSITE_DIRECTION_RTE_NM) by finding their
+# location on the LRS and the MP of the closest point on the opposite route, so
+# nearest_along_route(..., opposite=...) can search both directions.
+#
+# Distances are in miles (the units of the MPs).
+#===============================================================================
+# Written for GeoPandas in Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import numpy as np
+import pandas as pd
+
+
+def _route_keys(routeCodes, mp):
+    """ Returns an int64 key that sorts by route code and then MP """
+    return (routeCodes.astype(np.int64) << 32) + np.rint(mp * 1000).astype(np.int64)
+
+
+def route_gaps(features, rte_nm='RTE_NM', mp='MP'):
+    """ Returns a DataFrame with the same index as features and the columns
+        PREV_INDEX, PREV_DISTANCE, NEXT_INDEX, and NEXT_DISTANCE: the index of
+        the previous and next feature on the same route and the distance to
+        them.  The first and last feature on each route have NaN. """
+    located = features[rte_nm].notna() & features[mp].notna()
+    routes = features.loc[located, rte_nm].to_numpy()
+    measures = features.loc[located, mp].to_numpy(dtype=float)
+    labels = features.index[located].to_numpy()
+
+    routeCodes = pd.factorize(routes)[0]
+    order = np.lexsort([measures, routeCodes])
+    routeCodes, measures, labels = routeCodes[order], measures[order], labels[order]
+
+    sameRoute = routeCodes[1:] == routeCodes[:-1]
+    gaps = np.diff(measures)
+
+    prevDistance = np.r_[np.nan, np.where(sameRoute, gaps, np.nan)]
+    nextDistance = np.r_[np.where(sameRoute, gaps, np.nan), np.nan]
+    prevIndex = pd.Series(np.r_[None, labels[:-1]], dtype=object).where(np.r_[False, sameRoute])
+    nextIndex = pd.Series(np.r_[labels[1:], None], dtype=object).where(np.r_[sameRoute, False])
+
+    output = pd.DataFrame({
+        'PREV_INDEX': prevIndex.to_numpy(),
+        'PREV_DISTANCE': prevDistance,
+        'NEXT_INDEX': nextIndex.to_numpy(),
+        'NEXT_DISTANCE': nextDistance
+    }, index=labels)
+    return output.reindex(features.index)
+
+
+def nearest_along_route(features, targets, k=1, rte_nm='RTE_NM', mp='MP', max_distance=None, opposite=None, store=None):
+    """ Finds the k closest targets along the route to each feature
+
+        features, targets = DataFrames with RTE_NM and MP columns
+        k = Number of targets to find for each feature
+        max_distance = Targets farther than this (in miles) are skipped
+        opposite = Optional dictionary or Series of {RTE_NM: opposite RTE_NM}.
+                   Targets on the opposite route are also searched (see
+                   to_opposite_route()).  Requires store.
+        store = MValueStore (see m_value_store.py) used to move targets to the
+                opposite route
+
+        Returns a DataFrame with one row for each feature and target found:
+        FEATURE_INDEX, TARGET_INDEX, RANK (1 = closest), DISTANCE (negative if
+        the target is at a lower MP than the feature), and OPPOSITE (True if
+        the target is on the opposite route).
+    """
+    targets = targets.loc[targets[rte_nm].notna() & targets[mp].notna(), [rte_nm, mp]].assign(OPPOSITE=False)
+    if opposite is not None:
+        moved = to_opposite_route(targets, opposite, store, rte_nm, mp)
+        targets = pd.concat([targets, moved.loc[moved[mp].notna()].assign(OPPOSITE=True)])
+
+    features = features.loc[features[rte_nm].notna() & features[mp].notna(), [rte_nm, mp]]
+
+    # Route codes shared by features and targets
+    codes, _ = pd.factorize(np.concatenate([features[rte_nm].to_numpy(), targets[rte_nm].to_numpy()]))
+    featureCodes, targetCodes = codes[:len(features)], codes[len(features):]
+
+    featureMP = features[mp].to_numpy(dtype=float)
+    targetMP = targets[mp].to_numpy(dtype=float)
+    targetKeys = _route_keys(targetCodes, targetMP)
+    order = np.argsort(targetKeys, kind='stable')
+    targetKeys, targetCodes, targetMP = targetKeys[order], targetCodes[order], targetMP[order]
+
+    # The k targets on either side of each feature are the only candidates
+    position = np.searchsorted(targetKeys, _route_keys(featureCodes, featureMP))
+    candidates = position[:, None] + np.arange(-k, k)[None, :]
+    valid = (candidates >= 0) & (candidates < len(targetKeys))
+    candidates = np.clip(candidates, 0, max(len(targetKeys) - 1, 0))
+
+    if len(targetKeys):
+        valid &= targetCodes[candidates] == featureCodes[:, None]
+        distance = targetMP[candidates] - featureMP[:, None]
+    else:
+        distance = np.zeros(candidates.shape)
+    if max_distance is not None:
+        valid &= np.abs(distance) <= max_distance
+
+    # Sort each row's candidates by distance and keep the closest k
+    absDistance = np.where(valid, np.abs(distance), np.inf)
+    rank = np.argsort(absDistance, axis=1, kind='stable')[:, :k]
+    rows = np.arange(len(features))[:, None]
+    keep = valid[rows, rank]
+
+    featureRow = np.broadcast_to(rows, rank.shape)[keep]
+    targetRow = order[candidates[rows, rank][keep]]
+    return pd.DataFrame({
+        'FEATURE_INDEX': features.index.to_numpy()[featureRow],
+        'TARGET_INDEX': targets.index.to_numpy()[targetRow],
+        'RANK': np.broadcast_to(np.arange(1, k + 1), rank.shape)[keep],
+        'DISTANCE': distance[rows, rank][keep],
+        'OPPOSITE': targets['OPPOSITE'].to_numpy()[targetRow]
+    })
+
+
+def to_opposite_route(located, opposite, store, rte_nm='RTE_NM', mp='MP'):
+    """ Returns a copy of located with RTE_NM replaced by the opposite route
+        and MP replaced by the MP of the closest point on the opposite route.
+        Rows without an opposite route, or that aren't on the LRS, have NaN.
+
+        located = DataFrame with RTE_NM and MP columns
+        opposite = Dictionary or Series of {RTE_NM: opposite RTE_NM}
+        store = MValueStore with both routes
+    """
+    output = located.copy()
+    output[rte_nm] = located[rte_nm].map(opposite)
+    output[mp] = np.nan
+
+    for (route, oppositeRoute), rows in located.groupby([located[rte_nm], output[rte_nm]]):
+        if route not in store or oppositeRoute not in store:
+            continue
+        x, y = store.point_at_measure(route, rows[mp].to_numpy(dtype=float))
+        found = ~np.isnan(x)
+        if found.any():
+            m, _ = store.measure_at_point(oppositeRoute, x[found], y[found])
+            output.loc[rows.index[found], mp] = np.round(m, 3)
+    return output
+
+
+
+#===============================================================================
+# Example - Find the distance from each crash to the next crash on the route,
+# and the closest signal to each crash in either direction
+#===============================================================================
+
+if __name__ == '__main__':
+    from m_value_store import MValueStore
+
+    crashes = pd.read_csv(r'.\data\crashes.csv')
+    signals = pd.read_csv(r'.\data\signals.csv')
+
+    crashes = crashes.join(route_gaps(crashes))
+    print(crashes[['RTE_NM', 'MP', 'NEXT_DISTANCE']].head())
+
+    lrsPath = r'.\data\LRS\LRS_Full.shp'
+    store = MValueStore.from_shapefile(lrsPath)
+
+    import shapefile
+    with shapefile.Reader(lrsPath) as sf:
+        opposite = {rte_nm: opp for rte_nm, opp in sf.iterRecords(fields=['RTE_NM', 'RTE_OPPOSI']) if opp}
+
+    nearest = nearest_along_route(crashes, signals, k=1, max_distance=0.5, opposite=opposite, store=store)
+    crashes = crashes.join(nearest.set_index('FEATURE_INDEX')[['TARGET_INDEX', 'DISTANCE', 'OPPOSITE']])
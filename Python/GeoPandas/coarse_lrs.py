@@ -0,0 +1,199 @@
+#===============================================================================
+# Multi-resolution LRS
+#===============================================================================
+# How do I find the routes near a lot of points or lines without measuring the
+# distance to every vertex of every route?
+#
+# select_nearby_routes.py and the route matching recipes compare each feature
+# to the full route geometry.  A spatial index only narrows that down to the
+# routes whose bounding box is close, and a long or curvy route has a large
+# bounding box and thousands of vertices, so most of the time is spent
+# measuring distances to routes that are nowhere near the feature.
+#
+# CoarseLRS keeps two versions of each route:
+#
+#   full - The route geometry from the LRS
+#   coarse - The route simplified with shapely.simplify (Douglas-Peucker), which
+#            usually has a small fraction of the vertices
+#
+# and the DEVIATION of each route: how far any part of the full route can be
+# from the coarse route.  Douglas-Peucker only drops a vertex when it is within
+# the tolerance of the coarse segment that replaces it, so every full segment
+# is within the tolerance of the coarse route.  The vertices alone are not
+# enough: on a route that loops back on itself a vertex can be close to a
+# different part of the coarse route while the full segment between two
+# vertices passes farther away.  So the DEVIATION is the larger of the
+# tolerance and the largest vertex distance.
+#
+# If a point is within distance of the full route, it has to be within
+# distance + DEVIATION of the coarse route.  So a search is done in two steps:
+#
+#   1. Find candidate routes with the spatial index and the coarse routes,
+#      using distance + DEVIATION.  These distances are cheap.
+#   2. Check only the candidates against the full routes with the real
+#      distance.
+#
+# No route can be missed in step 1, and step 2 uses the full geometry, so the
+# results are the same as searching the full LRS.  Distances are checked with
+# shapely.dwithin, which is exact, where select_nearby_routes() intersects a
+# buffer polygon that only approximates the circle.
+#
+# The coarse routes and their deviations can be saved with save() and loaded
+# with from_file() so that the LRS is only simplified once per version.
+#===============================================================================
+# Written for GeoPandas in Python 3.8 (shapely 2.0 or newer)
+# By Dan Fourquet
+#===============================================================================
+
+import numpy as np
+import pandas as pd
+import shapely
+
+
+def _deviation(full, coarse):
+    """ Returns the largest distance from a vertex of each full geometry to its
+        coarse geometry """
+    coords, index = shapely.get_coordinates(full, return_index=True)
+    distances = shapely.distance(shapely.points(coords), coarse[index])
+    deviation = np.zeros(len(full))
+    np.maximum.at(deviation, index, distances)
+    return deviation
+
+
+class CoarseLRS:
+    """ The LRS at full and simplified resolution
+
+        names = Array of RTE_NMs
+        full = Array of the full shapely route geometries
+        coarse = Array of the simplified route geometries
+        deviation = Array of the largest distance from each full route to its
+                    coarse route
+    """
+    def __init__(self, names, full, coarse, deviation):
+        self.names = np.asarray(names, dtype=object)
+        self.full = np.asarray(full)
+        self.coarse = np.asarray(coarse)
+        self.deviation = np.asarray(deviation, dtype=np.float64)
+        self.tree = shapely.STRtree(self.coarse)
+
+    @classmethod
+    def from_lrs(cls, lrs, tolerance=25, rte_nm='RTE_NM'):
+        """ Simplifies each route in lrs
+
+            lrs = GeoDataFrame of the LRS in a projected coordinate system (eg
+                  LRSDataset(lrsPath, crs=3968).gdf, see lrs_dataset.py)
+            tolerance = Simplification tolerance in the units of the LRS.
+                        Larger values give fewer coarse vertices but more
+                        candidates to check.
+        """
+        lrs = lrs.loc[lrs.geometry.notna() & ~lrs.geometry.is_empty]
+        full = np.asarray(lrs.geometry.values)
+        coarse = shapely.simplify(full, tolerance, preserve_topology=False)
+
+        # Small loops can collapse to nothing.  Those routes keep their full
+        # geometry.
+        collapsed = shapely.is_empty(coarse) | ~shapely.is_valid(coarse) | shapely.is_missing(coarse)
+        coarse[collapsed] = full[collapsed]
+
+        deviation = np.maximum(_deviation(full, coarse), tolerance)
+        deviation[collapsed] = 0
+        return cls(lrs[rte_nm].to_numpy(), full, coarse, deviation)
+
+    @classmethod
+    def from_file(cls, path, lrs, rte_nm='RTE_NM'):
+        """ Loads coarse routes saved with save().  The full routes are taken
+            from lrs, which must be the same LRS version and coordinate system
+            that the file was made from.  A route can have several features,
+            so the features are matched by RTE_NM and their order within the
+            route. """
+        import geopandas as gp
+        saved = gp.read_parquet(path)
+        lrs = lrs.loc[lrs.geometry.notna() & ~lrs.geometry.is_empty]
+        full = pd.Series(np.asarray(lrs.geometry.values), index=pd.MultiIndex.from_arrays([lrs[rte_nm].to_numpy(), lrs.groupby(rte_nm).cumcount().to_numpy()]))
+        key = pd.MultiIndex.from_arrays([saved['RTE_NM'].to_numpy(), saved.groupby('RTE_NM').cumcount().to_numpy()])
+        found = key.isin(full.index)
+        saved = saved.loc[found]
+        return cls(saved['RTE_NM'].to_numpy(), full.loc[key[found]].to_numpy(), np.asarray(saved.geometry.values), saved['DEVIATION'].to_numpy())
+
+    def save(self, path, crs=None):
+        """ Saves the coarse routes and their deviations to GeoParquet """
+        import geopandas as gp
+        gp.GeoDataFrame({'RTE_NM': self.names, 'DEVIATION': self.deviation}, geometry=self.coarse, crs=crs).to_parquet(path)
+
+    @property
+    def vertex_counts(self):
+        """ (full, coarse) number of vertices """
+        return int(shapely.get_num_coordinates(self.full).sum()), int(shapely.get_num_coordinates(self.coarse).sum())
+
+    def candidates(self, geometries, distance):
+        """ Returns (geometry index, route index) arrays of the routes that may
+            be within distance of each geometry, found with the coarse routes
+            only """
+        geometries = np.asarray(geometries)
+        if not len(self.names) or not len(geometries):
+            empty = np.array([], dtype=np.intp)
+            return empty, empty
+        geometryHit, routeHit = self.tree.query(geometries, predicate='dwithin', distance=distance + self.deviation.max())
+        keep = shapely.dwithin(geometries[geometryHit], self.coarse[routeHit], distance + self.deviation[routeHit])
+        return geometryHit[keep], routeHit[keep]
+
+    def nearby_routes(self, points, distance):
+        """ Returns a list with the RTE_NMs within distance of each point (or
+            any other geometry) """
+        points = np.asarray(points)
+        pointHit, routeHit = self.candidates(points, distance)
+        exact = shapely.dwithin(points[pointHit], self.full[routeHit], distance)
+        output = [[] for _ in range(len(points))]
+        for p, r in zip(pointHit[exact], routeHit[exact]):
+            output[p].append(self.names[r])
+        return output
+
+    def select_nearby_routes(self, point, distance):
+        """ Returns a list of RTE_NMs within the given distance of the input
+            point, like select_nearby_routes() in select_nearby_routes.py """
+        return self.nearby_routes([point], distance)[0]
+
+    def match_lines(self, lines, distance):
+        """ Returns a list with the RTE_NMs that each line could be on: routes
+            within distance of the line's first point, middle, and last point """
+        lines = np.asarray(lines)
+        lineHit, routeHit = self.candidates(lines, distance)
+
+        ends = [shapely.get_point(lines, 0), shapely.line_interpolate_point(lines, 0.5, normalized=True), shapely.get_point(lines, -1)]
+        exact = np.ones(len(lineHit), dtype=bool)
+        for points in ends:
+            exact &= shapely.dwithin(points[lineHit], self.full[routeHit], distance)
+
+        output = [[] for _ in range(len(lines))]
+        for l, r in zip(lineHit[exact], routeHit[exact]):
+            output[l].append(self.names[r])
+        return output
+
+    def summary(self):
+        """ Returns a DataFrame with the full and coarse vertex count and the
+            deviation of each route """
+        return pd.DataFrame({
+            'RTE_NM': self.names,
+            'FULL_VERTICES': shapely.get_num_coordinates(self.full),
+            'COARSE_VERTICES': shapely.get_num_coordinates(self.coarse),
+            'DEVIATION': self.deviation
+        })
+
+
+
+#===============================================================================
+# Example - Simplify the LRS once, then find the routes within 50 meters of
+# each crash
+#===============================================================================
+
+if __name__ == '__main__':
+    import geopandas as gp
+    from lrs_dataset import LRSDataset
+
+    lrs = LRSDataset(r'.\data\LRS\LRS_Full.shp', crs=3968).gdf
+    coarseLRS = CoarseLRS.from_lrs(lrs, tolerance=25)
+    coarseLRS.save(r'.\data\LRS\LRS_coarse.parquet', crs=3968)
+    print(coarseLRS.vertex_counts)
+
+    crashes = gp.read_file(r'.\data\crashes.shp').to_crs(3968)
+    crashes['ROUTES'] = coarseLRS.nearby_routes(crashes.geometry.values, distance=50)
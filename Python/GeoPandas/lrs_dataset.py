@@ -0,0 +1,174 @@
+#===============================================================================
+# Lazy LRS dataset
+#===============================================================================
+# How do I load only the part of the LRS that I need?
+#
+# lrs_in_geopandas.py loads the whole LRS with gp.read_file(lrsPath), which
+# reads every attribute column and every route in the state, even when a
+# script only needs RTE_NM and the geometry for one district.
+#
+# The LRSDataset below describes which part of the LRS to read, and nothing is
+# read until it is used:
+#
+#   columns = Only these attribute columns are read.  Defaults to RTE_NM.
+#   rte_prefix = Only read routes whose RTE_NM starts with this prefix (eg
+#                'R-VA' or a list of prefixes).  This is sent to GDAL as a
+#                where clause, so the other routes are never loaded.
+#   where = Any other SQL where clause
+#   bbox = (minx, miny, maxx, maxy) in the LRS's coordinate system
+#   mask = A polygon (or GeoDataFrame, such as a district boundary).  Only
+#          routes that intersect the mask are read.
+#
+# lrs.attributes reads only the attribute columns, without any geometry.  The
+# geometry is read the first time lrs.gdf is used, and both are kept so they
+# are only read once.  lrs.m_values() builds the m-value dictionary from
+# lrs_in_geopandas.py, but only for the routes that pass the filters.
+#
+# Reading a region this way takes time and memory in proportion to the size of
+# the region rather than the size of the state.
+#===============================================================================
+# Written for GeoPandas in Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import shapefile
+
+
+class LRSDataset:
+    """ A filtered view of an LRS file that is read on first use
+
+        lrsPath = Path to the LRS.  Must be a shapefile to use m_values()
+        columns = List of attribute columns to read
+        rte_prefix = RTE_NM prefix, or list of prefixes, to keep
+        where = SQL where clause
+        bbox = (minx, miny, maxx, maxy) in the LRS's coordinate system
+        mask = Shapely polygon or GeoDataFrame.  Only routes that intersect the
+               mask are read
+        crs = Optional coordinate system to project the geometry to (eg 3968)
+    """
+    def __init__(self, lrsPath, columns=('RTE_NM',), rte_prefix=None, where=None, bbox=None, mask=None, crs=None):
+        self.lrsPath = lrsPath
+        self.columns = list(columns)
+        if 'RTE_NM' not in self.columns:
+            self.columns.insert(0, 'RTE_NM')
+        self.rte_prefix = [rte_prefix] if isinstance(rte_prefix, str) else rte_prefix
+        self.where = where
+        self.bbox = bbox
+        self.mask = mask
+        self.crs = crs
+
+        self._attributes = None
+        self._gdf = None
+
+    def filter(self, **kwargs):
+        """ Returns a new LRSDataset with some of the settings changed, eg
+            lrs.filter(rte_prefix='S-VA') """
+        settings = dict(columns=self.columns, rte_prefix=self.rte_prefix, where=self.where, bbox=self.bbox, mask=self.mask, crs=self.crs)
+        settings.update(kwargs)
+        return LRSDataset(self.lrsPath, **settings)
+
+    def _where_clause(self):
+        """ Combines rte_prefix and where into one SQL where clause """
+        clauses = []
+        if self.rte_prefix:
+            prefixes = [prefix.replace("'", "''") for prefix in self.rte_prefix]
+            clauses.append('(' + ' OR '.join(f"RTE_NM LIKE '{prefix}%'" for prefix in prefixes) + ')')
+        if self.where:
+            clauses.append(f'({self.where})')
+        return ' AND '.join(clauses) or None
+
+    def _read(self, ignore_geometry):
+        kwargs = {'columns': self.columns, 'where': self._where_clause()}
+        if self.bbox is not None:
+            kwargs['bbox'] = tuple(self.bbox)
+        if self.mask is not None:
+            kwargs['mask'] = self.mask
+
+        # The mask is applied to the geometry, so it has to be read even if only
+        # the attributes are needed
+        if ignore_geometry and self.mask is None:
+            kwargs['ignore_geometry'] = True
+        import geopandas as gp
+        return gp.read_file(self.lrsPath, **{key: value for key, value in kwargs.items() if value is not None})
+
+    @property
+    def attributes(self):
+        """ A DataFrame of the attribute columns (no geometry) """
+        if self._attributes is None:
+            if self._gdf is not None:
+                self._attributes = self._gdf.drop(columns=self._gdf.geometry.name)
+            else:
+                df = self._read(ignore_geometry=True)
+                if 'geometry' in df:
+                    df = df.drop(columns='geometry')
+                self._attributes = df
+        return self._attributes
+
+    @property
+    def gdf(self):
+        """ A GeoDataFrame of the attribute columns and geometry """
+        if self._gdf is None:
+            gdf = self._read(ignore_geometry=False)
+            if self.crs is not None:
+                gdf = gdf.to_crs(self.crs)
+            self._gdf = gdf
+        return self._gdf
+
+    @property
+    def geometry(self):
+        return self.gdf.geometry
+
+    @property
+    def route_names(self):
+        """ A set of the RTE_NMs that pass the filters """
+        return set(self.attributes['RTE_NM'])
+
+    def __len__(self):
+        return len(self.attributes)
+
+    def m_values(self):
+        """ Returns an m-value dictionary (see lrs_in_geopandas.py) for the
+            routes that pass the filters.  Only the RTE_NM field is read from
+            the dbf, and records outside of the bbox or mask are skipped. """
+        routes = self.route_names
+
+        bbox = self.bbox
+        if bbox is None and hasattr(self.mask, 'total_bounds'):
+            # read_file() projects a GeoDataFrame mask to the LRS's coordinate
+            # system, so do the same here
+            import geopandas as gp
+            lrsCRS = gp.read_file(self.lrsPath, rows=0).crs
+            bbox = self.mask.to_crs(lrsCRS).total_bounds if self.mask.crs and lrsCRS else self.mask.total_bounds
+        elif bbox is None and self.mask is not None:
+            bbox = self.mask.bounds
+
+        mValueDict = {}
+        with shapefile.Reader(self.lrsPath) as shp:
+            shapeRecords = shp.iterShapeRecords(fields=['RTE_NM'], bbox=list(bbox) if bbox is not None else None)
+            for row in shapeRecords:
+                rte_nm = row.record['RTE_NM']
+                if rte_nm in routes:
+                    mValueDict[rte_nm] = row.shape.m
+        return mValueDict
+
+    def __repr__(self):
+        return f'LRSDataset({self.lrsPath!r}, columns={self.columns}, where={self._where_clause()!r}, bbox={self.bbox})'
+
+
+
+#===============================================================================
+# Example - Load the interstate and primary routes in one district
+#===============================================================================
+
+if __name__ == '__main__':
+    import geopandas as gp
+
+    lrsPath = r'.\data\LRS\LRS_Full.shp'
+    districts = gp.read_file(r'.\data\Districts.shp')
+    district = districts.loc[districts['DISTRICT'] == 'Culpeper']
+
+    lrs = LRSDataset(lrsPath, columns=['RTE_NM', 'RTE_OPPOSITE_DIRECTION_RTE_NM'], rte_prefix='R-VA', mask=district, crs=3968)
+
+    print(len(lrs))          # Only the attributes are read
+    print(lrs.gdf.head())    # The geometry is read here
+    mValueDict = lrs.m_values()
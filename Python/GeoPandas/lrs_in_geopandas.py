@@ -14,12 +14,13 @@
 # a list.  The index of the m-values in the list correspond to the index of the
 # vertices in the polyline for that route (eg mValueDict['R-VA   IS00095NB'][-1]
 # will return the m-value for the last point on I-95).
+#
+# To load only some of the routes or columns, see lrs_dataset.py.
 #===============================================================================
 # Written for GeoPandas in Python 3.7
 # By Dan Fourquet
 #===============================================================================
 
-import geopandas as gp
 import shapefile
 
 # LRS - This must be a shapefile in order to bring in m-values
@@ -49,11 +50,13 @@ def load_m_values(lrsPath):
 
     return mValueDict
 
-# Create LRS GeoDataFrame
-lrs = gp.read_file(lrsPath)
-lrs = lrs.to_crs(epsg=3968) # If projection to Virginia Lambert is needed
 
-# Create m-value dictionary
-mValueDict = load_m_values(lrsPath)
+if __name__ == '__main__':
+    import geopandas as gp
 
+    # Create LRS GeoDataFrame
+    lrs = gp.read_file(lrsPath)
+    lrs = lrs.to_crs(epsg=3968) # If projection to Virginia Lambert is needed
 
+    # Create m-value dictionary
+    mValueDict = load_m_values(lrsPath)
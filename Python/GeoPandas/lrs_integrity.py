@@ -0,0 +1,198 @@
+#===============================================================================
+# LRS m-value integrity scan
+#===============================================================================
+# How do I find the routes in the LRS where the measure functions might return
+# the wrong MP?
+#
+# get_point_mp() and get_line_mp() assume that the m-values of a route increase
+# from the beginning to the end of the route.  When they don't, measureOnLine()
+# and positionAlongLine() still return a value, it's just the wrong one.  The
+# problems that cause this are:
+#
+#   NON_MONOTONIC - The m-value decreases from one vertex to the next
+#   MISSING_M - A vertex has no m-value
+#   ZERO_LENGTH_PART - A part has no length or no change in m-value
+#   PART_OVERLAP - Two parts of a multipart route cover some of the same
+#                  measures, so a measure can be in two places
+#   PARTS_OUT_OF_ORDER - The parts aren't stored in order of their m-values
+#   CALIBRATION_JUMP - The change in m-value between two vertices is much
+#                      larger or smaller than the distance between them
+#   M_GAP - There is a gap in measures between two parts.  This is normal for
+#           multipart routes, but the closest part has to be used when
+#           locating measures.
+#
+# scan_lrs() checks every vertex in an MValueStore (see m_value_store.py) at
+# once with NumPy, so the whole state can be checked in a few seconds.  It
+# returns a DataFrame with one row per issue.  route_handling() turns the
+# issues into a dictionary of {rte_nm: handling} that the measure functions
+# can use to decide how to treat each route:
+#
+#   'simple' - No issues
+#   'closest_part' - Locate measures on the closest part of the route
+#   'unsafe' - Measures on this route can't be trusted
+#===============================================================================
+# Written for GeoPandas in Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import numpy as np
+import pandas as pd
+
+UNSAFE_ISSUES = ('NON_MONOTONIC', 'MISSING_M', 'PART_OVERLAP')
+CLOSEST_PART_ISSUES = ('M_GAP', 'PARTS_OUT_OF_ORDER', 'ZERO_LENGTH_PART')
+
+
+def _issues(issue, rte_nm, part, vertex, mFrom, mTo):
+    return pd.DataFrame({
+        'RTE_NM': rte_nm,
+        'ISSUE': issue,
+        'PART': part,
+        'VERTEX': vertex,
+        'M_FROM': mFrom,
+        'M_TO': mTo
+    })
+
+
+def scan_lrs(store, jump_ratio=5.0, min_jump=0.01, gap_tolerance=0.0005):
+    """ Returns a DataFrame of m-value issues in the LRS
+
+        store = MValueStore with the LRS
+        jump_ratio = A segment is a CALIBRATION_JUMP if its change in m-value
+                     per unit of length is more than jump_ratio times (or less
+                     than 1 / jump_ratio times) the rate of the whole route
+        min_jump = Segments with a change in m-value smaller than this are not
+                   checked for calibration jumps
+        gap_tolerance = Gaps between parts smaller than this are ignored
+
+        PART is the part number within the route and VERTEX is the vertex
+        number within the route.
+    """
+    columns = ['RTE_NM', 'ISSUE', 'PART', 'VERTEX', 'M_FROM', 'M_TO']
+    if not len(store.m):
+        return pd.DataFrame(columns=columns)
+
+    # Route number, part number, and vertex number of each vertex
+    names = np.array(list(store.routes), dtype=object)
+    ranges = np.array(list(store.routes.values()))
+    routeCode = np.repeat(np.arange(len(names)), ranges[:, 1] - ranges[:, 0])
+    routeVertex = np.arange(len(store.m)) - ranges[routeCode, 0]
+    partId = np.cumsum(store.partStart) - 1
+    partStarts = np.flatnonzero(store.partStart)
+    firstPart = np.searchsorted(partStarts, ranges[:, 0])
+    routePart = partId - firstPart[routeCode]
+
+    x, y, m = store.x, store.y, store.m
+    issues = []
+
+    missing = np.isnan(m)
+    if missing.any():
+        issues.append(_issues('MISSING_M', names[routeCode[missing]], routePart[missing], routeVertex[missing], m[missing], m[missing]))
+
+    # Segments within a part
+    seg = np.arange(len(m) - 1)
+    seg = seg[~store.partStart[seg + 1]]
+    dm = m[seg + 1] - m[seg]
+    length = np.hypot(x[seg + 1] - x[seg], y[seg + 1] - y[seg])
+
+    bad = dm < 0
+    if bad.any():
+        s = seg[bad]
+        issues.append(_issues('NON_MONOTONIC', names[routeCode[s]], routePart[s], routeVertex[s], m[s], m[s + 1]))
+
+    # Calibration jumps compare each segment's m-value rate to its route's
+    # overall rate
+    segRoute = routeCode[seg]
+    routeDm = np.bincount(segRoute, weights=np.nan_to_num(np.abs(dm)), minlength=len(names))
+    routeLength = np.bincount(segRoute, weights=length, minlength=len(names))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        routeRate = routeDm / routeLength
+        ratio = (np.abs(dm) / length) / routeRate[segRoute]
+    jump = (np.abs(dm) >= min_jump) & ((ratio > jump_ratio) | (ratio < 1 / jump_ratio) | (length == 0))
+    if jump.any():
+        s = seg[jump]
+        issues.append(_issues('CALIBRATION_JUMP', names[routeCode[s]], routePart[s], routeVertex[s], m[s], m[s + 1]))
+
+    # Part ranges
+    partRoute = routeCode[partStarts]
+    partMin = np.fmin.reduceat(m, partStarts)
+    partMax = np.fmax.reduceat(m, partStarts)
+    partFirstM = m[partStarts]
+    partLength = np.bincount(partId[seg], weights=length, minlength=len(partStarts))
+    partNumber = routePart[partStarts]
+    partVertex = routeVertex[partStarts]
+
+    zero = (partLength == 0) | (partMax - partMin == 0)
+    if zero.any():
+        issues.append(_issues('ZERO_LENGTH_PART', names[partRoute[zero]], partNumber[zero], partVertex[zero], partMin[zero], partMax[zero]))
+
+    # Compare each part to the part stored before it on the same route
+    samePrev = np.r_[False, partRoute[1:] == partRoute[:-1]]
+    prev = np.flatnonzero(samePrev) - 1
+    cur = prev + 1
+    outOfOrder = partFirstM[cur] < partMax[prev]
+    gap = partMin[cur] - partMax[prev] > gap_tolerance
+    for issue, mask in (('PARTS_OUT_OF_ORDER', outOfOrder), ('M_GAP', gap)):
+        if mask.any():
+            c, p = cur[mask], prev[mask]
+            issues.append(_issues(issue, names[partRoute[c]], partNumber[c], partVertex[c], partMax[p], partMin[c]))
+
+    # Overlaps are checked with the parts sorted by their first m-value, so
+    # parts that are stored out of order are still compared correctly.  The
+    # running maximum is offset by route so that it restarts on each route.
+    order = np.lexsort((partMin, partRoute))
+    sortedRoute = partRoute[order]
+    span = np.nanmax(partMax) - np.nanmin(partMin) + 1
+    offset = sortedRoute * span
+    runningMax = np.maximum.accumulate(np.nan_to_num(partMax[order], nan=-np.inf) + offset) - offset
+    overlap = np.r_[False, (sortedRoute[1:] == sortedRoute[:-1]) & (partMin[order][1:] < runningMax[:-1] - gap_tolerance)]
+    if overlap.any():
+        c = order[overlap]
+        issues.append(_issues('PART_OVERLAP', names[partRoute[c]], partNumber[c], partVertex[c], partMin[c], runningMax[np.flatnonzero(overlap) - 1]))
+
+    if not issues:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(issues, ignore_index=True).sort_values(['RTE_NM', 'VERTEX'], kind='stable').reset_index(drop=True)
+
+
+def route_handling(issues):
+    """ Returns a dictionary of {rte_nm: handling} for every route with an
+        issue.  Routes that aren't in the dictionary can be handled normally
+        ('simple'). """
+    handling = {}
+    for rte_nm, routeIssues in issues.groupby('RTE_NM')['ISSUE']:
+        routeIssues = set(routeIssues)
+        if routeIssues & set(UNSAFE_ISSUES):
+            handling[rte_nm] = 'unsafe'
+        elif routeIssues & set(CLOSEST_PART_ISSUES):
+            handling[rte_nm] = 'closest_part'
+        else:
+            handling[rte_nm] = 'simple'
+    return handling
+
+
+def load_route_handling(reportPath):
+    """ Reads a report saved from scan_lrs() (.csv or .parquet) and returns the
+        route_handling() dictionary """
+    if reportPath.lower().endswith('.parquet'):
+        issues = pd.read_parquet(reportPath)
+    else:
+        issues = pd.read_csv(reportPath)
+    return route_handling(issues)
+
+
+
+#===============================================================================
+# Example - Scan the LRS and save the report
+#===============================================================================
+
+if __name__ == '__main__':
+    from m_value_store import MValueStore
+
+    store = MValueStore.from_shapefile(r'.\data\LRS\LRS_Full.shp')
+    issues = scan_lrs(store)
+    print(issues['ISSUE'].value_counts())
+    issues.to_csv(r'.\data\lrs_integrity.csv', index=False)
+
+    # The report can be passed to get_line_mp() in
+    # tools/update_line_events_known_rte_nm.py
+    handling = load_route_handling(r'.\data\lrs_integrity.csv')
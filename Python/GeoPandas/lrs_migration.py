@@ -0,0 +1,163 @@
+#===============================================================================
+# Migrate events between LRS versions
+#===============================================================================
+# How do I move an event table from last year's LRS to this year's without
+# re-locating every record?
+#
+# ProFunctions/UpdateRTE_NMAndMsr.py locates the begin and end of every record
+# again on the new LRS.  Most routes don't change from one year to the next,
+# so most of that work gives back the same measures.
+#
+# diff_lrs() compares two LRS versions (each loaded into an MValueStore, see
+# m_value_store.py) route by route, using a hash of each route's coordinates
+# and a hash of its m-values:
+#
+#   UNCHANGED - Same RTE_NM, geometry, and m-values
+#   RECALIBRATED - Same RTE_NM and geometry, but the m-values changed
+#   RENAMED - The RTE_NM is gone, but a new route has the same geometry
+#   CHANGED - Same RTE_NM, but the geometry changed
+#   RETIRED - The RTE_NM is gone and no new route has the same geometry
+#
+# migrate_events() then handles each event based on the status of its route:
+#
+#   UNCHANGED events are copied over as they are.
+#   RECALIBRATED and RENAMED events are moved with a piecewise-linear mapping
+#       from each old vertex m-value to the new m-value of the same vertex, so
+#       nothing has to be located geometrically.
+#   CHANGED events are located again: the begin and end points are found on
+#       the old route and their measures are found on the new route.
+#   RETIRED events are left without new measures so they can be reviewed.
+#
+# Only the events on CHANGED routes need any geometry work, so a yearly update
+# takes minutes rather than hours.
+#===============================================================================
+# Written for GeoPandas in Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from m_value_store import MValueStore
+
+
+def _route_hashes(store, xy_decimals, m_decimals):
+    """ Returns a DataFrame of RTE_NM, GEOM_HASH, M_HASH for every route """
+    rows = []
+    for rte_nm, (start, stop) in store.routes.items():
+        xy = np.round(np.column_stack([store.x[start:stop], store.y[start:stop]]), xy_decimals)
+        geomHash = hashlib.blake2b(xy.tobytes() + store.partStart[start:stop].tobytes(), digest_size=16).hexdigest()
+        mHash = hashlib.blake2b(np.round(store.m[start:stop], m_decimals).tobytes(), digest_size=16).hexdigest()
+        rows.append((rte_nm, geomHash, mHash))
+    return pd.DataFrame(rows, columns=['RTE_NM', 'GEOM_HASH', 'M_HASH'])
+
+
+def diff_lrs(oldStore, newStore, xy_decimals=2, m_decimals=4):
+    """ Compares two LRS versions and returns a DataFrame with one row for each
+        old route: RTE_NM, STATUS, NEW_RTE_NM
+
+        xy_decimals = Coordinates are rounded to this many decimals before
+                      they are compared (2 = 1 cm in Virginia Lambert)
+        m_decimals = m-values are rounded to this many decimals
+    """
+    old = _route_hashes(oldStore, xy_decimals, m_decimals)
+    new = _route_hashes(newStore, xy_decimals, m_decimals)
+
+    diff = old.merge(new, on='RTE_NM', how='left', suffixes=('', '_NEW'))
+    sameGeom = diff['GEOM_HASH'] == diff['GEOM_HASH_NEW']
+    sameM = diff['M_HASH'] == diff['M_HASH_NEW']
+    exists = diff['GEOM_HASH_NEW'].notna()
+
+    diff['STATUS'] = np.select([exists & sameGeom & sameM, exists & sameGeom, exists], ['UNCHANGED', 'RECALIBRATED', 'CHANGED'], 'RETIRED')
+    diff['NEW_RTE_NM'] = diff['RTE_NM'].where(exists)
+
+    # Retired routes whose geometry matches a route that is only in the new
+    # LRS were renamed
+    added = new.loc[~new['RTE_NM'].isin(old['RTE_NM'])].drop_duplicates('GEOM_HASH')
+    renamedTo = diff['GEOM_HASH'].map(added.set_index('GEOM_HASH')['RTE_NM'])
+    renamed = (diff['STATUS'] == 'RETIRED') & renamedTo.notna()
+    diff.loc[renamed, 'STATUS'] = 'RENAMED'
+    diff.loc[renamed, 'NEW_RTE_NM'] = renamedTo[renamed]
+
+    return diff[['RTE_NM', 'STATUS', 'NEW_RTE_NM']]
+
+
+def _remap(oldStore, newStore, rte_nm, new_rte_nm, measures):
+    """ Maps measures from the old route to the new route using the m-values
+        of matching vertices """
+    oldM = oldStore[rte_nm]
+    newM = newStore[new_rte_nm]
+    keep = ~(np.isnan(oldM) | np.isnan(newM))
+    return np.interp(measures, oldM[keep], newM[keep], left=np.nan, right=np.nan)
+
+
+def _relocate(oldStore, newStore, rte_nm, measures, tolerance):
+    """ Finds each measure on the old route and returns the measure of the
+        closest point on the new route.  Points that are more than tolerance
+        from the new route are NaN. """
+    x, y = oldStore.point_at_measure(rte_nm, measures)
+    output = np.full(len(measures), np.nan)
+    found = ~np.isnan(x)
+    if found.any():
+        m, distance = newStore.measure_at_point(rte_nm, x[found], y[found])
+        output[found] = np.where(distance <= tolerance, m, np.nan)
+    return output
+
+
+def migrate_events(events, oldStore, newStore, diff=None, rte_nm='RTE_NM', begin_msr='BEGIN_MSR', end_msr='END_MSR', tolerance=30, decimals=3):
+    """ Returns a copy of events with NEW_RTE_NM, NEW_BEGIN_MSR, NEW_END_MSR,
+        and MIGRATION (the status of the event's route from diff_lrs())
+
+        events = DataFrame of linear events on the old LRS
+        oldStore, newStore = MValueStores of the old and new LRS
+        diff = Output of diff_lrs().  Calculated if not given
+        tolerance = For CHANGED routes, the largest distance between the old
+                    and new route that a measure can be carried across
+    """
+    if diff is None:
+        diff = diff_lrs(oldStore, newStore)
+
+    output = events.copy()
+    routes = diff.set_index('RTE_NM')
+    output['MIGRATION'] = output[rte_nm].map(routes['STATUS']).fillna('NOT_IN_OLD_LRS')
+    output['NEW_RTE_NM'] = output[rte_nm].map(routes['NEW_RTE_NM'])
+    output['NEW_BEGIN_MSR'] = np.nan
+    output['NEW_END_MSR'] = np.nan
+
+    unchanged = output['MIGRATION'] == 'UNCHANGED'
+    output.loc[unchanged, 'NEW_BEGIN_MSR'] = output.loc[unchanged, begin_msr]
+    output.loc[unchanged, 'NEW_END_MSR'] = output.loc[unchanged, end_msr]
+
+    moving = output.loc[output['MIGRATION'].isin(['RECALIBRATED', 'RENAMED', 'CHANGED'])]
+    for (route, newRoute, status), routeEvents in moving.groupby([rte_nm, 'NEW_RTE_NM', 'MIGRATION']):
+        measures = np.concatenate([routeEvents[begin_msr].to_numpy(dtype=float), routeEvents[end_msr].to_numpy(dtype=float)])
+        if status == 'CHANGED':
+            newMeasures = _relocate(oldStore, newStore, route, measures, tolerance)
+        else:
+            newMeasures = _remap(oldStore, newStore, route, newRoute, measures)
+
+        newBegin, newEnd = np.split(np.round(newMeasures, decimals), 2)
+        output.loc[routeEvents.index, 'NEW_BEGIN_MSR'] = newBegin
+        output.loc[routeEvents.index, 'NEW_END_MSR'] = newEnd
+
+    return output
+
+
+
+#===============================================================================
+# Example - Move the TRS events from the 2020 LRS to the 2021 LRS
+#===============================================================================
+
+if __name__ == '__main__':
+    oldStore = MValueStore.from_shapefile(r'.\data\LRS\LRS_2020.shp')
+    newStore = MValueStore.from_shapefile(r'.\data\LRS\LRS_2021.shp')
+
+    diff = diff_lrs(oldStore, newStore)
+    print(diff['STATUS'].value_counts())
+
+    events = pd.read_csv(r'.\data\TRS20.csv')
+    migrated = migrate_events(events, oldStore, newStore, diff)
+    migrated.to_csv(r'.\data\TRS21.csv', index=False)
+    print(migrated['MIGRATION'].value_counts())
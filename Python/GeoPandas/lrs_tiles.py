@@ -0,0 +1,186 @@
+#===============================================================================
+# Tiled statewide processing
+#===============================================================================
+# How do I find the nearest route and MP for a few million points without
+# loading the whole LRS into memory?
+#
+# The other GeoPandas recipes start with gp.read_file(lrsPath).to_crs(3968),
+# which loads the LRS for the whole state.  Together with a large point file
+# that can be more than a small machine has.
+#
+# run_tiled() splits the state into tiles and works on one tile at a time.
+# Tiles can be squares in Virginia Lambert (square_tiles()) or districts
+# (district_tiles()).  For each tile:
+#
+#   - The points that fall in the tile are selected.  Every point belongs to
+#     exactly one tile, so the results can be stitched back together without
+#     duplicates.
+#   - The LRS is read with LRSDataset (see lrs_dataset.py), using the tile
+#     buffered by a halo as the mask.  The halo is the search distance, so a
+#     point near the edge of a tile can still find a route in the next tile.
+#   - The job function is run on the points and the LRS for that tile.
+#
+# Only one tile's worth of the LRS is in memory at a time (or one per worker
+# if workers > 1).  The results are returned in the same order as the input
+# points.
+#
+# nearest_routes() and locate_points() are jobs that can be passed to
+# run_tiled().  Any function that takes (points, lrs) and returns a DataFrame
+# with the same index as points can be used.
+#===============================================================================
+# Written for GeoPandas in Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import geopandas as gp
+import numpy as np
+import pandas as pd
+import shapely
+
+from lrs_dataset import LRSDataset
+
+
+def square_tiles(bounds, tile_size=50000, crs=3968):
+    """ Returns a GeoDataFrame of square tiles that cover bounds
+
+        bounds = (minx, miny, maxx, maxy)
+        tile_size = Width of each tile in the units of crs
+    """
+    minx, miny, maxx, maxy = bounds
+    columns = int((maxx - minx) // tile_size) + 1
+    rows = int((maxy - miny) // tile_size) + 1
+    i, j = np.meshgrid(np.arange(columns), np.arange(rows), indexing='ij')
+    i, j = i.ravel(), j.ravel()
+    boxes = shapely.box(minx + i * tile_size, miny + j * tile_size, minx + (i + 1) * tile_size, miny + (j + 1) * tile_size)
+    tiles = gp.GeoDataFrame({'TILE_ID': [f'{a}_{b}' for a, b in zip(i, j)]}, geometry=boxes, crs=crs)
+    tiles.attrs['grid'] = (minx, miny, tile_size, rows)
+    return tiles
+
+
+def district_tiles(districts, name_field='DISTRICT_NAME', crs=3968):
+    """ Returns a GeoDataFrame with one tile for each district """
+    districts = districts.to_crs(crs)
+    return gp.GeoDataFrame({'TILE_ID': districts[name_field].to_numpy()}, geometry=districts.geometry.to_numpy(), crs=crs)
+
+
+def assign_tiles(points, tiles):
+    """ Returns a Series with the position (in tiles) of the tile that each
+        point belongs to, or -1 for points outside of every tile.  Points on a
+        shared edge are given to only one tile. """
+    points = points.to_crs(tiles.crs)
+    if 'grid' in tiles.attrs:
+        # Square tiles - each tile includes its left and bottom edges
+        minx, miny, tileSize, rows = tiles.attrs['grid']
+        column = np.floor((points.geometry.x.to_numpy() - minx) / tileSize).astype(np.int64)
+        row = np.floor((points.geometry.y.to_numpy() - miny) / tileSize).astype(np.int64)
+        tile = column * rows + row
+        tile[(column < 0) | (row < 0) | (row >= rows) | (tile >= len(tiles))] = -1
+        return pd.Series(tile, index=points.index)
+
+    pointIndex, tileIndex = tiles.sindex.query(points.geometry, predicate='intersects')
+    tile = np.full(len(points), -1)
+    # The first tile wins for points on a shared boundary
+    tile[pointIndex[::-1]] = tileIndex[::-1]
+    return pd.Series(tile, index=points.index)
+
+
+def _run_tile(job, lrsPath, lrsColumns, distance, crs, tile, points):
+    halo = gp.GeoDataFrame(geometry=[tile.buffer(distance)], crs=crs)
+    lrs = LRSDataset(lrsPath, columns=lrsColumns, mask=halo, crs=crs)
+    return job(points, lrs)
+
+
+def run_tiled(job, lrsPath, points, tiles, distance, lrs_columns=('RTE_NM',), workers=1):
+    """ Runs job(points, lrs) one tile at a time and returns the combined
+        results in the order of points
+
+        job = Function that takes a GeoDataFrame of points and an LRSDataset
+              and returns a DataFrame with the same index as the points
+        lrsPath = Path to the LRS
+        points = GeoDataFrame of points
+        tiles = Output of square_tiles() or district_tiles()
+        distance = The search distance.  The LRS is read this far outside of
+                   each tile
+        workers = Number of tiles to run at once in separate processes
+    """
+    crs = tiles.crs
+    points = points.to_crs(crs)
+    tileOf = assign_tiles(points, tiles)
+
+    tasks = []
+    for tileIndex, tilePoints in points.groupby(tileOf.to_numpy(), sort=True):
+        if tileIndex >= 0:
+            tasks.append((tiles.geometry.iloc[tileIndex], tilePoints))
+
+    run = partial(_run_tile, job, lrsPath, list(lrs_columns), distance, crs)
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(run, *zip(*tasks))) if tasks else []
+    else:
+        results = [run(tile, tilePoints) for tile, tilePoints in tasks]
+
+    if not results:
+        return pd.DataFrame(index=points.index[:0])
+    output = pd.concat(results)
+    return output.reindex(points.index)
+
+
+def nearest_routes(points, lrs, distance=50):
+    """ Job for run_tiled() that returns the RTE_NM of the closest route
+        within distance of each point and the DISTANCE to it """
+    joined = gp.sjoin_nearest(points[[points.geometry.name]], lrs.gdf[['RTE_NM', 'geometry']], max_distance=distance, distance_col='DISTANCE')
+    # Keep one route for points that are the same distance from two routes
+    joined = joined.sort_values(['DISTANCE', 'RTE_NM'], kind='stable')
+    joined = joined[~joined.index.duplicated(keep='first')]
+    return joined[['RTE_NM', 'DISTANCE']]
+
+
+def _vertex_distances(line):
+    """ Distance along a LineString or MultiLineString to each vertex, not
+        counting the gaps between parts """
+    coords = shapely.get_coordinates(line)
+    partSizes = [len(part.coords) for part in shapely.get_parts(line)]
+    steps = np.hypot(np.diff(coords[:, 0]), np.diff(coords[:, 1]))
+    steps[np.cumsum(partSizes)[:-1] - 1] = 0
+    return np.r_[0, np.cumsum(steps)]
+
+
+def locate_points(points, lrs, distance=50):
+    """ Job for run_tiled() that returns the RTE_NM, MP, and DISTANCE of the
+        closest route to each point.  The LRS must be a shapefile with
+        m-values. """
+    nearest = nearest_routes(points, lrs, distance)
+    mValueDict = lrs.m_values()
+    routes = lrs.gdf.drop_duplicates('RTE_NM').set_index('RTE_NM').geometry
+
+    mp = pd.Series(np.nan, index=nearest.index)
+    for rte_nm, routePoints in nearest.groupby('RTE_NM'):
+        mValues = mValueDict.get(rte_nm)
+        line = routes.get(rte_nm)
+        if mValues is None or line is None:
+            continue
+        mValues = np.array([np.nan if m is None else m for m in mValues], dtype=float)
+        vertexDistances = _vertex_distances(line)
+        if len(vertexDistances) != len(mValues):
+            continue
+        along = shapely.line_locate_point(line, points.geometry.loc[routePoints.index].to_numpy())
+        mp.loc[routePoints.index] = np.round(np.interp(along, vertexDistances, mValues), 3)
+
+    return nearest.assign(MP=mp)[['RTE_NM', 'MP', 'DISTANCE']]
+
+
+
+#===============================================================================
+# Example - Locate a large point file in 50 km tiles
+#===============================================================================
+
+if __name__ == '__main__':
+    lrsPath = r'.\data\LRS\LRS_Full.shp'
+    points = gp.read_file(r'.\data\crashes.shp')
+
+    tiles = square_tiles(points.to_crs(3968).total_bounds, tile_size=50000)
+    located = run_tiled(partial(locate_points, distance=50), lrsPath, points, tiles, distance=50, workers=4)
+    points = points.join(located)
@@ -0,0 +1,249 @@
+#===============================================================================
+# M-value store
+#===============================================================================
+# How do I find the coordinates at a milepoint, or the milepoint at a
+# coordinate, without arcpy?
+#
+# The m-value dictionary from lrs_in_geopandas.py only returns the m-value of
+# a vertex by its index (mValueDict[rte_nm][i]).  Finding the location of
+# MP 12.345 means looping through the vertices to find the two on either side
+# of it and interpolating between them.
+#
+# The MValueStore below reads the x, y, and m values of every vertex in the LRS
+# into three NumPy arrays, with each route stored as one block of vertices.
+# Since the m-values increase along a route, np.searchsorted() can find the
+# vertex before every measure in an array of measures at once:
+#
+#   point_at_measure(rte_nm, m) - The x/y at each measure in m
+#   measure_at_point(rte_nm, x, y) - The m-value of the closest location on
+#                                    the route to each point
+#   segment_between(rte_nm, m1, m2) - The vertices of the route between each
+#                                     pair of measures
+#
+# Multipart routes are stored with each part's vertices in order.  A measure
+# that falls in the gap between two parts has no location, so NaN is returned.
+# segment_between() returns one piece for each part that the event touches.
+#
+# store[rte_nm] returns the m-values of a route, so the store can be used in
+# place of mValueDict.
+#===============================================================================
+# Written for GeoPandas in Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import numpy as np
+import shapefile
+
+
+class MValueStore:
+    """ The x, y, and m values of every vertex in the LRS
+
+        x, y, m = Arrays of vertex values, with the vertices of each route in
+                  one block
+        partStart = Boolean array that is True for the first vertex of each
+                    part
+        routes = Dictionary of {rte_nm: (start, stop)} vertex indexes
+    """
+    def __init__(self, x, y, m, partStart, routes):
+        self.x = x
+        self.y = y
+        self.m = m
+        self.partStart = partStart
+        self.routes = routes
+
+    @classmethod
+    def from_shapefile(cls, lrsPath, routes=None, bbox=None):
+        """ Reads the LRS shapefile.  If routes is given, only those routes
+            are loaded.  bbox skips routes outside of (minx, miny, maxx, maxy).
+            Routes without m-values are skipped. """
+        routes = set(routes) if routes is not None else None
+        xy, mValues, partStarts = [], [], []
+        routeIndex = {}
+        count = 0
+        with shapefile.Reader(lrsPath) as shp:
+            for row in shp.iterShapeRecords(fields=['RTE_NM'], bbox=bbox):
+                rte_nm = row.record['RTE_NM']
+                shape = row.shape
+                if (routes is not None and rte_nm not in routes) or not shape.points or not getattr(shape, 'm', None):
+                    continue
+                if rte_nm in routeIndex:
+                    print(f'Duplicate RTE_NM {rte_nm} - only the first record is used')
+                    continue
+
+                vertexCount = len(shape.points)
+                starts = np.zeros(vertexCount, dtype=bool)
+                starts[list(shape.parts)] = True
+                xy.append(np.asarray(shape.points, dtype=np.float64)[:, :2])
+                mValues.append(np.array([np.nan if value is None else value for value in shape.m], dtype=np.float64))
+                partStarts.append(starts)
+                routeIndex[rte_nm] = (count, count + vertexCount)
+                count += vertexCount
+
+        if not xy:
+            empty = np.empty(0, dtype=np.float64)
+            return cls(empty, empty.copy(), empty.copy(), np.empty(0, dtype=bool), {})
+
+        xy = np.concatenate(xy)
+        return cls(xy[:, 0].copy(), xy[:, 1].copy(), np.concatenate(mValues), np.concatenate(partStarts), routeIndex)
+
+    def __contains__(self, rte_nm):
+        return rte_nm in self.routes
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __getitem__(self, rte_nm):
+        """ Returns the m-values of a route, like mValueDict[rte_nm] """
+        start, stop = self.routes[rte_nm]
+        return self.m[start:stop]
+
+    def _route(self, rte_nm):
+        start, stop = self.routes[rte_nm]
+        return start, stop, self.m[start:stop]
+
+    def point_at_measure(self, rte_nm, m):
+        """ Returns (x, y) arrays with the location of each measure in m on the
+            route.  Measures that are off the route or in a gap between parts
+            are NaN. """
+        x, y, _ = self._interpolate(rte_nm, m)
+        return x, y
+
+    def _interpolate(self, rte_nm, m):
+        """ Returns (x, y, i) where i is the index (into the store's arrays) of
+            the vertex before each measure """
+        m = np.atleast_1d(np.asarray(m, dtype=np.float64))
+        start, stop, routeM = self._route(rte_nm)
+        if stop - start < 2:
+            nan = np.full(len(m), np.nan)
+            return nan, nan.copy(), np.full(len(m), start)
+
+        # Index of the vertex at or before each measure, limited so that there
+        # is always a next vertex
+        i = np.searchsorted(routeM, m, side='right') - 1
+        i = np.clip(i, 0, stop - start - 2) + start
+        m0 = self.m[i]
+        m1 = self.m[i + 1]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = np.where(m1 > m0, (m - m0) / (m1 - m0), 0.0)
+
+        x = self.x[i] + (self.x[i + 1] - self.x[i]) * ratio
+        y = self.y[i] + (self.y[i + 1] - self.y[i]) * ratio
+
+        # Measures in the gap between parts land exactly on a vertex or nowhere
+        gap = self.partStart[i + 1]
+        atEnd = gap & (m == m1)
+        x[atEnd] = self.x[i + 1][atEnd]
+        y[atEnd] = self.y[i + 1][atEnd]
+        offRoute = (m < routeM[0]) | (m > routeM[-1]) | (gap & (m != m0) & (m != m1)) | np.isnan(m)
+        x[offRoute] = np.nan
+        y[offRoute] = np.nan
+        return x, y, i
+
+    def measure_at_point(self, rte_nm, x, y, chunk_size=1000):
+        """ Returns (m, distance) arrays with the m-value of the closest
+            location on the route to each point and the distance from the
+            point to the route.  Points are compared to every segment of the
+            route, chunk_size points at a time. """
+        px = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        py = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        start, stop, _ = self._route(rte_nm)
+
+        # Segments between the parts of a multipart route are skipped
+        segment = np.arange(start, stop - 1)
+        segment = segment[~self.partStart[segment + 1]]
+        if not len(segment):
+            nan = np.full(len(px), np.nan)
+            return nan, nan.copy()
+
+        ax, ay = self.x[segment], self.y[segment]
+        dx, dy = self.x[segment + 1] - ax, self.y[segment + 1] - ay
+        lengthSq = dx * dx + dy * dy
+        am, dm = self.m[segment], self.m[segment + 1] - self.m[segment]
+
+        outM = np.empty(len(px))
+        outDistance = np.empty(len(px))
+        for chunkStart in range(0, len(px), chunk_size):
+            cx = px[chunkStart:chunkStart + chunk_size, None]
+            cy = py[chunkStart:chunkStart + chunk_size, None]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                t = np.where(lengthSq > 0, ((cx - ax) * dx + (cy - ay) * dy) / lengthSq, 0.0)
+            t = np.clip(t, 0, 1)
+            distanceSq = (ax + t * dx - cx) ** 2 + (ay + t * dy - cy) ** 2
+            closest = np.argmin(distanceSq, axis=1)
+            rows = np.arange(len(closest))
+            outM[chunkStart:chunkStart + chunk_size] = am[closest] + t[rows, closest] * dm[closest]
+            outDistance[chunkStart:chunkStart + chunk_size] = np.sqrt(distanceSq[rows, closest])
+
+        return outM, outDistance
+
+    def segment_indexes(self, rte_nm, m1, m2):
+        """ Returns the arrays used by segment_between():
+                (x1, y1, x2, y2, first, last)
+            where (x1, y1) and (x2, y2) are the locations of the begin and end
+            measures and first:last is the range of store vertices strictly
+            between them.  m1 must be less than or equal to m2. """
+        m1 = np.atleast_1d(np.asarray(m1, dtype=np.float64))
+        m2 = np.atleast_1d(np.asarray(m2, dtype=np.float64))
+        start, stop, routeM = self._route(rte_nm)
+        x1, y1, _ = self._interpolate(rte_nm, m1)
+        x2, y2, _ = self._interpolate(rte_nm, m2)
+        first = np.searchsorted(routeM, m1, side='right') + start
+        last = np.searchsorted(routeM, m2, side='left') + start
+        return x1, y1, x2, y2, first, np.maximum(last, first)
+
+    def segment_between(self, rte_nm, m1, m2):
+        """ Returns a list with the geometry of the route between each pair of
+            measures in m1 and m2.  Each item is a list of (n, 3) x/y/m arrays,
+            one for each part of the route that the segment touches.  Pairs
+            where m1 > m2 are reversed. """
+        m1 = np.atleast_1d(np.asarray(m1, dtype=np.float64))
+        m2 = np.atleast_1d(np.asarray(m2, dtype=np.float64))
+        lo, hi = np.minimum(m1, m2), np.maximum(m1, m2)
+        x1, y1, x2, y2, first, last = self.segment_indexes(rte_nm, lo, hi)
+
+        output = []
+        for j in range(len(lo)):
+            vertices = np.arange(first[j], last[j])
+            coords = np.column_stack([self.x[vertices], self.y[vertices], self.m[vertices]])
+            if not np.isnan(x1[j]):
+                coords = np.vstack([[x1[j], y1[j], lo[j]], coords])
+            if not np.isnan(x2[j]):
+                coords = np.vstack([coords, [x2[j], y2[j], hi[j]]])
+
+            # Split into one piece per part
+            breaks = np.flatnonzero(self.partStart[vertices]) + (0 if np.isnan(x1[j]) else 1)
+
+            # An end measure equal to the first m-value of a part is on the
+            # far side of the gap
+            if not np.isnan(x2[j]) and self.partStart[last[j]] and self.m[last[j]] == hi[j]:
+                breaks = np.r_[breaks, len(coords) - 1]
+            pieces = [piece for piece in np.split(coords, breaks) if len(piece) >= 2]
+            if m1[j] > m2[j]:
+                pieces = [piece[::-1] for piece in pieces[::-1]]
+            output.append(pieces)
+
+        return output
+
+
+
+#===============================================================================
+# Example - Find the location of MP 12.345 on I-95, the milepoint of a
+# coordinate, and the geometry between two milepoints
+#===============================================================================
+
+if __name__ == '__main__':
+    lrsPath = r'.\data\LRS\LRS_Full.shp'
+    store = MValueStore.from_shapefile(lrsPath)
+
+    x, y = store.point_at_measure('R-VA   IS00095NB', 12.345)
+    print(x[0], y[0])
+
+    # Many measures at once
+    x, y = store.point_at_measure('R-VA   IS00095NB', np.arange(0, 50, 0.1))
+
+    m, distance = store.measure_at_point('R-VA   IS00095NB', x[:10] + 5, y[:10])
+    print(m)
+
+    pieces = store.segment_between('R-VA   IS00095NB', [1.5, 10], [4.2, 12])
+    print([len(piece) for piece in pieces[0]])
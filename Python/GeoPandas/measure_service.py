@@ -0,0 +1,305 @@
+#===============================================================================
+# Local measure location service
+#===============================================================================
+# How do I locate points on the LRS from another program without loading the
+# LRS every time?
+#
+# Every recipe that locates a point starts by loading the LRS, projecting it,
+# and building a spatial index.  When another app runs a recipe in a
+# subprocess for each request, most of the time is spent on that setup.
+#
+# This script runs a small HTTP server on the local machine that loads the LRS
+# into an MValueStore (see m_value_store.py) and builds the spatial index once.
+# It only uses asyncio from the standard library, so nothing else needs to be
+# installed.  All requests are POSTs with a JSON body:
+#
+#   /nearest_routes  {"points": [[x, y], ...], "distance": 50}
+#                    -> {"results": [["RTE_NM", ...], ...]}
+#   /locate          {"points": [[x, y], ...], "distance": 50}
+#                    -> {"results": [{"RTE_NM":, "MP":, "DISTANCE":}, ...]}
+#   /coordinates     {"events": [["RTE_NM", mp], ...]}
+#                    -> {"results": [[x, y], ...]}
+#
+# GET /stats returns the number of requests and the 50th, 90th, and 99th
+# percentile latency (in milliseconds) of each endpoint.
+#
+# Many small requests that arrive at about the same time are combined into one
+# batch, so the LRS is searched with one vectorized call rather than one call
+# per request.  A batch is sent when it reaches max_batch points or when the
+# oldest request has waited max_delay seconds.
+#
+# Coordinates are in the LRS's coordinate system.  The server only listens on
+# 127.0.0.1 by default.
+#===============================================================================
+# Written for GeoPandas in Python 3.8 (shapely 2.0 or newer)
+# By Dan Fourquet
+#===============================================================================
+
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+import shapely
+
+from m_value_store import MValueStore
+
+
+class LRSIndex:
+    """ The LRS with a spatial index of the routes
+
+        store = MValueStore with the LRS
+    """
+    def __init__(self, store):
+        self.store = store
+        self.names = np.array(list(store.routes), dtype=object)
+        self.tree = shapely.STRtree([self._route_geometry(name) for name in self.names])
+
+    def _route_geometry(self, rte_nm):
+        start, stop = self.store.routes[rte_nm]
+        coords = np.column_stack([self.store.x[start:stop], self.store.y[start:stop]])
+        partStarts = np.flatnonzero(self.store.partStart[start:stop])[1:]
+        parts = [shapely.linestrings(part) for part in np.split(coords, partStarts) if len(part) >= 2]
+        return shapely.multilinestrings(parts)
+
+    def nearest_routes(self, points, distance):
+        """ Returns a list of the RTE_NMs within distance of each point """
+        points = shapely.points(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+        pointHit, routeHit = self.tree.query(points, predicate='dwithin', distance=distance)
+        output = [[] for _ in range(len(points))]
+        for p, r in zip(pointHit, routeHit):
+            output[p].append(self.names[r])
+        return output
+
+    def locate(self, points, distance):
+        """ Returns a list of {RTE_NM, MP, DISTANCE} for the closest route to
+            each point, or None if there is no route within distance """
+        xy = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        (pointHit, routeHit), distances = self.tree.query_nearest(shapely.points(xy), max_distance=distance, return_distance=True, all_matches=False)
+        output = [None] * len(xy)
+        for route in np.unique(routeHit):
+            hits = pointHit[routeHit == route]
+            m, _ = self.store.measure_at_point(self.names[route], xy[hits, 0], xy[hits, 1])
+            for p, mp in zip(hits, m):
+                output[p] = {'RTE_NM': self.names[route], 'MP': round(float(mp), 3)}
+        for p, d in zip(pointHit, distances):
+            output[p]['DISTANCE'] = round(float(d), 3)
+        return output
+
+    def coordinates(self, events):
+        """ Returns a list of [x, y] for each [rte_nm, mp] pair, or None if the
+            measure isn't on the route """
+        output = [None] * len(events)
+        byRoute = defaultdict(list)
+        for i, (rte_nm, mp) in enumerate(events):
+            byRoute[rte_nm].append(i)
+        for rte_nm, indexes in byRoute.items():
+            if rte_nm not in self.store:
+                continue
+            x, y = self.store.point_at_measure(rte_nm, [events[i][1] for i in indexes])
+            for i, px, py in zip(indexes, x, y):
+                if not np.isnan(px):
+                    output[i] = [float(px), float(py)]
+        return output
+
+
+def _check_points(points):
+    """ Returns points as a list of [x, y], or raises ValueError if they aren't
+        an (n, 2) array of numbers """
+    if not isinstance(points, list):
+        raise ValueError('points must be a list of [x, y]')
+    xy = np.asarray(points, dtype=np.float64) if points else np.empty((0, 2))
+    if xy.ndim != 2 or xy.shape[1] != 2:
+        raise ValueError('points must be a list of [x, y]')
+    return xy.tolist()
+
+
+def _check_events(events):
+    """ Returns events as a list of [rte_nm, mp], or raises ValueError if any
+        of them isn't a [string, number] pair """
+    if not isinstance(events, list):
+        raise ValueError('events must be a list of ["RTE_NM", mp]')
+    output = []
+    for event in events:
+        if not isinstance(event, list) or len(event) != 2 or not isinstance(event[0], str) \
+                or isinstance(event[1], bool) or not isinstance(event[1], (int, float)):
+            raise ValueError(f'events must be a list of ["RTE_NM", mp], got {event!r}')
+        output.append([event[0], float(event[1])])
+    return output
+
+
+class Batcher:
+    """ Combines the items from requests that arrive at about the same time
+        and runs func once on all of them in a worker thread
+
+        func = Function that takes a list of items and returns a list of
+               results in the same order
+        max_batch = Most items in one batch
+        max_delay = Seconds to wait for more requests before running a batch
+    """
+    def __init__(self, func, max_batch=10000, max_delay=0.005):
+        self.func = func
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batchSizes = deque(maxlen=10000)
+        self._pending = []
+        self._pendingCount = 0
+        self._timer = None
+
+    async def submit(self, items):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((items, future))
+        self._pendingCount += len(items)
+        if self._pendingCount >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._pendingCount = self._pending, [], 0
+        if pending:
+            asyncio.ensure_future(self._run(pending))
+
+    async def _run(self, pending):
+        items = [item for requestItems, _ in pending for item in requestItems]
+        self.batchSizes.append(len(items))
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(None, self.func, items)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        start = 0
+        for requestItems, future in pending:
+            future.set_result(results[start:start + len(requestItems)])
+            start += len(requestItems)
+
+
+class MeasureService:
+    """ HTTP server for an LRSIndex """
+    def __init__(self, index, max_batch=10000, max_delay=0.005):
+        self.index = index
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.latency = defaultdict(lambda: deque(maxlen=10000))
+        self._batchers = {}
+
+    def _batcher(self, endpoint, distance=None):
+        """ Requests are only batched with other requests that use the same
+            search distance """
+        key = (endpoint, distance)
+        if key not in self._batchers:
+            if endpoint == '/nearest_routes':
+                func = lambda items: self.index.nearest_routes(items, distance)
+            elif endpoint == '/locate':
+                func = lambda items: self.index.locate(items, distance)
+            else:
+                func = self.index.coordinates
+            self._batchers[key] = Batcher(func, self.max_batch, self.max_delay)
+        return self._batchers[key]
+
+    def stats(self):
+        output = {}
+        for endpoint, times in self.latency.items():
+            times = np.array(times) * 1000
+            p50, p90, p99 = np.percentile(times, [50, 90, 99]) if len(times) else (None, None, None)
+            output[endpoint] = {'requests': len(times), 'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99}
+        for (endpoint, distance), batcher in self._batchers.items():
+            if batcher.batchSizes:
+                output.setdefault(endpoint, {})['mean_batch'] = float(np.mean(batcher.batchSizes))
+        return output
+
+    async def handle(self, method, path, body):
+        """ Returns (status, response dictionary) for one request """
+        if method == 'GET' and path == '/stats':
+            return 200, self.stats()
+        if method != 'POST' or path not in ('/nearest_routes', '/locate', '/coordinates'):
+            return 404, {'error': f'Unknown endpoint {method} {path}'}
+
+        try:
+            request = json.loads(body or b'{}')
+            # Each request is checked on its own so that one bad request
+            # can't break the batch it would have been combined with
+            if path == '/coordinates':
+                items = _check_events(request['events'])
+                batcher = self._batcher(path)
+            else:
+                items = _check_points(request['points'])
+                batcher = self._batcher(path, float(request.get('distance', 50)))
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'error': f'Bad request: {e}'}
+
+        start = time.perf_counter()
+        try:
+            results = await batcher.submit(items)
+        except Exception as e:
+            return 500, {'error': str(e)}
+        self.latency[path].append(time.perf_counter() - start)
+        return 200, {'results': results}
+
+    async def _connection(self, reader, writer):
+        """ Reads HTTP/1.1 requests from one connection until it is closed """
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine:
+                    break
+                method, path, _ = requestLine.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, response = await self.handle(method, path.split('?')[0], body)
+
+                data = json.dumps(response).encode()
+                reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}[status]
+                writer.write(f'HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n'.encode() + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        server = await asyncio.start_server(self._connection, host, port)
+        print(f'Measure service running on http://{host}:{port}')
+        async with server:
+            await server.serve_forever()
+
+
+def post(url, data):
+    """ Sends a request to the service and returns the results.  For use from
+        other scripts, eg
+            post('http://127.0.0.1:8765/locate', {'points': [[x, y]]}) """
+    import urllib.request
+    request = urllib.request.Request(url, json.dumps(data).encode(), {'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())['results']
+
+
+
+#===============================================================================
+# Example - Start the service.  Run this script, then call post() from
+# another python session.
+#===============================================================================
+
+if __name__ == '__main__':
+    lrsPath = r'.\data\LRS\LRS_Full.shp'
+
+    index = LRSIndex(MValueStore.from_shapefile(lrsPath))
+    service = MeasureService(index)
+    asyncio.run(service.serve(port=8765))
@@ -0,0 +1,286 @@
+#===============================================================================
+# Parallel overlay with a shared memory LRS
+#===============================================================================
+# How do I use every core on the machine to turn polygons into an event table
+# or to assign districts?
+#
+# polygon_to_event_csv() and add_districts() in the tools folder run one
+# geoprocessing tool at a time, so only one core does any work.  Sending the
+# LRS to a pool of worker processes doesn't help much on its own, because
+# every worker would have to unpickle its own copy of the whole LRS.
+#
+# The functions below put the vertex arrays of an MValueStore (see
+# m_value_store.py) into shared memory with SharedArrays.  Each worker attaches
+# to the same memory when it starts, so the LRS is only stored once no matter
+# how many workers there are.
+#
+# The work is split into square tiles.  The polygons (or districts) are
+# clipped to each tile and the clipped pieces are sent to the pool, so each
+# task only looks at the routes or points in its own tile.  Results are sorted
+# after they come back, and events that were cut at a tile edge are joined
+# back together, so the output is the same no matter how many workers are
+# used or which order the tiles finish in.
+#
+#   polygon_to_events(store, polygons) - Like polygon_to_event_csv(), returns
+#       a DataFrame of RTE_NM, BEGIN_MSR, END_MSR for the routes in each
+#       polygon
+#   assign_districts(gdf, districts) - Like add_districts(), returns the
+#       name of the district that the center of each feature is in
+#
+# On Windows, these must be called from inside if __name__ == '__main__':
+#===============================================================================
+# Written for GeoPandas in Python 3.8 (shapely 2.0 or newer)
+# By Dan Fourquet
+#===============================================================================
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from m_value_store import MValueStore
+
+
+class SharedArrays:
+    """ Copies a dictionary of NumPy arrays into shared memory.  spec can be
+        sent to another process, which gets the same arrays with attach(). """
+    def __init__(self, arrays):
+        self._blocks = []
+        self.spec = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(spec):
+        """ Returns (arrays, blocks).  Keep a reference to blocks for as long as
+            the arrays are used. """
+        arrays, blocks = {}, []
+        for name, (blockName, shape, dtype) in spec.items():
+            block = shared_memory.SharedMemory(name=blockName)
+            arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            blocks.append(block)
+        return arrays, blocks
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _store_arrays(store):
+    """ Returns the arrays of an MValueStore plus the bounding box of each
+        route """
+    ranges = np.array(list(store.routes.values()), dtype=np.int64).reshape(-1, 2)
+    starts = ranges[:, 0]
+    return {
+        'x': store.x, 'y': store.y, 'm': store.m, 'partStart': store.partStart, 'ranges': ranges,
+        'minx': np.minimum.reduceat(store.x, starts) if len(starts) else np.empty(0),
+        'miny': np.minimum.reduceat(store.y, starts) if len(starts) else np.empty(0),
+        'maxx': np.maximum.reduceat(store.x, starts) if len(starts) else np.empty(0),
+        'maxy': np.maximum.reduceat(store.y, starts) if len(starts) else np.empty(0)
+    }
+
+
+def _tiles(bounds, tile_size):
+    """ Returns a list of shapely boxes that cover bounds """
+    minx, miny, maxx, maxy = bounds
+    columns = int((maxx - minx) // tile_size) + 1
+    rows = int((maxy - miny) // tile_size) + 1
+    return [shapely.box(minx + i * tile_size, miny + j * tile_size, minx + (i + 1) * tile_size, miny + (j + 1) * tile_size)
+            for i in range(columns) for j in range(rows)]
+
+
+def _clip_to_tiles(geometries, tiles):
+    """ Returns a list of (tile, [(index, clippedWKB), ...]) for each tile that
+        one of the geometries touches """
+    geometries = np.asarray(geometries)
+    tree = shapely.STRtree(geometries)
+    tasks = []
+    for tile in tiles:
+        indexes = tree.query(tile, predicate='intersects')
+        if not len(indexes):
+            continue
+        clipped = shapely.intersection(geometries[indexes], tile)
+        pieces = [(int(i), shapely.to_wkb(geom)) for i, geom in zip(indexes, clipped) if not geom.is_empty]
+        if pieces:
+            tasks.append((shapely.to_wkb(tile), pieces))
+    return tasks
+
+
+# Set in each worker process by _init_worker()
+_worker = {}
+
+
+def _init_worker(spec, routeNames):
+    arrays, blocks = SharedArrays.attach(spec)
+    _worker['blocks'] = blocks
+    _worker['arrays'] = arrays
+    _worker['routeNames'] = routeNames
+    if 'ranges' in arrays:
+        routes = {name: (int(start), int(stop)) for name, (start, stop) in zip(routeNames, arrays['ranges'])}
+        _worker['store'] = MValueStore(arrays['x'], arrays['y'], arrays['m'], arrays['partStart'], routes)
+
+
+def _route_geometry(store, rte_nm):
+    """ Returns the route as a shapely MultiLineString """
+    start, stop = store.routes[rte_nm]
+    partStarts = np.flatnonzero(store.partStart[start:stop])
+    coords = np.column_stack([store.x[start:stop], store.y[start:stop]])
+    parts = [part for part in np.split(coords, partStarts[1:]) if len(part) >= 2]
+    return shapely.multilinestrings([shapely.linestrings(part) for part in parts])
+
+
+def _polygon_task(task):
+    """ Returns (polygonIndex, rte_nm, begin_msr, end_msr) tuples for the
+        routes inside each clipped polygon in one tile """
+    tileWKB, pieces = task
+    store = _worker['store']
+    arrays = _worker['arrays']
+    names = _worker['routeNames']
+    minx, miny, maxx, maxy = shapely.from_wkb(tileWKB).bounds
+
+    candidates = np.flatnonzero((arrays['minx'] <= maxx) & (arrays['maxx'] >= minx) & (arrays['miny'] <= maxy) & (arrays['maxy'] >= miny))
+    routes = [(names[i], _route_geometry(store, names[i])) for i in candidates]
+
+    output = []
+    for polygonIndex, polygonWKB in pieces:
+        polygon = shapely.from_wkb(polygonWKB)
+        shapely.prepare(polygon)
+        for rte_nm, routeGeom in routes:
+            if not polygon.intersects(routeGeom):
+                continue
+            inside = shapely.get_parts(shapely.line_merge(routeGeom.intersection(polygon)))
+            lines = [line for line in inside if line.geom_type == 'LineString' and line.length > 0]
+            if not lines:
+                continue
+            ends = np.array([(line.coords[0], line.coords[-1]) for line in lines]).reshape(-1, 2)
+            m, _ = store.measure_at_point(rte_nm, ends[:, 0], ends[:, 1])
+            m = m.reshape(-1, 2)
+            for begin, end in zip(m.min(axis=1), m.max(axis=1)):
+                output.append((polygonIndex, rte_nm, float(begin), float(end)))
+    return output
+
+
+def _merge_touching(df, tolerance):
+    """ Joins events on the same polygon and route where one ends where the
+        next one begins (eg where a route crosses a tile edge) """
+    df = df.sort_values(['POLYGON_INDEX', 'RTE_NM', 'BEGIN_MSR', 'END_MSR'], kind='stable').reset_index(drop=True)
+    sameGroup = (df['POLYGON_INDEX'].eq(df['POLYGON_INDEX'].shift())) & (df['RTE_NM'].eq(df['RTE_NM'].shift()))
+    groupEnd = df.groupby(['POLYGON_INDEX', 'RTE_NM'], sort=False)['END_MSR'].cummax().shift()
+    newEvent = ~(sameGroup & (df['BEGIN_MSR'] <= groupEnd + tolerance))
+    eventId = newEvent.cumsum()
+    return df.groupby(eventId).agg(POLYGON_INDEX=('POLYGON_INDEX', 'first'), RTE_NM=('RTE_NM', 'first'),
+                                   BEGIN_MSR=('BEGIN_MSR', 'min'), END_MSR=('END_MSR', 'max')).reset_index(drop=True)
+
+
+def polygon_to_events(store, polygons, workers=None, tile_size=20000, tolerance=0.0005):
+    """ Returns a DataFrame of POLYGON_INDEX, RTE_NM, BEGIN_MSR, END_MSR for
+        the parts of each route inside each polygon
+
+        store = MValueStore with the LRS
+        polygons = GeoSeries, GeoDataFrame, or list of shapely polygons in the
+                   LRS's coordinate system.  POLYGON_INDEX is the position of
+                   the polygon in this list
+        workers = Number of processes.  Defaults to the number of cores
+        tile_size = Width of the tiles in the LRS's units
+        tolerance = Events that are this close together are joined
+    """
+    polygons = list(getattr(polygons, 'geometry', polygons))
+    columns = ['POLYGON_INDEX', 'RTE_NM', 'BEGIN_MSR', 'END_MSR']
+    if not polygons or not len(store):
+        return pd.DataFrame(columns=columns)
+
+    workers = workers or os.cpu_count()
+    tasks = _clip_to_tiles(polygons, _tiles(shapely.total_bounds(polygons), tile_size))
+    routeNames = list(store.routes)
+
+    rows = []
+    with SharedArrays(_store_arrays(store)) as shared:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(shared.spec, routeNames)) as pool:
+            for result in pool.map(_polygon_task, tasks, chunksize=max(1, len(tasks) // (4 * workers))):
+                rows.extend(result)
+
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    return _merge_touching(pd.DataFrame(rows, columns=columns), tolerance)
+
+
+def _district_task(task):
+    """ Returns (pointIndexes, districtIndexes) for the points in one tile """
+    tileWKB, pieces = task
+    arrays = _worker['arrays']
+    minx, miny, maxx, maxy = shapely.from_wkb(tileWKB).bounds
+
+    # Points on the right or top edge belong to the next tile
+    x, y = arrays['x'], arrays['y']
+    inTile = np.flatnonzero((x >= minx) & (x < maxx) & (y >= miny) & (y < maxy))
+    points = shapely.points(x[inTile], y[inTile])
+
+    districtIndexes = np.array([i for i, _ in pieces])
+    tree = shapely.STRtree(shapely.from_wkb([wkb for _, wkb in pieces]))
+    pointHit, districtHit = tree.query(points, predicate='intersects')
+    return inTile[pointHit], districtIndexes[districtHit]
+
+
+def assign_districts(gdf, districts, district_name_field='DISTRICT_NAME', workers=None, tile_size=20000):
+    """ Returns a Series with the district name at the center of each feature
+        in gdf.  Features that aren't in a district are None.
+
+        gdf = GeoDataFrame of points, lines, or polygons
+        districts = GeoDataFrame of district polygons in the same coordinate
+                    system as gdf
+        district_name_field = The field in districts with the name
+    """
+    centers = gdf.geometry.centroid
+    output = np.full(len(gdf), None, dtype=object)
+    if not len(gdf) or not len(districts):
+        return pd.Series(output, index=gdf.index)
+
+    tasks = _clip_to_tiles(list(districts.geometry), _tiles(centers.total_bounds, tile_size))
+    names = districts[district_name_field].to_numpy()
+
+    arrays = {'x': centers.x.to_numpy(), 'y': centers.y.to_numpy()}
+    with SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(workers or os.cpu_count(), initializer=_init_worker, initargs=(shared.spec, [])) as pool:
+            hits = list(pool.map(_district_task, tasks))
+
+    # Apply the results in tile order so that a point on a district boundary
+    # always gets the same district
+    for pointIndexes, districtIndexes in hits:
+        order = np.lexsort((districtIndexes, pointIndexes))[::-1]
+        output[pointIndexes[order]] = names[districtIndexes[order]]
+    return pd.Series(output, index=gdf.index)
+
+
+
+#===============================================================================
+# Example - Create an event table for the routes in each polygon and add the
+# district to an event layer
+#===============================================================================
+
+if __name__ == '__main__':
+    import geopandas as gp
+
+    store = MValueStore.from_shapefile(r'.\data\LRS\LRS_Full.shp')
+    polygons = gp.read_file(r'.\data\study_areas.shp').to_crs(3968)
+    events = polygon_to_events(store, polygons, workers=32)
+    events.to_csv(r'.\data\study_area_events.csv', index=False)
+
+    districts = gp.read_file(r'.\data\Districts.shp').to_crs(3968)
+    features = gp.read_file(r'.\data\features.shp').to_crs(3968)
+    features['DISTRICT'] = assign_districts(features, districts, workers=32)
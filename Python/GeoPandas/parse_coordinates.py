@@ -0,0 +1,136 @@
+#===============================================================================
+# Parse a column of coordinate strings
+#===============================================================================
+# How do I turn a spreadsheet column of coordinates like
+# "77.4091688°W 37.5253562°N" into projected x/y values?
+#
+# coords() in ProFunctions/UpdateRTE_NMAndMsr.py splits one string at a time.
+# parse_coordinates() does the same for a whole pandas column at once with one
+# regular expression, so hundreds of thousands of rows take a second or two.
+# It accepts:
+#
+#   77.4091688°W 37.5253562°N        Decimal degrees with hemisphere letters
+#   37.5253562, -77.4091688          Signed decimal degrees
+#   77°24'32.99"W 37°31'31.28"N      Degrees, minutes, and seconds
+#   77 24 32.99 W, 37 31 31.28 N     DMS with spaces
+#
+# Latitude and longitude can be in either order when there are hemisphere
+# letters.  Without them, the value with the larger magnitude is taken to be
+# the longitude, which is always true in Virginia, and a positive longitude is
+# assumed to be west.
+#
+# Each row is checked against the bounds of Virginia and then all of the valid
+# rows are projected in one call to pyproj.  event_points() does this for the
+# begin and end coordinate columns of an event table, and the output can be
+# sent straight to a batch measure function such as LRSIndex.locate() in
+# measure_service.py.
+#===============================================================================
+# Written for GeoPandas in Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import numpy as np
+import pandas as pd
+
+# (min lng, min lat, max lng, max lat) with a small margin
+VIRGINIA_BOUNDS = (-83.7, 36.5, -75.2, 39.5)
+
+_NUMBER = r'\d+(?:\.\d+)?'
+_PART = (r'(?P<sign{n}>[-+])?\s*(?P<deg{n}>' + _NUMBER + r')\s*(?:°|º|d|deg)?\s*'
+         r'(?:(?P<min{n}>' + _NUMBER + r")\s*(?:'|′|m)?\s*)?"
+         r'(?:(?P<sec{n}>' + _NUMBER + r')\s*(?:"|″|\'\'|s)?\s*)?'
+         r'(?P<hemi{n}>[NSEWnsew])?')
+_PATTERN = r'^\s*' + _PART.format(n=1) + r'\s*[,;/\s]\s*' + _PART.format(n=2) + r'\s*$'
+
+
+def _degrees(parts, n):
+    """ Returns the signed decimal degrees of coordinate n """
+    value = parts[f'deg{n}'].astype(float) + parts[f'min{n}'].astype(float).fillna(0) / 60 + parts[f'sec{n}'].astype(float).fillna(0) / 3600
+    negative = parts[f'sign{n}'].eq('-') | parts[f'hemi{n}'].str.upper().isin(['S', 'W'])
+    return value.where(~negative, -value)
+
+
+def parse_coordinates(values, bounds=VIRGINIA_BOUNDS, crs=3968):
+    """ Parses a Series of coordinate strings
+
+        values = pandas Series (or list) of strings
+        bounds = (min lng, min lat, max lng, max lat).  Rows outside of these
+                 bounds are not valid
+        crs = Coordinate system for X and Y.  If None, X and Y aren't added
+
+        Returns a DataFrame with the same index as values and the columns LAT,
+        LNG, VALID, X, and Y.  Rows that can't be parsed or are out of bounds
+        have VALID = False and NaN for X and Y.
+    """
+    values = pd.Series(values)
+    parts = values.astype(str).str.extract(_PATTERN)
+
+    first = _degrees(parts, 1)
+    second = _degrees(parts, 2)
+    hemi1 = parts['hemi1'].str.upper()
+    hemi2 = parts['hemi2'].str.upper()
+
+    # The first value is the longitude if it has an E/W letter, the second has
+    # an N/S letter, or (with no letters) it is the larger of the two
+    firstIsLng = hemi1.isin(['E', 'W']) | hemi2.isin(['N', 'S'])
+    noLetters = hemi1.isna() & hemi2.isna()
+    firstIsLng = firstIsLng | (noLetters & (first.abs() > second.abs()))
+
+    lat = second.where(firstIsLng, first)
+    lng = first.where(firstIsLng, second)
+
+    # Positive longitudes without a hemisphere letter are assumed to be west
+    lngHemi = hemi1.where(firstIsLng, hemi2)
+    lng = lng.where(~(lngHemi.isna() & (lng > 0)), -lng)
+
+    minLng, minLat, maxLng, maxLat = bounds
+    valid = lat.between(minLat, maxLat) & lng.between(minLng, maxLng)
+
+    output = pd.DataFrame({'LAT': lat, 'LNG': lng, 'VALID': valid}, index=values.index)
+    if crs is not None:
+        import pyproj
+        transformer = pyproj.Transformer.from_crs(4326, crs, always_xy=True)
+        x, y = transformer.transform(lng.where(valid).to_numpy(dtype=float), lat.where(valid).to_numpy(dtype=float))
+        output['X'] = np.where(valid, x, np.nan)
+        output['Y'] = np.where(valid, y, np.nan)
+    return output
+
+
+def event_points(df, begin_field, end_field, bounds=VIRGINIA_BOUNDS, crs=3968):
+    """ Parses the begin and end coordinate columns of an event table
+
+        Returns a DataFrame with BEGIN_X, BEGIN_Y, END_X, END_Y, and VALID,
+        where VALID is True only if both coordinates are valid
+    """
+    begin = parse_coordinates(df[begin_field], bounds, crs)
+    end = parse_coordinates(df[end_field], bounds, crs)
+    return pd.DataFrame({
+        'BEGIN_X': begin['X'],
+        'BEGIN_Y': begin['Y'],
+        'END_X': end['X'],
+        'END_Y': end['Y'],
+        'VALID': begin['VALID'] & end['VALID']
+    }, index=df.index)
+
+
+
+#===============================================================================
+# Example - Parse the begin and end coordinates in a spreadsheet and locate
+# them on the LRS
+#===============================================================================
+
+if __name__ == '__main__':
+    from m_value_store import MValueStore
+    from measure_service import LRSIndex
+
+    df = pd.read_excel(r'.\data\projects.xlsx')
+    points = event_points(df, 'BEGIN_COORDS', 'END_COORDS')
+    print(f"{(~points['VALID']).sum()} rows have invalid coordinates")
+
+    index = LRSIndex(MValueStore.from_shapefile(r'.\data\LRS\LRS_Full.shp'))
+    valid = points.loc[points['VALID']]
+    begin = index.locate(valid[['BEGIN_X', 'BEGIN_Y']].to_numpy(), distance=30)
+    end = index.locate(valid[['END_X', 'END_Y']].to_numpy(), distance=30)
+    df.loc[valid.index, 'RTE_NM'] = [result['RTE_NM'] if result else None for result in begin]
+    df.loc[valid.index, 'BEGIN_MSR'] = [result['MP'] if result else None for result in begin]
+    df.loc[valid.index, 'END_MSR'] = [result['MP'] if result else None for result in end]
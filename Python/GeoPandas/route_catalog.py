@@ -0,0 +1,171 @@
+#===============================================================================
+# Route catalog
+#===============================================================================
+# How do I select routes by type, jurisdiction, or direction without string
+# operations on RTE_NM?
+#
+# Scripts that filter routes usually do it with string methods on RTE_NM, such
+# as .str.startswith('D-TE') in tools/flip_event_table.py, and look up the
+# opposite route by reading RTE_OPPOSITE_DIRECTION_RTE_NM from the LRS with a
+# cursor each time they run.
+#
+# build_route_catalog() parses every RTE_NM in the LRS once into separate
+# columns.  A VDOT RTE_NM such as 'R-VA   IS00095NB', 'R-VA029SC00691EB', or
+# 'R-VA   US00017BUSNB' is made of:
+#
+#   PREFIX - R, S, etc.  ('R' in 'R-VA...')
+#   STATE - VA
+#   JURISDICTION - Three digit county/city code, or blank for statewide routes
+#   SYSTEM - IS, US, SR, SC, PR, etc.
+#   NUMBER - The route number (95), if there is one
+#   SUFFIX - BUS, ALT, BYP, TRK, or SPR for business, alternate, bypass,
+#            truck, and spur routes, if there is one.  It is only a suffix
+#            when the direction or the end of the name follows it, so a
+#            street name like SPRING ST isn't split.
+#   DIRECTION - NB, SB, EB, or WB, if there is one
+#   NAME - Anything after the number and direction, such as a street name
+#
+# PRIME is False for SB and WB routes.  Every route is also given an integer
+# ROUTE_ID and the ROUTE_ID of its opposite route (OPPOSITE_ID, -1 if there
+# isn't one).  The text columns are pandas categoricals, so selecting
+# catalog['SYSTEM'] == 'IS' compares small integers rather than strings.
+#
+# The catalog can be saved to Parquet (or CSV) with save_route_catalog() and
+# read back with load_route_catalog(), so the LRS only has to be parsed when a
+# new version is published.
+#===============================================================================
+# Written for GeoPandas in Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import numpy as np
+import pandas as pd
+
+_PATTERN = (r'^(?P<PREFIX>[A-Z])-(?P<STATE>[A-Z]{2})(?P<JURISDICTION>[\d ]{3})(?P<SYSTEM>[A-Z]{2})'
+            r'(?P<NUMBER>\d+)?(?:(?P<SUFFIX>BUS|ALT|BYP|TRK|SPR)(?=NB|SB|EB|WB|\s*$))?(?P<DIRECTION>NB|SB|EB|WB)?(?P<NAME>.*)$')
+
+_OPPOSITE_DIRECTION = {'NB': 'SB', 'SB': 'NB', 'EB': 'WB', 'WB': 'EB'}
+
+CATEGORY_COLUMNS = ['PREFIX', 'STATE', 'JURISDICTION', 'SYSTEM', 'SUFFIX', 'DIRECTION']
+
+
+def parse_rte_nm(names):
+    """ Splits each RTE_NM into PREFIX, STATE, JURISDICTION, SYSTEM, NUMBER,
+        SUFFIX, DIRECTION, NAME, and PRIME
+
+        names = pandas Series (or list) of RTE_NMs
+
+        Returns a DataFrame with the same index as names.  Names that don't
+        follow the pattern have NaN for every column but NAME, which is the
+        whole RTE_NM.
+    """
+    names = pd.Series(names)
+    # Parse each distinct name once
+    unique = pd.Series(names.dropna().unique())
+    parts = unique.str.extract(_PATTERN)
+    parts['NAME'] = parts['NAME'].str.strip().replace('', np.nan)
+    parts['NAME'] = parts['NAME'].where(parts['PREFIX'].notna(), unique)
+    parts['JURISDICTION'] = parts['JURISDICTION'].str.strip()
+    parts['NUMBER'] = pd.to_numeric(parts['NUMBER']).astype('Int32')
+    parts['PRIME'] = ~parts['DIRECTION'].isin(['SB', 'WB'])
+    parts.index = unique
+
+    output = parts.reindex(names.to_numpy())
+    output.index = names.index
+    for column in CATEGORY_COLUMNS:
+        output[column] = output[column].astype('category')
+    return output
+
+
+def build_route_catalog(lrs, rte_nm='RTE_NM', opposite_field=None):
+    """ Returns a DataFrame with one row for each route in lrs
+
+        lrs = DataFrame with an RTE_NM column, such as the attributes of an
+              LRSDataset (see lrs_dataset.py) or gp.read_file(lrsPath)
+        opposite_field = Field with the opposite direction RTE_NM (eg
+                         'RTE_OPPOSITE_DIRECTION_RTE_NM', or 'RTE_OPPOSI' in a
+                         shapefile).  If None, the opposite route is the route
+                         with the same name and the opposite DIRECTION.
+    """
+    columns = [rte_nm] + ([opposite_field] if opposite_field else [])
+    routes = lrs[columns].dropna(subset=[rte_nm]).drop_duplicates(rte_nm)
+    routes = routes.sort_values(rte_nm).reset_index(drop=True)
+
+    catalog = pd.DataFrame({'ROUTE_ID': np.arange(len(routes), dtype=np.int32), 'RTE_NM': routes[rte_nm].to_numpy()})
+    catalog = catalog.join(parse_rte_nm(catalog['RTE_NM']))
+
+    if opposite_field:
+        opposite = routes[opposite_field]
+    else:
+        # Swap the direction that follows the route number and suffix
+        swap = lambda match: match.group(1) + _OPPOSITE_DIRECTION[match.group(2)]
+        opposite = catalog['RTE_NM'].str.replace(r'^(.{9}\d+(?:BUS|ALT|BYP|TRK|SPR)?)(NB|SB|EB|WB)', swap, regex=True)
+        opposite = opposite.where(catalog['DIRECTION'].notna())
+
+    catalog['OPPOSITE_ID'] = route_ids(catalog, opposite)
+    catalog['OPPOSITE_RTE_NM'] = opposite.where(catalog['OPPOSITE_ID'] >= 0).to_numpy()
+    return catalog
+
+
+def route_ids(catalog, names):
+    """ Returns an array with the ROUTE_ID of each RTE_NM in names, or -1 for
+        names that aren't in the catalog """
+    return pd.Categorical(pd.Series(names).to_numpy(), categories=catalog['RTE_NM']).codes.astype(np.int32)
+
+
+def opposite_routes(catalog, names):
+    """ Returns a Series with the opposite RTE_NM of each name, or NaN if there
+        isn't one """
+    names = pd.Series(names)
+    ids = route_ids(catalog, names)
+    oppositeIds = np.where(ids >= 0, catalog['OPPOSITE_ID'].to_numpy()[ids], -1)
+    output = pd.Series(catalog['RTE_NM'].to_numpy()[oppositeIds], index=names.index)
+    return output.where(oppositeIds >= 0)
+
+
+def save_route_catalog(catalog, path):
+    """ Saves the catalog to path.  Parquet keeps the categorical columns, so
+        it is faster to load than CSV. """
+    if path.lower().endswith('.parquet'):
+        catalog.to_parquet(path, index=False)
+    else:
+        catalog.to_csv(path, index=False)
+
+
+def load_route_catalog(path):
+    """ Reads a catalog that was saved with save_route_catalog() """
+    if path.lower().endswith('.parquet'):
+        catalog = pd.read_parquet(path)
+    else:
+        catalog = pd.read_csv(path, dtype={'JURISDICTION': str})
+        catalog['NUMBER'] = catalog['NUMBER'].astype('Int32')
+        # Statewide routes have a blank jurisdiction, which CSV reads as NaN
+        catalog['JURISDICTION'] = catalog['JURISDICTION'].where(catalog['PREFIX'].isna(), catalog['JURISDICTION'].fillna(''))
+    catalog['ROUTE_ID'] = catalog['ROUTE_ID'].astype(np.int32)
+    catalog['OPPOSITE_ID'] = catalog['OPPOSITE_ID'].astype(np.int32)
+    for column in CATEGORY_COLUMNS:
+        # Catalogs saved before SUFFIX was added don't have it
+        if column in catalog:
+            catalog[column] = catalog[column].astype('category')
+    return catalog
+
+
+
+#===============================================================================
+# Example - Build the catalog once, then select all of the interstates in the
+# non-prime direction and add their opposite routes to an event table
+#===============================================================================
+
+if __name__ == '__main__':
+    from lrs_dataset import LRSDataset
+
+    lrs = LRSDataset(r'.\data\LRS\LRS_Full.shp', columns=['RTE_NM', 'RTE_OPPOSI'])
+    catalog = build_route_catalog(lrs.attributes, opposite_field='RTE_OPPOSI')
+    save_route_catalog(catalog, r'.\data\route_catalog.parquet')
+
+    catalog = load_route_catalog(r'.\data\route_catalog.parquet')
+    interstates = catalog.loc[(catalog['SYSTEM'] == 'IS') & ~catalog['PRIME']]
+    print(interstates[['RTE_NM', 'NUMBER', 'DIRECTION', 'OPPOSITE_RTE_NM']])
+
+    events = pd.read_csv(r'.\data\TRS20.csv')
+    events['OPPOSITE_RTE_NM'] = opposite_routes(catalog, events['RTE_NM'])
@@ -0,0 +1,177 @@
+#===============================================================================
+# Build route event geometry without arcpy
+#===============================================================================
+# How do I draw an event table on the LRS without MakeRouteEventLayer?
+#
+# flip_event_table.py draws the input events with arcpy.lr.MakeRouteEventLayer,
+# copies the event layer to memory with FeatureClassToFeatureClass, and then
+# runs MultipartToSinglepart if any of the events cross a gap in a route.
+#
+# build_event_geometry() does the same thing with the MValueStore from
+# m_value_store.py.  For each route, the begin and end measures of all of the
+# events on that route are located at once with np.searchsorted(), and the
+# vertices between them are gathered into one flat coordinate array.  The
+# lines are then created in one call to shapely.linestrings().
+#
+# An event that crosses the gap between the parts of a multipart route is
+# split into one single part line for each part, so there is no need to run
+# MultipartToSinglepart afterwards.  Each output row has the index of the
+# input event in EVENT_INDEX and the measures of its piece in PIECE_BEGIN_MSR
+# and PIECE_END_MSR.  Events on routes that aren't in the LRS, or that don't
+# overlap the route's measures, are left out.
+#
+# The output is a GeoDataFrame that can be saved to a GeoPackage or
+# GeoParquet with write_event_geometry().  Since nothing here uses arcpy, it
+# also runs on Linux.
+#===============================================================================
+# Written for GeoPandas in Python 3.7 (shapely 2.0 or newer)
+# By Dan Fourquet
+#===============================================================================
+
+import geopandas as gp
+import numpy as np
+import pandas as pd
+import shapely
+
+from m_value_store import MValueStore
+
+
+def _route_event_pieces(store, rte_nm, begin, end):
+    """ Returns (eventRow, pieceId, x, y, m) arrays with the vertices of every
+        event on one route.  eventRow is the position of the event in begin
+        and end, and pieceId numbers the single part pieces of the route. """
+    x1, y1, x2, y2, first, last = store.segment_indexes(rte_nm, begin, end)
+    hasStart = ~np.isnan(x1)
+    hasEnd = ~np.isnan(x2)
+
+    # Number of vertices for each event: begin point + route vertices + end point
+    inner = last - first
+    counts = hasStart + inner + hasEnd
+    offsets = np.r_[0, np.cumsum(counts)]
+    total = offsets[-1]
+    eventRow = np.repeat(np.arange(len(begin)), counts)
+
+    x = np.empty(total)
+    y = np.empty(total)
+    m = np.empty(total)
+    isBreak = np.zeros(total, dtype=bool)
+
+    startPos = offsets[:-1][hasStart]
+    x[startPos], y[startPos], m[startPos] = x1[hasStart], y1[hasStart], begin[hasStart]
+
+    endPos = offsets[1:][hasEnd] - 1
+    x[endPos], y[endPos], m[endPos] = x2[hasEnd], y2[hasEnd], end[hasEnd]
+
+    # Route vertices between the begin and end points
+    innerRow = np.repeat(np.arange(len(begin)), inner)
+    innerStep = np.arange(inner.sum()) - np.repeat(np.cumsum(inner) - inner, inner)
+    innerPos = offsets[:-1][innerRow] + hasStart[innerRow] + innerStep
+    vertex = first[innerRow] + innerStep
+    x[innerPos], y[innerPos], m[innerPos] = store.x[vertex], store.y[vertex], store.m[vertex]
+
+    # A new piece starts at the first vertex of each route part
+    isBreak[innerPos] = store.partStart[vertex]
+    isBreak[offsets[:-1][counts > 0]] = True
+
+    # An end measure equal to the first m-value of a part is on the far side
+    # of the gap, so the end point starts a new piece (which is dropped for
+    # having only one vertex)
+    endVertex = last[hasEnd]
+    isBreak[endPos] |= store.partStart[endVertex] & (store.m[endVertex] == end[hasEnd])
+    pieceId = np.cumsum(isBreak) - 1
+    return eventRow, pieceId, x, y, m
+
+
+def build_event_geometry(events, store, rte_nm='RTE_NM', begin_msr='BEGIN_MSR', end_msr='END_MSR', crs=None):
+    """ Returns a GeoDataFrame with a single part line for each event, or each
+        part of an event that crosses a gap in its route
+
+        events = DataFrame of linear events.  The output rows are in the same
+                 order as the events
+        store = MValueStore with the LRS
+        rte_nm, begin_msr, end_msr = The LRS field names in events
+        crs = The coordinate system of the LRS (eg 3968)
+    """
+    events = events.reset_index(drop=True)
+    routeCodes, routeNames = pd.factorize(events[rte_nm])
+    order = np.argsort(routeCodes, kind='stable')
+    bounds = np.searchsorted(routeCodes[order], np.arange(len(routeNames) + 1))
+
+    begin = events[begin_msr].to_numpy(dtype=np.float64)
+    end = events[end_msr].to_numpy(dtype=np.float64)
+
+    eventRows, pieceIds, xs, ys, ms = [], [], [], [], []
+    pieceCount = 0
+    for code, name in enumerate(routeNames):
+        if name not in store:
+            continue
+        rows = order[bounds[code]:bounds[code + 1]]
+        lo = np.minimum(begin[rows], end[rows])
+        hi = np.maximum(begin[rows], end[rows])
+        eventRow, pieceId, x, y, m = _route_event_pieces(store, name, lo, hi)
+        eventRows.append(rows[eventRow])
+        pieceIds.append(pieceId + pieceCount)
+        xs.append(x)
+        ys.append(y)
+        ms.append(m)
+        pieceCount += pieceId[-1] + 1 if len(pieceId) else 0
+
+    if not eventRows:
+        return gp.GeoDataFrame(events.iloc[:0].assign(EVENT_INDEX=[], PIECE_BEGIN_MSR=[], PIECE_END_MSR=[]), geometry=[], crs=crs)
+
+    eventRow = np.concatenate(eventRows)
+    pieceId = np.concatenate(pieceIds)
+    x, y, m = np.concatenate(xs), np.concatenate(ys), np.concatenate(ms)
+
+    # Pieces need at least two vertices to be a line
+    pieceSize = np.bincount(pieceId, minlength=pieceCount)
+    keep = pieceSize[pieceId] >= 2
+    eventRow, pieceId, x, y, m = eventRow[keep], pieceId[keep], x[keep], y[keep], m[keep]
+    pieceId = np.unique(pieceId, return_inverse=True)[1]
+
+    pieceStart = np.flatnonzero(np.r_[True, pieceId[1:] != pieceId[:-1]])
+    pieceEnd = np.r_[pieceStart[1:], len(pieceId)] - 1
+    lines = shapely.linestrings(np.column_stack([x, y]), indices=pieceId)
+
+    pieceEvents = eventRow[pieceStart]
+    output = events.iloc[pieceEvents].reset_index(drop=True)
+    output['EVENT_INDEX'] = pieceEvents
+    output['PIECE_BEGIN_MSR'] = m[pieceStart]
+    output['PIECE_END_MSR'] = m[pieceEnd]
+
+    # Keep the direction of events entered with BEGIN_MSR > END_MSR
+    reversedEvents = begin[pieceEvents] > end[pieceEvents]
+    if reversedEvents.any():
+        lines[reversedEvents] = shapely.reverse(lines[reversedEvents])
+        output.loc[reversedEvents, ['PIECE_BEGIN_MSR', 'PIECE_END_MSR']] = output.loc[reversedEvents, ['PIECE_END_MSR', 'PIECE_BEGIN_MSR']].to_numpy()
+
+    # Return the pieces in the order of the input events, with the pieces of
+    # reversed events in reverse order
+    pieceOrder = np.arange(len(output))
+    order = np.lexsort((np.where(reversedEvents, -pieceOrder, pieceOrder), pieceEvents))
+    return gp.GeoDataFrame(output.iloc[order].reset_index(drop=True), geometry=lines[order], crs=crs)
+
+
+def write_event_geometry(gdf, path, layer='events'):
+    """ Saves the output of build_event_geometry() to a GeoPackage (.gpkg) or
+        GeoParquet (.parquet) file """
+    if path.lower().endswith('.parquet'):
+        gdf.to_parquet(path, index=False)
+    elif path.lower().endswith('.gpkg'):
+        gdf.to_file(path, layer=layer, driver='GPKG')
+    else:
+        raise ValueError('Output path must end with .gpkg or .parquet')
+
+
+
+#===============================================================================
+# Example - Draw an event table on the LRS and save it as a GeoPackage
+#===============================================================================
+
+if __name__ == '__main__':
+    lrsPath = r'.\data\LRS\LRS_Full.shp'
+    events = pd.read_csv(r'.\data\events.csv')
+
+    store = MValueStore.from_shapefile(lrsPath, routes=events['RTE_NM'].unique())
+    eventGeometry = build_event_geometry(events, store, crs=3968)
+    write_event_geometry(eventGeometry, r'.\data\events.gpkg')
@@ -7,6 +7,9 @@
 # Lets say you have point coordinates and you need to find all of the routes in
 # the LRS within 50 meters of that point.  The function below will do that, given
 # a Shapely point, a distance, and the LRS as a GeoDataFrame.
+#
+# To check many points, see CoarseLRS in coarse_lrs.py, which finds the same
+# routes while only measuring to the full geometry of the routes that are close.
 #===============================================================================
 # Written for GeoPandas in Python 3.7
 # By Dan Fourquet
@@ -27,23 +30,24 @@ def select_nearby_routes(point, distance, lrs):
 # 50 meters of an input point
 #===============================================================================
 
-import geopandas as gp
-from shapely.geometry import Point
-from shapely.ops import transform
-import pyproj
+if __name__ == '__main__':
+    import geopandas as gp
+    from shapely.geometry import Point
+    from shapely.ops import transform
+    import pyproj
 
-# Set up LRS
-lrsPath = r'path\to\lrs.shp'
-lrs = gp.read_file(lrsPath)
-lrs = lrs.to_crs(epsg=3968) # Virginia Lambert required for accurate buffer distance
+    # Set up LRS
+    lrsPath = r'path\to\lrs.shp'
+    lrs = gp.read_file(lrsPath)
+    lrs = lrs.to_crs(epsg=3968) # Virginia Lambert required for accurate buffer distance
 
-# Create point
-point = Point(-77.091, 38.873)
+    # Create point
+    point = Point(-77.091, 38.873)
 
-# Project point to Virginia Lambert using pyproj
-project = pyproj.Transformer.from_crs(pyproj.CRS('EPSG:4326'), pyproj.CRS('EPSG:3968'), always_xy=True).transform
-point = transform(project, point)
+    # Project point to Virginia Lambert using pyproj
+    project = pyproj.Transformer.from_crs(pyproj.CRS('EPSG:4326'), pyproj.CRS('EPSG:3968'), always_xy=True).transform
+    point = transform(project, point)
 
-routes = select_nearby_routes(point=point, distance=50, lrs=lrs)
-print(routes)
-# ['S-VA000PR S GARFIELD ST', 'S-VA000PR N GARFIELD ST', 'R-VA   US00050EB', 'R-VA   US00050WB']
\ No newline at end of file
+    routes = select_nearby_routes(point=point, distance=50, lrs=lrs)
+    print(routes)
+    # ['S-VA000PR S GARFIELD ST', 'S-VA000PR N GARFIELD ST', 'R-VA   US00050EB', 'R-VA   US00050WB']
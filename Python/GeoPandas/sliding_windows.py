@@ -0,0 +1,159 @@
+#===============================================================================
+# Sliding window counts along routes
+#===============================================================================
+# How do I count crashes in every half mile window, stepped by a tenth of a
+# mile, along every route in the state?
+#
+# Safety and needs analyses (such as the VTrans needs that
+# tools/flip_event_table.py was written for) look for the windows along a
+# route with the most crashes.  Making a window layer and running a spatial
+# join or a cursor for each window takes hours for the whole state.
+#
+# sliding_windows() does it with arrays instead:
+#
+#   - The begin and end MP of every route come from an MValueStore (see
+#     m_value_store.py) with route_extents()
+#   - Every window on every route is made at once.  Windows are length miles
+#     long and start every step miles from the beginning of the route.  The
+#     last window on a route is cut off at the end of the route, and a route
+#     shorter than length has one window.
+#   - The points are sorted once by route and MP, and np.searchsorted finds
+#     the first and last point in every window.  Counts are the difference of
+#     those positions, and sums come from a running total (prefix sum) of each
+#     value field, so every window takes the same small amount of work no
+#     matter how many points it holds.
+#
+# Window boundaries and MPs are compared as integer thousandths of a mile (see
+# misc/fixed_measures.py), so a point at exactly the end of one window is only
+# counted in the next one.  The output is a window event table with RTE_NM,
+# BEGIN_MSR, and END_MSR that can be written with tools/event_output.py or
+# drawn with route_events.py.
+#===============================================================================
+# Written for GeoPandas in Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import numpy as np
+import pandas as pd
+
+
+def route_extents(store, routes=None):
+    """ Returns a DataFrame of RTE_NM, BEGIN_MSR, and END_MSR (the smallest and
+        largest m-value) for each route in an MValueStore.  Routes without
+        m-values are skipped. """
+    names = list(store.routes) if routes is None else [route for route in routes if route in store]
+    if not names:
+        return pd.DataFrame({'RTE_NM': [], 'BEGIN_MSR': [], 'END_MSR': []})
+
+    ranges = np.array([store.routes[name] for name in names])
+    # Gather the vertices of each route into one block so that reduceat can
+    # find the min and max of every route at once
+    sizes = ranges[:, 1] - ranges[:, 0]
+    vertexes = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+    blockStarts = np.r_[0, np.cumsum(sizes)[:-1]]
+    m = store.m[vertexes]
+    output = pd.DataFrame({
+        'RTE_NM': names,
+        'BEGIN_MSR': np.fmin.reduceat(m, blockStarts),
+        'END_MSR': np.fmax.reduceat(m, blockStarts)
+    })
+    return output.dropna().reset_index(drop=True)
+
+
+def _thousandths(values):
+    return np.rint(np.asarray(values, dtype=np.float64) * 1000).astype(np.int64)
+
+
+def make_windows(extents, length=0.5, step=0.1):
+    """ Returns a DataFrame of RTE_NM, BEGIN_MSR, and END_MSR for every window
+        on every route in extents (the output of route_extents()) """
+    begin = _thousandths(extents['BEGIN_MSR'])
+    end = _thousandths(extents['END_MSR'])
+    lengthK, stepK = int(round(length * 1000)), int(round(step * 1000))
+
+    counts = np.maximum(1, -(-(end - begin - lengthK) // stepK) + 1)
+    route = np.repeat(np.arange(len(extents)), counts)
+    windowNumber = np.arange(len(route)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    windowBegin = begin[route] + windowNumber * stepK
+    windowEnd = np.minimum(windowBegin + lengthK, end[route])
+    return pd.DataFrame({
+        'RTE_NM': extents['RTE_NM'].to_numpy()[route],
+        'BEGIN_MSR': windowBegin / 1000,
+        'END_MSR': windowEnd / 1000
+    })
+
+
+def sliding_windows(points, extents, length=0.5, step=0.1, sum_fields=(), rte_nm='RTE_NM', mp='MP', min_count=0):
+    """ Counts the points in sliding windows along every route
+
+        points = DataFrame of located point events with RTE_NM and MP
+        extents = Output of route_extents(), or any DataFrame of RTE_NM,
+                  BEGIN_MSR, and END_MSR
+        length = Length of each window in miles
+        step = Distance between the start of each window in miles
+        sum_fields = Fields in points to total in each window (eg
+                     'FATALITIES').  Missing values count as 0.
+        min_count = Only windows with at least this many points are returned
+
+        Returns a window event table with RTE_NM, BEGIN_MSR, END_MSR, LENGTH,
+        COUNT, RATE (points per mile), and SUM_<field> for each sum field.
+        Each window includes its begin MP and not its end MP, except that the
+        last window on a route includes the end of the route.
+    """
+    windows = make_windows(extents, length, step)
+    routeNames = extents['RTE_NM'].to_numpy()
+
+    # Route codes in the order of extents.  Points on other routes are dropped.
+    routeCodes = pd.Index(routeNames).get_indexer(points[rte_nm])
+    keep = (routeCodes >= 0) & points[mp].notna().to_numpy()
+    pointKeys = (routeCodes[keep].astype(np.int64) << 32) + _thousandths(points[mp].to_numpy()[keep])
+    order = np.argsort(pointKeys, kind='stable')
+    pointKeys = pointKeys[order]
+
+    windowCodes = pd.Index(routeNames).get_indexer(windows['RTE_NM']).astype(np.int64)
+    beginKeys = (windowCodes << 32) + _thousandths(windows['BEGIN_MSR'])
+    endKeys = (windowCodes << 32) + _thousandths(windows['END_MSR'])
+    routeEnd = np.r_[windowCodes[1:] != windowCodes[:-1], True]
+
+    first = np.searchsorted(pointKeys, beginKeys, side='left')
+    last = np.where(routeEnd, np.searchsorted(pointKeys, endKeys, side='right'), np.searchsorted(pointKeys, endKeys, side='left'))
+
+    windows['LENGTH'] = windows['END_MSR'] - windows['BEGIN_MSR']
+    windows['COUNT'] = last - first
+    with np.errstate(divide='ignore', invalid='ignore'):
+        windows['RATE'] = np.where(windows['LENGTH'] > 0, windows['COUNT'] / windows['LENGTH'], np.nan)
+
+    for field in ([sum_fields] if isinstance(sum_fields, str) else sum_fields):
+        values = points[field].to_numpy(dtype=np.float64)[keep][order]
+        runningTotal = np.r_[0, np.cumsum(np.nan_to_num(values))]
+        windows[f'SUM_{field}'] = runningTotal[last] - runningTotal[first]
+
+    if min_count:
+        windows = windows.loc[windows['COUNT'] >= min_count].reset_index(drop=True)
+    return windows
+
+
+def top_windows(windows, n=1, by='COUNT'):
+    """ Returns the n windows on each route with the highest value of by """
+    ranked = windows.sort_values(['RTE_NM', by, 'BEGIN_MSR'], ascending=[True, False, True], kind='stable')
+    return ranked.groupby('RTE_NM', sort=False).head(n).reset_index(drop=True)
+
+
+
+#===============================================================================
+# Example - Crashes in half mile windows stepped by a tenth of a mile on every
+# route, and the worst window on each route
+#===============================================================================
+
+if __name__ == '__main__':
+    from m_value_store import MValueStore
+
+    store = MValueStore.from_shapefile(r'.\data\LRS\LRS_Full.shp')
+    extents = route_extents(store)
+
+    crashes = pd.read_csv(r'.\data\crashes.csv')
+    windows = sliding_windows(crashes, extents, length=0.5, step=0.1, sum_fields=['FATALITIES', 'INJURIES'], min_count=1)
+
+    worst = top_windows(windows, n=1, by='COUNT')
+    worst.to_csv(r'.\data\crash_windows.csv', index=False)
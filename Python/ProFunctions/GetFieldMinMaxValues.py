@@ -6,34 +6,167 @@
 # 
 # The function below will find each of the number fields in the input feature
 # class and provide statistic values.
+#
+# For linear events such as AADT segments, a plain average gives a one mile
+# segment the same weight as a tenth of a mile segment.  Set length_weighted
+# to True to weight each row by abs(END_MSR - BEGIN_MSR), and set group_field
+# to calculate the statistics for each route, district, or route type.  In
+# this mode the table is read with one SearchCursor and every group and field
+# is calculated at once with pandas groupby, rather than one cursor per field.
 #===============================================================================
 # Written for ArcGIS Pro in Python 3
 # By Dan Fourquet
 #===============================================================================
 
-import arcpy
 import pandas as pd
 
-def get_field_statistics(featureClass, csvPath=None, scale=2):
+# Stages are timed with misc/instrumentation.py.  Importing the ProFunctions
+# package adds the misc folder to the path.  When this script is pasted into
+# the python window, add it first:
+#   sys.path.append(r'path\to\vdot-gis-cookbook\Python\misc')
+
+
+def _partial_statistics(df, fields, group_field=None, begin_msr=None, end_msr=None):
+    """ Returns a dictionary of {name: DataFrame} with the min, max, and sums
+        that the statistics of each field are calculated from.  Each DataFrame
+        has one row per group and one column per field. """
+    group = df[group_field] if group_field else pd.Series('All', index=df.index)
+    if begin_msr and end_msr:
+        weight = (df[end_msr] - df[begin_msr]).abs()
+    else:
+        weight = pd.Series(1.0, index=df.index)
+
+    values = df[fields].astype(float)
+    hasValue = values.notna()
+    weights = hasValue.mul(weight, axis=0)
+    grouped = values.groupby(group)
+
+    return {
+        'min': grouped.min(),
+        'max': grouped.max(),
+        'sum': grouped.sum(min_count=1),
+        'weighted': values.mul(weight, axis=0).groupby(group).sum(min_count=1),
+        'weights': weights.groupby(group).sum()
+    }
+
+
+def _combine_statistics(first, second):
+    """ Combines the partial statistics of two tables """
+    def combine(name):
+        return pd.concat([first[name], second[name]]).groupby(level=0)
+
+    return {
+        'min': combine('min').min(),
+        'max': combine('max').max(),
+        'sum': combine('sum').sum(min_count=1),
+        'weighted': combine('weighted').sum(min_count=1),
+        'weights': combine('weights').sum()
+    }
+
+
+def _finish_statistics(partial, fields, group_field=None, weighted=False):
+    """ Returns the output table of grouped_statistics() from the partial
+        statistics """
+    stats = {
+        'min': partial['min'],
+        'max': partial['max'],
+        'sum': partial['sum'],
+        'avg': partial['weighted'] / partial['weights']
+    }
+    if weighted:
+        stats['miles'] = partial['weights']
+
+    groupName = group_field or 'group'
+    output = pd.concat({field: pd.DataFrame({name: stat[field] for name, stat in stats.items()}) for field in fields}, names=['field', groupName])
+    output = output.reset_index()
+    return output[[groupName, 'field'] + list(stats)]
+
+
+def grouped_statistics(df, fields, group_field=None, begin_msr=None, end_msr=None):
+    """ Returns a DataFrame with the min, max, sum, and avg of each field for
+        each group in df.  If begin_msr and end_msr are given, avg is weighted
+        by the length of each row, and "miles" is the total length of the rows
+        with a value in the field. """
+    partial = _partial_statistics(df, fields, group_field, begin_msr, end_msr)
+    return _finish_statistics(partial, fields, group_field, bool(begin_msr and end_msr))
+
+
+def chunked_statistics(chunks, fields=None, group_field=None, begin_msr=None, end_msr=None):
+    """ Same as grouped_statistics() for a table that is read as an iterable
+        of DataFrames, eg pd.read_csv(path, chunksize=50000).  Only the
+        running min, max, and sums of each group are kept in memory.  If
+        fields is None, every number field in the first chunk is used except
+        group_field and the measure fields. """
+    partial = None
+    for df in chunks:
+        if fields is None:
+            fields = [field for field in df.select_dtypes('number').columns if field not in (group_field, begin_msr, end_msr)]
+        chunkPartial = _partial_statistics(df, fields, group_field, begin_msr, end_msr)
+        partial = chunkPartial if partial is None else _combine_statistics(partial, chunkPartial)
+    if partial is None:
+        raise ValueError('No rows to calculate statistics for')
+    return _finish_statistics(partial, fields, group_field, bool(begin_msr and end_msr))
+
+
+def get_field_statistics(featureClass, csvPath=None, scale=2, instrument=None, group_field=None, length_weighted=False, begin_msr='BEGIN_MSR', end_msr='END_MSR'):
     """ Calculates the minimum, maximum, sum, and average of each number field
         in the input feature class
         
         featureClass = The input feature class
-        csvPath = Path to output CSV.  If None, results will only be printed
+        csvPath = Path to output CSV.  If None, results will only be printed.
+                  If the path ends with .parquet, the results are written to
+                  Parquet instead
         scale = The number of digits to the right of the decimal.    
+        instrument = Optional Instrumentation object (see misc/instrumentation.py)
+                     that records the time spent on each field
+        group_field = Optional field to group the statistics by (eg RTE_NM or
+                      DISTRICT)
+        length_weighted = If True, averages are weighted by the length of each
+                          row and the total miles are added
+        begin_msr, end_msr = The measure fields used when length_weighted is
+                             True
     """
+    # arcpy is only imported here so that grouped_statistics() can be used
+    # without ArcGIS Pro
+    import arcpy
+    from instrumentation import Instrumentation
+
+    stage = instrument.stage if instrument else Instrumentation.null_stage
+
     # Get list of number field names
     numberFieldTypes = ["Double","Integer","Single","SmallInteger"]
     fields = [field.name for field in arcpy.ListFields(featureClass) if field.type in numberFieldTypes]
 
+    if group_field or length_weighted:
+        measureFields = [begin_msr, end_msr] if length_weighted else []
+        fields = [field for field in fields if field != group_field and field not in measureFields]
+        readFields = ([group_field] if group_field else []) + fields + measureFields
+        with stage('Calculate grouped field statistics', group_field=group_field) as s:
+            print("Calculating grouped field statistics")
+            data = pd.DataFrame([row for row in arcpy.da.SearchCursor(featureClass, readFields)], columns=readFields)
+            s.rows = len(data)
+            df = grouped_statistics(data, fields, group_field, *measureFields)
+
+        statColumns = [column for column in df.columns if column in ('min', 'max', 'sum', 'avg', 'miles')]
+        df[statColumns] = df[statColumns].round(scale)
+        print(df.to_string(index=False))
+
+        if csvPath and csvPath.lower().endswith('.parquet'):
+            df.to_parquet(csvPath, index=False)
+        elif csvPath:
+            df.to_csv(csvPath, index=False)
+        return df
+
     output = []
     for field in fields:
-        print(f"Calculating field {field}")
-        values = [row[0] for row in arcpy.da.SearchCursor(featureClass, field) if row[0] is not None]
-        statMin = round(min(values), scale)
-        statMax = round(max(values), scale)
-        statSum = round(sum(values), scale)
-        statAvg = round(statSum / len(values), scale)
+        with stage('Calculate field statistics', field=field) as s:
+            print(f"Calculating field {field}")
+            values = [row[0] for row in arcpy.da.SearchCursor(featureClass, field) if row[0] is not None]
+            s.rows = len(values)
+            statMin = round(min(values), scale)
+            statMax = round(max(values), scale)
+            statSum = round(sum(values), scale)
+            statAvg = round(statSum / len(values), scale)
 
         if scale == 0: # Stats will return as integers if scale == 0
             statMin = int(statMin)
@@ -53,7 +186,9 @@ def get_field_statistics(featureClass, csvPath=None, scale=2):
     df = pd.DataFrame(output)
     print(df.to_string(index=False))
     
-    if csvPath:
+    if csvPath and csvPath.lower().endswith('.parquet'):
+        df.to_parquet(csvPath, index=False)
+    elif csvPath:
         df.to_csv(csvPath, index=False)
 
 
@@ -62,6 +197,10 @@ def get_field_statistics(featureClass, csvPath=None, scale=2):
 # Example - The statistics for an AADT layer will be printed
 #===============================================================================
 
-fc = "https://services6.arcgis.com/V7U0SOtZo77TJV8c/arcgis/rest/services/Truck_AADT/FeatureServer/0"
+if __name__ == '__main__':
+    fc = "https://services6.arcgis.com/V7U0SOtZo77TJV8c/arcgis/rest/services/Truck_AADT/FeatureServer/0"
+
+    get_field_statistics(fc)
 
-get_field_statistics(fc)
\ No newline at end of file
+    # Length-weighted statistics for each route
+    # get_field_statistics(fc, group_field='RTE_NM', length_weighted=True, begin_msr='BEGIN_MSR', end_msr='END_MSR')
@@ -8,22 +8,40 @@
 # in the Table of Contents.
 #
 # The function is called sv(), shorthand for "StreetView".
+#
+# sv_batch() creates StreetView links for every feature in a layer (or every
+# selected feature) for QA review.  The vertices of all features are read with
+# one call to FeatureClassToNumPyArray, once in the layer's spatial reference
+# to measure the lines and once in WGS84, so no geometry methods are called
+# per feature.  The midpoints are then interpolated with numpy.  The links can
+# be written to a field in the layer, a CSV file, or an HTML review sheet.
+#
+# Since the vertices are read as points, a multipart feature is treated as if
+# its parts were connected.
 # 
 #===============================================================================
 # Written for ArcGIS Pro's Python Window
 # By Dan Fourquet
 #===============================================================================
 
+import html
 import webbrowser
 
+import arcpy
+import numpy as np
+
+# The layer is looked up through the shared registry in layer_registry.py so
+# that repeated calls to sv() don't search the project each time.  The
+# ProFunctions folder must be on the path:
+#   sys.path.append(r'path\to\vdot-gis-cookbook\Python\ProFunctions')
+from layer_registry import get_layer
+
 # This needs to be the layer name exactly as it appears in the table of contents
 # It must also be a unique name
 lineLayerName = "layerName"
 
 def sv():
-    prj = arcpy.mp.ArcGISProject("CURRENT")
-    map = prj.listMaps()[0]
-    layer = map.listLayers(lineLayerName)[0]
+    layer = get_layer(lineLayerName)
     
     # Make sure only one line segment is selected
     count = layer.getSelectionSet()
@@ -40,4 +58,93 @@ def sv():
     midpoint = geom.positionAlongLine(0.5, True).projectAs(arcpy.SpatialReference(4326)).firstPoint
 
     url = f"https://www.google.com/maps/@?api=1&map_action=pano&viewpoint={midpoint.Y},{midpoint.X}"
-    webbrowser.open(url)
\ No newline at end of file
+    webbrowser.open(url)
+
+
+def line_midpoints(oids, x, y, lng, lat):
+    """ Returns (oid, lng, lat) arrays with the midpoint of each line.  The
+        inputs are arrays of vertices in order, where all of the vertices of a
+        feature are next to each other.  x and y are used to measure the line
+        and lng and lat are the same vertices in WGS84. """
+    # Distance from the first vertex of the whole array to each vertex, not
+    # counting the jumps between features
+    newFeature = np.r_[True, oids[1:] != oids[:-1]]
+    segLengths = np.hypot(np.diff(x), np.diff(y))
+    segLengths[newFeature[1:]] = 0
+    cumLength = np.r_[0, np.cumsum(segLengths)]
+
+    starts = np.flatnonzero(newFeature)
+    ends = np.r_[starts[1:], len(oids)] - 1
+
+    # Find the segment that contains the halfway point of each feature
+    target = (cumLength[starts] + cumLength[ends]) / 2
+    i = np.searchsorted(cumLength, target, side='left')
+    i = np.clip(i, starts + 1, np.maximum(ends, starts + 1))
+    i = np.minimum(i, len(oids) - 1)
+    segLength = cumLength[i] - cumLength[i - 1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.where(segLength > 0, (target - cumLength[i - 1]) / segLength, 0)
+
+    midLng = lng[i - 1] + (lng[i] - lng[i - 1]) * ratio
+    midLat = lat[i - 1] + (lat[i] - lat[i - 1]) * ratio
+
+    # Single vertex features
+    single = starts == ends
+    midLng[single] = lng[starts[single]]
+    midLat[single] = lat[starts[single]]
+
+    return oids[starts], midLng, midLat
+
+
+def sv_batch(layerName=None, outputPath=None, urlField=None):
+    """ Creates a StreetView link at the midpoint of each feature in the
+        layer.  If features are selected, only those features are used.
+
+        layerName = The layer name as it appears in the table of contents.
+                    Defaults to lineLayerName
+        outputPath = Optional path to a .csv or .html review sheet
+        urlField = Optional text field in the layer to write the links to.  It
+                   will be added if it doesn't exist
+
+        Returns a list of (oid, url) tuples
+    """
+    layer = get_layer(layerName or lineLayerName)
+    sr = arcpy.Describe(layer).spatialReference
+
+    vertices = arcpy.da.FeatureClassToNumPyArray(layer, ['OID@', 'SHAPE@X', 'SHAPE@Y'], explode_to_points=True, skip_nulls=True)
+    vertices4326 = arcpy.da.FeatureClassToNumPyArray(layer, ['OID@', 'SHAPE@X', 'SHAPE@Y'], explode_to_points=True, skip_nulls=True, spatial_reference=arcpy.SpatialReference(4326))
+    if sr.factoryCode == 4326:
+        print('Warning - the layer is in WGS84, so distances are measured in degrees')
+
+    oids, lng, lat = line_midpoints(vertices['OID@'], vertices['SHAPE@X'], vertices['SHAPE@Y'], vertices4326['SHAPE@X'], vertices4326['SHAPE@Y'])
+    urls = [f"https://www.google.com/maps/@?api=1&map_action=pano&viewpoint={y:.7f},{x:.7f}" for x, y in zip(lng, lat)]
+    output = list(zip(oids.tolist(), urls))
+    print(f'{len(output)} StreetView links created')
+
+    if urlField:
+        if urlField not in [field.name for field in arcpy.ListFields(layer)]:
+            arcpy.AddField_management(layer, urlField, 'TEXT', field_length=255)
+        urlDict = dict(output)
+        with arcpy.da.UpdateCursor(layer, ['OID@', urlField]) as cur:
+            for row in cur:
+                if row[0] in urlDict:
+                    row[1] = urlDict[row[0]]
+                    cur.updateRow(row)
+
+    if outputPath and outputPath.lower().endswith('.csv'):
+        import csv
+        with open(outputPath, 'w', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(['OID', 'LAT', 'LNG', 'URL', 'REVIEWED', 'COMMENTS'])
+            for (oid, url), x, y in zip(output, lng, lat):
+                w.writerow([oid, round(y, 7), round(x, 7), url, '', ''])
+
+    elif outputPath:
+        with open(outputPath, 'w') as f:
+            f.write(f'<html><head><title>{html.escape(layer.name)} StreetView review</title></head><body>\n')
+            f.write(f'<h1>{html.escape(layer.name)}</h1>\n<table border="1">\n<tr><th>OID</th><th>StreetView</th><th>Reviewed</th></tr>\n')
+            for oid, url in output:
+                f.write(f'<tr><td>{oid}</td><td><a href="{html.escape(url)}" target="_blank">Open</a></td><td><input type="checkbox"></td></tr>\n')
+            f.write('</table></body></html>\n')
+
+    return output
\ No newline at end of file
@@ -1,45 +1,229 @@
 """ This tool is intended for use in the python window in ArcGIS Pro.  It will
     help to automatically find and update the begin and end msr values based
-    on begin and end coordinates if only the RTE_NM needs to be updated. """
+    on begin and end coordinates if only the RTE_NM needs to be updated.
 
-print("Functions:")
-print("    * sd(jrstagid) - Sets the definition queries for the event layers\n")
-print("    * gm() - With only one record selected in the spatial table, updates the begin and end msr values.  Requires a rte_nm\n")
-print("    * coords() - Converts coordinates from DD to individual lat and lng values to copy and paste into the attributes table\n")
-print("    * p() - Draws begin and end points for one selected record in the spatial table\n")
-print("    * compare() - Compares the lengths between the edit spatial table and the original spatial table\n")
-print("    * m() - Matches the definition query between the spatial table and the spatial table events layer\n")
+    To move a whole event table to a new LRS version, see
+    GeoPandas/lrs_migration.py, which only re-locates events on routes that
+    changed. """
 
+import arcpy
+
+# The layers are looked up through the shared registry in layer_registry.py
+# and measures are cached with measure_cache.py when the ProFunctions folder
+# is on the path:
+#   sys.path.append(r'path\to\vdot-gis-cookbook\Python\ProFunctions')
+# When this script is pasted into the python window without it, the layers are
+# looked up in the current project, nothing is cached, and the functions run
+# in the foreground.
+try:
+    from layer_registry import registry
+except ImportError:
+    registry = None
+
+try:
+    from measure_cache import measure_cache
+except ImportError:
+    measure_cache = None
+
+try:
+    from background_tasks import apply_results, run_in_background
+except ImportError:
+    def apply_results():
+        return 0
+
+    def run_in_background(compute, on_done=None, background=True):
+        result = compute()
+        if on_done:
+            on_done(result)
+        return result
+
+# When True, sd(), gm(), p(), compare(), and compare_tables() read the tables
+# and calculate their results on a background thread so that the Pro window
+# doesn't freeze.  The python window can't be told when a result is ready, so
+# the changes to the map (definition queries, the camera, and the EventPoints
+# layer) and the edits are NOT made until apply_results() is run, or until the
+# next one of these functions is run (see background_tasks.py).  Each of those
+# functions also accepts background=True/False to override this.
+BACKGROUND = False
+
+# When True, gm() only locates records that changed since the last run.  The
+# rest are served from the measure cache in measure_cache.py
+INCREMENTAL = True
+
+# Name of the map that contains the LRS and TRS layers
+MAP_NAME = 'Map'
+
+# The layers used by the python window functions.  They are looked up by
+# load_layers() the first time one of the functions is run.
+lrs = None
+TRS20 = None
+TRS21 = None
+TRS21Events = None
+EventPoints = None
+
+
+def _background(background):
+    """ Returns BACKGROUND if background is None """
+    return BACKGROUND if background is None else background
+
+
+def _project():
+    return registry.project if registry else arcpy.mp.ArcGISProject('CURRENT')
+
+
+def _layer(name):
+    if registry:
+        return registry.layer(name, MAP_NAME)
+    return _project().listMaps(MAP_NAME)[0].listLayers(name)[0]
+
+
+def _table(name):
+    if registry:
+        return registry.table(name, MAP_NAME)
+    return _project().listMaps(MAP_NAME)[0].listTables(name)[0]
+
+
+def _active_view():
+    return registry.active_view() if registry else _project().activeView
 
 
-def compare():
-    editLen = 0
-    oriLen = 0
-    with arcpy.da.SearchCursor(TRS21, ["BEGIN_MSR","END_MSR"]) as cur:
-     for row in cur:
-        editLen += abs(row[0]-row[1])
-    with arcpy.da.SearchCursor(TRS20, ['BEGIN_MSR','END_MSR']) as cur:
-     for row in cur:
-        oriLen += abs(row[0]-row[1])
-    print(f'{round(oriLen, 3)} => {round(editLen,3)}')
-    print(f'Difference: {round(abs(oriLen - editLen),3)}')
+def load_layers(reload=False):
+    """ Looks up the LRS and TRS layers in MAP_NAME.  The python window
+        functions call this the first time they are run. """
+    global lrs, TRS20, TRS21, TRS21Events, EventPoints
+    if TRS21 is not None and not reload:
+        return
+
+    lrs = _layer('SDE_VDOT_RTE_MASTER_LRS')
+    TRS20 = _layer('TBL_RDSEG_SPATIAL_21')
+    TRS21 = _table('TBL_RDSEG_SPATIAL_EDIT')
+    TRS21Events = _layer('TBL_RDSEG_SPATIAL_EDIT Events')
+    setup_points()
+    EventPoints = _layer('EventPoints')
+
+
+#===============================================================================
+# Calculations - these don't use arcpy and can be run without ArcGIS Pro
+#===============================================================================
+
+def total_length(msrRows):
+    """ Returns the total length of a list of (begin_msr, end_msr) rows """
+    return sum(abs(begin_msr - end_msr) for begin_msr, end_msr in msrRows)
+
+
+def length_comparison(old_begin_msr, old_end_msr, begin_msr, end_msr):
+    """ Returns the (old length, new length, difference) of a record """
+    oldLength = round(abs(old_begin_msr - old_end_msr), 3)
+    newLength = round(abs(begin_msr - end_msr), 3)
+    diffLength = round(abs(oldLength - newLength), 3)
+    return oldLength, newLength, diffLength
+
+
+def _thousandths(begin_msr, end_msr):
+    """ Returns the length of a record in integer thousandths of a mile """
+    return abs(round(begin_msr * 1000) - round(end_msr * 1000))
+
+
+def length_diffs(oldRows, splitRows, newRows):
+    """ Returns a dictionary of {jrs: length difference} between the
+        original and edited spatial tables
+
+        oldRows = (juris_no, route_no, seq_no, begin_msr, end_msr) rows from
+                  the original table
+        splitRows = (begin_msr, end_msr, jrstag_ori) rows for the records in
+                    the edit table that were inserted by splitting a segment
+        newRows = (juris_no, route_no, seq_no, begin_msr, end_msr) rows for
+                  the rest of the records in the edit table
+
+        Lengths are added and compared as integer thousandths of a mile (see
+        misc/fixed_measures.py) so that the split lengths add up exactly.
+    """
+    OldLengths = {}
+    for juris_no, route_no, seq_no, begin_msr, end_msr in oldRows:
+        try:
+            jrs = f'{juris_no}{route_no}{seq_no}'
+            length = _thousandths(begin_msr, end_msr)
+            OldLengths[jrs] = length
+        except:
+            continue
+
+    NewLengthsSplits = {}
+    for begin_msr, end_msr, jrstag_ori in splitRows:
+        jrsOri = f'{jrstag_ori[:3]}0{jrstag_ori[3:]}'
+        length = _thousandths(begin_msr, end_msr)
+        if jrsOri in NewLengthsSplits:
+            NewLengthsSplits[jrsOri].append(length)
+        else:
+            NewLengthsSplits[jrsOri] = [length]
+
+    NewLengths = {}
+    for juris_no, route_no, seq_no, begin_msr, end_msr in newRows:
+        try:
+            jrs = f'{juris_no}{route_no}{seq_no}'
+            length = _thousandths(begin_msr, end_msr)
+            if jrs in NewLengthsSplits:
+                length = length + sum(NewLengthsSplits[jrs])
+            NewLengths[jrs] = length
+        except:
+            continue
+
+    LengthDiff = {}
+    for segment in NewLengths:
+        if segment in OldLengths:
+            newL = NewLengths[segment]
+            oldL = OldLengths[segment]
+            diff = abs(newL - oldL) / 1000
+            LengthDiff[segment] = diff
+
+    return LengthDiff
+
+
+#===============================================================================
+# Python window functions
+#===============================================================================
+
+def compare(background=None):
+    load_layers()
+    def compute():
+        editRows = [row for row in arcpy.da.SearchCursor(TRS21, ["BEGIN_MSR","END_MSR"])]
+        oriRows = [row for row in arcpy.da.SearchCursor(TRS20, ['BEGIN_MSR','END_MSR'])]
+        return total_length(oriRows), total_length(editRows)
+
+    def on_done(lengths):
+        oriLen, editLen = lengths
+        print(f'{round(oriLen, 3)} => {round(editLen,3)}')
+        print(f'Difference: {round(abs(oriLen - editLen),3)}')
+
+    return run_in_background(compute, on_done, _background(background))
 
 
 
 def m():
+    load_layers()
     TRS21Events.definitionQuery = TRS21.definitionQuery
 
 
-def sd(x):
-    arcpy.management.SelectLayerByAttribute(TRS21, 'CLEAR_SELECTION')
+def sd(x, background=None):
+    load_layers()
     x = str(x)
     sql = f"ALTERNATE_RTE = '{x}'"
-    TRS20.definitionQuery = sql
-    TRS20.visible = True
-    TRS21.definitionQuery = sql
-    TRS21Events.definitionQuery = sql
-    zoom_to_layer(TRS20.name)
-    p(updateWithoutSelection=True)
+
+    # The begin and end points are read from the table's data source with the
+    # new query, so the current definition query doesn't need to be changed
+    # until the points are ready
+    def compute():
+        return read_event_points(TRS21.dataSource, sql)
+
+    def on_done(points):
+        arcpy.management.SelectLayerByAttribute(TRS21, 'CLEAR_SELECTION')
+        TRS20.definitionQuery = sql
+        TRS20.visible = True
+        TRS21.definitionQuery = sql
+        TRS21Events.definitionQuery = sql
+        zoom_to_layer(TRS20.name)
+        draw_event_points(*points)
+
+    return run_in_background(compute, on_done, _background(background))
 
 
 def zoom_to_layer(layerName):
@@ -51,9 +235,10 @@ def zoom_to_layer(layerName):
         (if something else like the attributes table is active, it will return
         an error).  This is a built-in limitation of arcpy. """
     print(f'Zooming to {layerName}...')
-    layer = map.listLayers(layerName)[0]
+    mapView = _active_view()
+    layer = _layer(layerName)
     newExtent = mapView.getLayerExtent(layer)
-    camera.setExtent(newExtent)
+    mapView.camera.setExtent(newExtent)
 
 
 def get_line_mp(inputPolyline, lrs, rte_nm):
@@ -121,19 +306,86 @@ def get_line_mp(inputPolyline, lrs, rte_nm):
         return None, None
 
 
-def gm():
-    if TRS21.getSelectionSet():
-        with arcpy.da.UpdateCursor(TRS21, ['RTE_NM','BEGIN_MSR','END_MSR','BEGIN_LAT','BEGIN_LONG','END_LAT','END_LONG', 'JURIS_NO','ROUTE_NO','SEQ_NO']) as cur:
+def gm(background=None, incremental=None):
+    """ Updates the begin and end msr values of the selected records.  If
+        incremental is True (see INCREMENTAL), records that haven't changed
+        since the last run are served from the measure cache. """
+    load_layers()
+    if not TRS21.getSelectionSet():
+        return
+
+    if incremental is None:
+        incremental = INCREMENTAL
+    incremental = incremental and measure_cache is not None
+
+    fields = ['OID@','RTE_NM','BEGIN_LAT','BEGIN_LONG','END_LAT','END_LONG','JURIS_NO','ROUTE_NO','SEQ_NO']
+
+    def compute():
+        rows = [row for row in arcpy.da.SearchCursor(TRS21, fields)]
+
+        # The results depend on every field that is read, so all of them are
+        # included in the hash
+        namespace = measure_cache.namespace(TRS21, lrs) if incremental else None
+        hashes = {row[0]: measure_cache.row_hash(*row[1:]) for row in rows} if incremental else {}
+        cached = measure_cache.lookup(namespace, hashes) if incremental else {}
+
+        results = list(cached.values())
+        newResults = {}
+        for oid, rte_nm, begin_lat, begin_long, end_lat, end_long, juris_no, route_no, seq_no in rows:
+            if oid in cached:
+                continue
+
+            beginPoint = arcpy.Point(begin_long, begin_lat)
+            endPoint = arcpy.Point(end_long, end_lat)
+            polyline = arcpy.Polyline(arcpy.Array([beginPoint, endPoint]), arcpy.SpatialReference(4326)).projectAs(arcpy.SpatialReference(3857))
+            begin_msr, end_msr = get_line_mp(polyline, lrs, rte_nm)
+
+            # Get the old measures to compare to TRS20
+            sql = f"JURIS_NO = '{juris_no}' AND ROUTE_NO = '{route_no}' AND SEQ_NO = '{seq_no}'"
+            oldMsrs = [row for row in arcpy.da.SearchCursor(TRS20, ['BEGIN_MSR', 'END_MSR'], sql)]
+            result = {
+                'oid': oid,
+                'rte_nm': rte_nm,
+                'begin': (beginPoint.X, beginPoint.Y),
+                'end': (endPoint.X, endPoint.Y),
+                'projected': ((polyline.firstPoint.X, polyline.firstPoint.Y), (polyline.lastPoint.X, polyline.lastPoint.Y)),
+                'msrs': (begin_msr, end_msr),
+                'oldMsrs': oldMsrs
+            }
+            results.append(result)
+            if incremental and begin_msr is not None:
+                newResults[oid] = (hashes[oid], result)
+
+        if incremental:
+            measure_cache.store(namespace, newResults)
+        return results, set(cached)
+
+    def on_done(output):
+        results, cachedOids = output
+        if cachedOids:
+            print(f'{len(cachedOids)} unchanged records served from the measure cache')
+
+        results = {result['oid']: result for result in results}
+        with arcpy.da.UpdateCursor(TRS21, ['OID@','BEGIN_MSR','END_MSR']) as cur:
             for row in cur:
-                print(row[0])
-                beginPoint = arcpy.Point(row[4], row[3])
-                endPoint = arcpy.Point(row[6], row[5])
-                polyline = arcpy.Polyline(arcpy.Array([beginPoint, endPoint]), arcpy.SpatialReference(4326)).projectAs(arcpy.SpatialReference(3857))
-                print(beginPoint.X, beginPoint.Y)
-                print(endPoint.X, endPoint.Y)
-                print(polyline.firstPoint.X, polyline.firstPoint.Y)
-                print(polyline.lastPoint.X, polyline.lastPoint.Y)
-                begin_msr, end_msr = get_line_mp(polyline, lrs, row[0])
+                result = results.get(row[0])
+                if not result:
+                    continue
+
+                # Unchanged records are only written if the table doesn't
+                # already have the cached measures
+                if row[0] in cachedOids:
+                    if [row[1], row[2]] != list(result['msrs']):
+                        row[1], row[2] = result['msrs']
+                        cur.updateRow(row)
+                    continue
+
+                print(result['rte_nm'])
+                print(*result['begin'])
+                print(*result['end'])
+                print(*result['projected'][0])
+                print(*result['projected'][1])
+                begin_msr, end_msr = result['msrs']
 
                 print(begin_msr, end_msr)
                 row[1] = begin_msr
@@ -141,33 +393,34 @@ def gm():
                 cur.updateRow(row)
 
                 # Compare Distance to TRS20
-                sql = f"JURIS_NO = '{row[7]}' AND ROUTE_NO = '{row[8]}' AND SEQ_NO = '{row[9]}'"
-                with arcpy.da.SearchCursor(TRS20, ['BEGIN_MSR', 'END_MSR'], sql) as cur2:
-                    for old_begin_msr, old_end_msr in cur2:
-                        print('\n\nLength Comparison:')
-                        oldLength = round(abs(old_begin_msr - old_end_msr), 3)
-                        newLength = round(abs(begin_msr - end_msr), 3)
-                        diffLength = round(abs(oldLength - newLength), 3)
-                        print(f'    {oldLength} => {newLength}')
-                        print(f'    difference: {diffLength}')
-                        if diffLength > 0.15:
-                            print('\n\n\nWARNING - large difference in new mileage\n\n\n')
+                for old_begin_msr, old_end_msr in result['oldMsrs']:
+                    print('\n\nLength Comparison:')
+                    oldLength, newLength, diffLength = length_comparison(old_begin_msr, old_end_msr, begin_msr, end_msr)
+                    print(f'    {oldLength} => {newLength}')
+                    print(f'    difference: {diffLength}')
+                    if diffLength > 0.15:
+                        print('\n\n\nWARNING - large difference in new mileage\n\n\n')
+
+    return run_in_background(compute, on_done, _background(background))
 
 
 def coords(coordStr):
     # 77.4091688?W 37.5253562?N
+    # For a whole column of coordinate strings, see
+    # GeoPandas/parse_coordinates.py
 
     lng = coordStr.split(' ')[0].split(u"\N{DEGREE SIGN}")[0]
     lng = float(lng)*-1
     lat = coordStr.split(' ')[1].split(u"\N{DEGREE SIGN}")[0]
-    lt = float(lat)
+    lat = float(lat)
     print(f'lat:\n{lat}')
     print(f'\nlng:\n{lng}')
+    return lat, lng
 
 
 def setup_points():
     try:
-        map.listLayers('EventPoints')[0]
+        _layer('EventPoints')
     except:
         arcpy.management.CreateFeatureclass('memory','EventPoints','POINT')
         arcpy.management.AddField('memory/EventPoints','type','TEXT')
@@ -176,95 +429,88 @@ def setup_points():
             cur.insertRow(['End'])
 
 
-def p(BeginLng=None, BeginLat=None, EndLng=None, EndLat=None, updateWithoutSelection=False):
+def read_event_points(table, sql=None, BeginLng=None, BeginLat=None, EndLng=None, EndLat=None):
+    """ Returns the begin and end points of the last record in the table as
+        Web Mercator point geometries """
+    with arcpy.da.SearchCursor(table, ['BEGIN_LAT','BEGIN_LONG','END_LAT','END_LONG'], sql) as cur:
+        for begin_lat, begin_long, end_lat, end_long in cur:
+            BeginLng = begin_long
+            BeginLat = begin_lat
+            EndLng = end_long
+            EndLat = end_lat
+
+    BeginPt = arcpy.PointGeometry(arcpy.Point(BeginLng, BeginLat), arcpy.SpatialReference(4326)).projectAs(arcpy.SpatialReference(3857))
+    EndPt = arcpy.PointGeometry(arcpy.Point(EndLng, EndLat), arcpy.SpatialReference(4326)).projectAs(arcpy.SpatialReference(3857))
+    return BeginPt, EndPt
+
+
+def draw_event_points(BeginPt, EndPt):
+    """ Moves the Begin and End features in the EventPoints layer """
+    print(BeginPt.firstPoint.X,BeginPt.firstPoint.Y)
+    print(EndPt.firstPoint.X,EndPt.firstPoint.Y)
+    with arcpy.da.UpdateCursor('memory/EventPoints',['type', 'SHAPE@']) as cur:
+        for row in cur:
+            if row[0] == 'Begin':
+                row[1] = BeginPt
+            if row[0] == 'End':
+                row[1] = EndPt
+            cur.updateRow(row)
+
+
+def p(BeginLng=None, BeginLat=None, EndLng=None, EndLat=None, updateWithoutSelection=False, background=None):
+    load_layers()
     if TRS21.getSelectionSet() or updateWithoutSelection:
         if not updateWithoutSelection and len(TRS21.getSelectionSet()) > 1:
             print('Select only one record in the spatial table.')
             return
         else:
             print('Updating Points...')
-            with arcpy.da.SearchCursor(TRS21, ['BEGIN_LAT','BEGIN_LONG','END_LAT','END_LONG']) as cur:
-                for begin_lat, begin_long, end_lat, end_long in cur:
-                    BeginLng = begin_long
-                    BeginLat = begin_lat
-                    EndLng = end_long
-                    EndLat = end_lat
-
-            BeginPt = arcpy.PointGeometry(arcpy.Point(BeginLng, BeginLat), arcpy.SpatialReference(4326)).projectAs(arcpy.SpatialReference(3857))
-            EndPt = arcpy.PointGeometry(arcpy.Point(EndLng, EndLat), arcpy.SpatialReference(4326)).projectAs(arcpy.SpatialReference(3857))
-            print(BeginPt.firstPoint.X,BeginPt.firstPoint.Y)
-            print(EndPt.firstPoint.X,EndPt.firstPoint.Y)
-            with arcpy.da.UpdateCursor('memory/EventPoints',['type', 'SHAPE@']) as cur:
-                for row in cur:
-                    if row[0] == 'Begin':
-                        row[1] = BeginPt
-                    if row[0] == 'End':
-                        row[1] = EndPt
-                    cur.updateRow(row)
+            def compute():
+                return read_event_points(TRS21, None, BeginLng, BeginLat, EndLng, EndLat)
+
+            def on_done(points):
+                draw_event_points(*points)
+
+            return run_in_background(compute, on_done, _background(background))
     else:
         print('No record selected in the spatial table.')
 
-def compare_tables(min=0.15, max=9999):
-    TRS20.definitionQuery = ""
-    TRS21.definitionQuery = ""
+def compare_tables(min=0.15, max=9999, background=None):
+    load_layers()
 
-    OldLengths = {}
-    with arcpy.da.SearchCursor(TRS20, ['JURIS_NO','ROUTE_NO','SEQ_NO','BEGIN_MSR','END_MSR']) as cur:
-        for juris_no, route_no, seq_no, begin_msr, end_msr in cur:
-            try:
-                jrs = f'{juris_no}{route_no}{seq_no}'
-                length = round(abs(begin_msr - end_msr),3)
-                OldLengths[jrs] = length
-            except:
-                continue
+    # Both tables are read from their data sources so that all records are
+    # compared without changing the definition queries until the end
+    def compute():
+        oldRows = [row for row in arcpy.da.SearchCursor(TRS20.dataSource, ['JURIS_NO','ROUTE_NO','SEQ_NO','BEGIN_MSR','END_MSR'])]
+        splitRows = [row for row in arcpy.da.SearchCursor(TRS21.dataSource, ['BEGIN_MSR','END_MSR','JRSTAG_ORI'], "STATUS_ID IS NULL AND CHANGE_TYPE_ID = 'I'")]
+        newRows = [row for row in arcpy.da.SearchCursor(TRS21.dataSource, ['JURIS_NO','ROUTE_NO','SEQ_NO','BEGIN_MSR','END_MSR'], "STATUS_ID IS NULL AND CHANGE_TYPE_ID NOT IN ('I','A','D')")]
+        return length_diffs(oldRows, splitRows, newRows)
 
-    NewLengthsSplits = {}
-    with arcpy.da.SearchCursor(TRS21, ['JURIS_NO','ROUTE_NO','SEQ_NO','BEGIN_MSR','END_MSR','JRSTAG_ORI','CHANGE_TYPE_ID'], "STATUS_ID IS NULL AND CHANGE_TYPE_ID = 'I'") as cur:
-        for juris_no, route_no, seq_no, begin_msr, end_msr, jrstag_ori, change_type_id in cur:
-            jrs = f'{juris_no}{route_no}{seq_no}'
-            jrsOri = f'{jrstag_ori[:3]}0{jrstag_ori[3:]}'
-            length = round(abs(begin_msr - end_msr),3)
-            if jrsOri in NewLengthsSplits:
-                NewLengthsSplits[jrsOri].append(length)
-            else:
-                NewLengthsSplits[jrsOri] = [length]
+    def on_done(LengthDiff):
+        TRS20.definitionQuery = ""
+        TRS21.definitionQuery = ""
 
-    NewLengths = {}
-    with arcpy.da.SearchCursor(TRS21, ['JURIS_NO','ROUTE_NO','SEQ_NO','BEGIN_MSR','END_MSR','JRSTAG_ORI','CHANGE_TYPE_ID'], "STATUS_ID IS NULL AND CHANGE_TYPE_ID NOT IN ('I','A','D')") as cur:
-        for juris_no, route_no, seq_no, begin_msr, end_msr, jrstag_ori, change_type_id in cur:
-            try:
-                jrs = f'{juris_no}{route_no}{seq_no}'
-                length = round(abs(begin_msr - end_msr),3)
-                if jrs in NewLengthsSplits:
-                    length = length + sum(NewLengthsSplits[jrs])
-                NewLengths[jrs] = length
-            except:
-                continue
+        for key, value in LengthDiff.items():
+            if max > value > min:
+                print(f'{key}: {value}')
 
-    LengthDiff = {}
-    for segment in NewLengths:
-        if segment in OldLengths:
-            newL = NewLengths[segment]
-            oldL = OldLengths[segment]
-            diff = round(abs(newL-oldL),3)
-            LengthDiff[segment] = diff
+    return run_in_background(compute, on_done, _background(background))
 
-    for key, value in LengthDiff.items():
-        if max > value > min:
-            print(f'{key}: {value}')
 
 
+if __name__ == '__main__':
+    print("Functions:")
+    print("    * sd(jrstagid) - Sets the definition queries for the event layers\n")
+    print("    * gm() - With only one record selected in the spatial table, updates the begin and end msr values.  Requires a rte_nm\n")
+    print("    * coords() - Converts coordinates from DD to individual lat and lng values to copy and paste into the attributes table\n")
+    print("    * p() - Draws begin and end points for one selected record in the spatial table\n")
+    print("    * compare() - Compares the lengths between the edit spatial table and the original spatial table\n")
+    print("    * m() - Matches the definition query between the spatial table and the spatial table events layer\n")
+    print(f"    sd, gm, p, compare, and compare_tables run in the background when BACKGROUND = True (currently {BACKGROUND})")
+    print("    * apply_results() - With BACKGROUND = True, updates the map with the results of the background functions that have finished\n")
 
-prj = arcpy.mp.ArcGISProject("CURRENT")
-map = prj.listMaps('Map')[0]
-lrs = map.listLayers('SDE_VDOT_RTE_MASTER_LRS')[0]
-TRS20 = map.listLayers('TBL_RDSEG_SPATIAL_21')[0]
-TRS21 = map.listTables('TBL_RDSEG_SPATIAL_EDIT')[0]
-TRS21Events = map.listLayers('TBL_RDSEG_SPATIAL_EDIT Events')[0]
-setup_points()
-EventPoints = map.listLayers('EventPoints')[0]
-try:
-    mapView = prj.activeView
-    camera = mapView.camera
-except:
-    print('Failed to get active view.  Make sure map tab is active and try again')
+    load_layers()
+    try:
+        _active_view().camera
+    except:
+        print('Failed to get active view.  Make sure map tab is active and try again')
@@ -0,0 +1,30 @@
+""" ArcGIS Pro python window functions
+
+    Importing this package doesn't import any of the functions (or arcpy).
+    Each name below is loaded from its script the first time it is used, eg
+
+        from ProFunctions import grouped_statistics
+
+    get_field_statistics() times its steps with misc/instrumentation.py, so
+    the misc folder is added to the path too. """
+
+from _lazy_exports import lazy_exports
+
+# {name: script module}
+_EXPORTS = {
+    'run_in_background': 'background_tasks',
+    'apply_results': 'background_tasks',
+    'get_field_statistics': 'GetFieldMinMaxValues',
+    'grouped_statistics': 'GetFieldMinMaxValues',
+    'chunked_statistics': 'GetFieldMinMaxValues',
+    'LayerRegistry': 'layer_registry',
+    'get_layer': 'layer_registry',
+    'MeasureCache': 'measure_cache',
+    'single_line_to_single_route': 'single_line_to_single_route',
+    'sv': 'StreetviewFromLine',
+    'sv_batch': 'StreetviewFromLine',
+    'length_diffs': 'UpdateRTE_NMAndMsr',
+    'zoom_to_layer': 'zoom_to_layer_extent'
+}
+
+__getattr__, __dir__, __all__ = lazy_exports(__name__, __file__, _EXPORTS, uses=['misc'])
@@ -0,0 +1,132 @@
+#===============================================================================
+# Background tasks for the python window
+#===============================================================================
+# How do I read tables on a background thread without freezing Pro, and still
+# make the changes to the map from the python window?
+#
+# Reading a large table with a SearchCursor can freeze the Pro window for a
+# while.  The reading and the calculations can be done on a worker thread, but
+# arcpy.mp objects (definition queries, the camera, layers) and edit cursors
+# should only be used from the python window's own thread.
+#
+# run_in_background() splits the work in two:
+#
+#   compute() - Runs on the worker thread.  Reads tables and returns a result
+#   on_done(result) - Makes the changes to the map and the edits.  It is only
+#                     run from the python window's thread
+#
+# The python window doesn't have an event loop that the worker could hand the
+# result to, so on_done() is run the next time the python window asks for it:
+#
+#   apply_results()   Runs on_done() for every task that has finished
+#   task.result()     Waits for one task and runs its on_done()
+#
+# Nothing is changed on the map until one of those is called.  Starting
+# another task also applies the results that are ready, so running the
+# functions one after another keeps the map up to date.  Results are applied
+# in the order that the tasks were started.
+#===============================================================================
+# Written for ArcGIS Pro in Python 3
+# By Dan Fourquet
+#===============================================================================
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+_executor = ThreadPoolExecutor(max_workers=1)
+_pending = []
+
+
+class BackgroundTask:
+    """ A compute() that is running on the worker thread and the on_done()
+        to apply its result with
+
+        future = concurrent.futures.Future of compute()
+        on_done = Function that is passed the result, or None
+    """
+    def __init__(self, future, on_done=None):
+        self.future = future
+        self.on_done = on_done
+        self.applied = False
+        self._thread = threading.get_ident()
+
+    def done(self):
+        """ True when compute() has finished """
+        return self.future.done()
+
+    def apply(self):
+        """ Runs on_done() if compute() has finished and it hasn't been run
+            yet.  Returns True if the task has been applied. """
+        if self.applied:
+            return True
+        if not self.future.done():
+            return False
+        if threading.get_ident() != self._thread:
+            raise RuntimeError('Background results must be applied from the thread that started the task')
+
+        self.applied = True
+        if self in _pending:
+            _pending.remove(self)
+        if self.future.exception():
+            print(f'Error: {self.future.exception()}')
+        elif self.on_done:
+            self.on_done(self.future.result())
+        return True
+
+    def result(self, timeout=None):
+        """ Waits for compute() to finish, applies the result, and returns it """
+        self.future.exception(timeout)
+        apply_results()
+        self.apply()
+        return self.future.result()
+
+
+def apply_results():
+    """ Runs on_done() for the finished tasks, in the order they were started.
+        Returns the number of tasks that are still running. """
+    while _pending and _pending[0].apply():
+        pass
+    return len(_pending)
+
+
+def run_in_background(compute, on_done=None, background=True):
+    """ Runs compute() on the background worker thread and returns a
+        BackgroundTask.  on_done() is passed the result the next time
+        apply_results() is called from the python window, or when
+        task.result() is called.
+
+        If background is False, compute() and on_done() are run immediately
+        and the returned task has already been applied. """
+    apply_results()
+
+    if background:
+        task = BackgroundTask(_executor.submit(compute), on_done)
+        _pending.append(task)
+        return task
+
+    future = Future()
+    try:
+        future.set_result(compute())
+    except Exception as e:
+        future.set_exception(e)
+    task = BackgroundTask(future, on_done)
+    task.apply()
+    return task
+
+
+
+#===============================================================================
+# Example - Add up a table's lengths in the background, then print them from
+# the python window
+#===============================================================================
+
+if __name__ == '__main__':
+    import arcpy
+
+    def compute():
+        return sum(abs(end - begin) for begin, end in arcpy.da.SearchCursor('TBL_RDSEG_SPATIAL_EDIT', ['BEGIN_MSR', 'END_MSR']))
+
+    task = run_in_background(compute, lambda length: print(f'Total length: {round(length, 3)}'))
+
+    # ...later, in the python window
+    apply_results()
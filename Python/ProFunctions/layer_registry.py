@@ -0,0 +1,164 @@
+#===============================================================================
+# Cached project, map, and layer handles
+#===============================================================================
+# How do I get a layer by name without searching the whole project every time?
+#
+# Most of the python window functions start with the same three lines:
+#
+#   prj = arcpy.mp.ArcGISProject("CURRENT")
+#   map = prj.listMaps()[0]
+#   layer = map.listLayers(name)[0]
+#
+# In a large project, listMaps() and listLayers() can take a noticeable amount
+# of time because Pro has to walk through every map and layer.  The
+# LayerRegistry below looks each project, map, layer, table, and the active
+# view up once and keeps the handle, so later calls return right away.
+#
+# Cached handles are checked before they are returned.  A layer that has been
+# renamed is looked up again, and every handle is refreshed after max_age
+# seconds in case layers were removed and re-added with the same name.  Call
+# registry.clear() after making big changes to the table of contents.
+#
+# The module creates one shared registry.  The other python window functions
+# use it with:
+#
+#   import sys
+#   sys.path.append(r'path\to\vdot-gis-cookbook\Python\ProFunctions')
+#   from layer_registry import registry, get_layer
+#
+# Since python only imports a module once, every function that imports the
+# registry shares the same cache.
+#===============================================================================
+# Written for ArcGIS Pro in Python 3
+# By Dan Fourquet
+#===============================================================================
+
+import time
+
+import arcpy
+
+
+class LayerRegistry:
+    """ Looks up and caches handles to the current project's maps, layers,
+        tables, and active view
+
+        max_age = Number of seconds that a handle is used before it is looked
+                  up again
+    """
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._project = None
+        self._cache = {}
+
+    @property
+    def project(self):
+        """ The current ArcGIS Pro project """
+        if self._project is None:
+            self._project = arcpy.mp.ArcGISProject("CURRENT")
+        return self._project
+
+    def map(self, name=None):
+        """ Returns the map with the input name, or the first map in the
+            project if name is None """
+        def lookup():
+            maps = self.project.listMaps(name) if name else self.project.listMaps()
+            if not maps:
+                raise ValueError(f'Map "{name}" not found')
+            return maps[0]
+
+        return self._get(('map', None, name), lookup, lambda m: not name or m.name == name)
+
+    def layer(self, name, mapName=None):
+        """ Returns the layer with the input name as it appears in the table of
+            contents """
+        def lookup():
+            layers = self.map(mapName).listLayers(name)
+            if not layers:
+                raise ValueError(f'Layer "{name}" not found')
+            return layers[0]
+
+        return self._get(('layer', mapName, name), lookup, lambda layer: layer.name == name)
+
+    def table(self, name, mapName=None):
+        """ Returns the standalone table with the input name as it appears in
+            the table of contents """
+        def lookup():
+            tables = self.map(mapName).listTables(name)
+            if not tables:
+                raise ValueError(f'Table "{name}" not found')
+            return tables[0]
+
+        return self._get(('table', mapName, name), lookup, lambda table: table.name == name)
+
+    def active_view(self):
+        """ Returns the active map view.  The Map tab must be active the first
+            time this is called (this is a built-in limitation of arcpy). """
+        def lookup():
+            view = self.project.activeView
+            if view is None or not hasattr(view, 'camera'):
+                raise ValueError('Failed to get active view.  Make sure map tab is active and try again')
+            return view
+
+        return self._get(('view', None, None), lookup, lambda view: view.camera is not None)
+
+    def camera(self):
+        """ Returns the camera of the active map view """
+        return self.active_view().camera
+
+    def clear(self, name=None):
+        """ Removes everything from the cache, or only the handles with the
+            input name """
+        if name is None:
+            self._cache.clear()
+            self._project = None
+        else:
+            for key in [key for key in self._cache if key[2] == name]:
+                del self._cache[key]
+
+    def _get(self, key, lookup, isValid):
+        """ Returns the cached handle for key if it is still valid.  Otherwise
+            the handle is looked up and cached. """
+        entry = self._cache.get(key)
+        if entry:
+            handle, cachedTime = entry
+            try:
+                if time.monotonic() - cachedTime < self.max_age and isValid(handle):
+                    return handle
+            except Exception:
+                # The object behind the handle no longer exists
+                pass
+
+        handle = lookup()
+        self._cache[key] = (handle, time.monotonic())
+        return handle
+
+
+registry = LayerRegistry()
+
+
+def get_layer(layer, mapName=None):
+    """ Returns a layer from the shared registry.  layer can be the name of
+        the layer as it appears in the table of contents, or a layer object,
+        which is returned as-is.  If the layer isn't in the map, every other
+        map in the project is searched before giving up. """
+    if not isinstance(layer, str):
+        return layer
+    try:
+        return registry.layer(layer, mapName)
+    except ValueError:
+        for m in registry.project.listMaps():
+            layers = m.listLayers(layer)
+            if layers:
+                return layers[0]
+        raise
+
+
+
+#===============================================================================
+# Example - Get the same layer twice.  The second call uses the cached handle.
+#===============================================================================
+
+if __name__ == '__main__':
+    lrs = registry.layer('SDE_VDOT_RTE_MASTER_LRS')
+    lrs = registry.layer('SDE_VDOT_RTE_MASTER_LRS')
+    registry.camera().setExtent(registry.active_view().getLayerExtent(lrs))
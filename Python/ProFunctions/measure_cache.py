@@ -0,0 +1,211 @@
+#===============================================================================
+# Incremental measure cache
+#===============================================================================
+# How do I avoid locating measures again for records that haven't changed?
+#
+# When editing an event table, the same records are often run through gm() or
+# single_line_to_single_route() over and over while checking the results.
+# Each run reads the geometry with a new SearchCursor and queries the LRS,
+# even for records that haven't been touched since the last run.
+#
+# The MeasureCache below stores the result for each OID along with a hash of
+# the values that the result depends on (the geometry or coordinates and the
+# RTE_NM).  On the next run, a record whose hash hasn't changed is served from
+# the cache, and only records that were edited are located again.
+#
+# The cache is saved in a small SQLite database in the user's home folder, so
+# it survives restarting Pro.  Results are grouped by a namespace that
+# identifies the edit table, the LRS, and the LRS version, so that results are
+# never shared between different tables or LRS versions.  Use
+# measure_cache.namespace(table, lrs) to get it.  An LRS that is republished
+# at the same path is treated as a new version (see lrs_version()), and the
+# results for the old version are removed.  The version of each LRS is only
+# worked out once per session, so after republishing the LRS without
+# restarting Pro, call lrs_version(lrs, refresh=True).
+#
+# Like the layer registry, one shared cache is created when the module is
+# imported:
+#
+#   import sys
+#   sys.path.append(r'path\to\vdot-gis-cookbook\Python\ProFunctions')
+#   from measure_cache import measure_cache
+#===============================================================================
+# Written for ArcGIS Pro in Python 3
+# By Dan Fourquet
+#===============================================================================
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.vdot_measure_cache.sqlite')
+
+# {LRS path: version} for the LRS versions worked out this session
+_versions = {}
+
+
+def lrs_version(lrs, refresh=False):
+    """ Returns a string that changes when the LRS is republished: a hash of
+        its row count, its extent, and the modified time of its file (or file
+        geodatabase).  The version is remembered for each path, so the LRS is
+        only read the first time unless refresh is True.
+
+        lrs = Layer or path to the LRS
+    """
+    import arcpy
+
+    source = getattr(lrs, 'dataSource', lrs)
+    if source in _versions and not refresh:
+        return _versions[source]
+
+    extent = arcpy.Describe(source).extent
+    parts = [arcpy.management.GetCount(source)[0], extent.XMin, extent.YMin, extent.XMax, extent.YMax]
+
+    # A feature class in a geodatabase doesn't have its own file, so the
+    # nearest folder or file that does exist is used
+    path = source
+    while path and not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    if path and os.path.isdir(path):
+        parts.append(max([os.path.getmtime(os.path.join(path, name)) for name in os.listdir(path)], default=0))
+    elif path and os.path.exists(path):
+        parts.append(os.path.getmtime(path))
+
+    _versions[source] = MeasureCache.row_hash(*parts)[:12]
+    return _versions[source]
+
+
+class MeasureCache:
+    """ A persistent {OID: result} cache that is invalidated when the hash of
+        a record changes
+
+        path = Path to the SQLite database.  It will be created if it doesn't
+               exist
+    """
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._namespaces = set()
+
+    @property
+    def _con(self):
+        """ The database connection.  The database is opened the first time
+            that it is needed. """
+        if self._connection is None:
+            # The cache is used from the background worker in
+            # UpdateRTE_NMAndMsr.py as well as the python window thread
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS measures (
+                                            namespace TEXT,
+                                            oid INTEGER,
+                                            hash TEXT,
+                                            result TEXT,
+                                            PRIMARY KEY (namespace, oid))""")
+            self._connection.commit()
+        return self._connection
+
+    @staticmethod
+    def row_hash(*values):
+        """ Returns a hash of the input values.  bytes values (such as an arcpy
+            geometry's WKB) are hashed directly.  Floats are rounded to 9
+            digits so that tiny floating point differences aren't treated as
+            edits. """
+        h = hashlib.sha1()
+        for value in values:
+            if isinstance(value, (bytes, bytearray)):
+                h.update(value)
+            elif isinstance(value, float):
+                h.update(repr(round(value, 9)).encode())
+            else:
+                h.update(repr(value).encode())
+            h.update(b'|')
+        return h.hexdigest()
+
+    def namespace(self, table, lrs):
+        """ Returns the namespace for measures located from table on lrs
+            (layers or paths).  The first time a namespace is used, cached
+            results for older versions of the LRS are removed. """
+        base = f"{getattr(table, 'dataSource', table)}|{getattr(lrs, 'dataSource', lrs)}|"
+        namespace = base + lrs_version(lrs)
+        if namespace not in self._namespaces:
+            with self._lock:
+                self._con.execute('DELETE FROM measures WHERE substr(namespace, 1, ?) = ? AND namespace != ?', (len(base), base, namespace))
+                self._con.commit()
+            self._namespaces.add(namespace)
+        return namespace
+
+    def lookup(self, namespace, oidHashes):
+        """ Returns a dictionary of {oid: result} for each oid in the input
+            {oid: hash} dictionary whose cached hash matches """
+        with self._lock:
+            rows = self._con.execute('SELECT oid, hash, result FROM measures WHERE namespace = ?', (namespace,)).fetchall()
+
+        output = {}
+        for oid, rowHash, result in rows:
+            if oid in oidHashes and oidHashes[oid] == rowHash:
+                output[oid] = json.loads(result)
+
+        self.hits += len(output)
+        self.misses += len(oidHashes) - len(output)
+        return output
+
+    def store(self, namespace, results):
+        """ Saves a dictionary of {oid: (hash, result)} to the cache.  result
+            must be JSON serializable. """
+        rows = [(namespace, oid, rowHash, json.dumps(result)) for oid, (rowHash, result) in results.items()]
+        with self._lock:
+            self._con.executemany('INSERT OR REPLACE INTO measures VALUES (?, ?, ?, ?)', rows)
+            self._con.commit()
+
+    def clear(self, namespace=None):
+        """ Removes the cached results for a namespace, or all results if
+            namespace is None """
+        with self._lock:
+            if namespace is None:
+                self._con.execute('DELETE FROM measures')
+            else:
+                self._con.execute('DELETE FROM measures WHERE namespace = ?', (namespace,))
+            self._con.commit()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+measure_cache = MeasureCache()
+
+
+
+#===============================================================================
+# Example - Only locate measures for records that changed since the last run
+#===============================================================================
+
+if __name__ == '__main__':
+    import sys
+    import arcpy
+
+    sys.path.append(r'path\to\vdot-gis-cookbook\Python\arcpy')
+    from find_line_mp import get_line_mp
+
+    eventLayer = r'path\to\events'
+    lrs = r'path\to\lrs'
+    namespace = measure_cache.namespace(eventLayer, lrs)
+
+    rows = {oid: (rte_nm, geom) for oid, rte_nm, geom in arcpy.da.SearchCursor(eventLayer, ['OID@', 'RTE_NM', 'SHAPE@'])}
+    hashes = {oid: measure_cache.row_hash(rte_nm, geom.WKB) for oid, (rte_nm, geom) in rows.items()}
+    cached = measure_cache.lookup(namespace, hashes)
+
+    results = {}
+    for oid, (rte_nm, geom) in rows.items():
+        if oid not in cached:
+            results[oid] = (hashes[oid], get_line_mp(geom, lrs, rte_nm))
+    measure_cache.store(namespace, results)
+
+    print(f'{len(cached)} records unchanged, {len(results)} records located')
@@ -15,6 +15,25 @@
 
 import arcpy
 
+# Layers are looked up through the shared registry in layer_registry.py, so
+# the ProFunctions folder must be on the path:
+#   sys.path.append(r'path\to\vdot-gis-cookbook\Python\ProFunctions')
+# Results are cached with measure_cache.py, and background=True uses
+# background_tasks.py, when they can be imported.
+from layer_registry import get_layer
+
+
+try:
+    from measure_cache import measure_cache
+except ImportError:
+    measure_cache = None
+
+try:
+    from background_tasks import run_in_background
+except ImportError:
+    run_in_background = None
+
+
 def get_line_mp(inputPolyline, lrs, rte_nm):
     """ Locates the begin and end MP values of an input line along the LRS
         ** The spatial reference of the input must match the spatial reference
@@ -76,7 +95,7 @@ def get_line_mp(inputPolyline, lrs, rte_nm):
         return None, None
 
 
-def single_line_to_single_route(layer, lrs, rte_nm_update=None, begin_msr_update=None, end_msr_update=None):
+def single_line_to_single_route(layer, lrs, rte_nm_update=None, begin_msr_update=None, end_msr_update=None, background=False, incremental=True):
     """ This tool is designed to be used within the python window in Pro.  It will allow you to select
         a single polyline feature in one layer and a single route in the lrs layer.  The rte_nm, begin_msr,
         and end_msr of the layer will be found on the selected lrs route.  if the *_update input parameters
@@ -89,17 +108,16 @@ def single_line_to_single_route(layer, lrs, rte_nm_update=None, begin_msr_update
             rte_nm_update - the field in the input layer that will be updated with rte_nm information
             begin_msr_update - the field in the input layer that will be updated with begin_msr information
             end_msr_update - the field in the input layer that will be updated with end_msr information
+            background - if True, the measures are found on a background thread and a BackgroundTask
+                is returned.  The input layer is updated when apply_results() or task.result() is
+                called from the python window (see background_tasks.py).
+            incremental - if True, the result is served from the measure cache (see measure_cache.py)
+                when the selected feature's geometry and the selected rte_nm haven't changed
+                since the last run
         """
-    def get_layer(name):
-        prj = arcpy.mp.ArcGISProject("CURRENT")
-        map = prj.listMaps()[0]
-        layer = map.listLayers(name)[0]
-        return layer
-
-    if type(layer) == str:
-        layer = get_layer(layer)
-    if type(lrs) == str:
-        lrs = get_layer(lrs)
+    layer = get_layer(layer)
+    lrs = get_layer(lrs)
+    incremental = incremental and measure_cache is not None
 
     
     
@@ -121,17 +139,39 @@ def single_line_to_single_route(layer, lrs, rte_nm_update=None, begin_msr_update
         print('Error - Only one feature may be selected in each layer')
         return
 
-    layer_geom = [row[0] for row in arcpy.da.SearchCursor(layer, 'SHAPE@')][0]
-    rte_nm = [row[0] for row in arcpy.da.SearchCursor(lrs, 'RTE_NM')][0]
-    begin_msr, end_msr = get_line_mp(layer_geom, lrs, rte_nm)
-    
-    if rte_nm_update:
-        with arcpy.da.UpdateCursor(layer, [rte_nm_update, begin_msr_update, end_msr_update]) as cur:
-            for row in cur:
-                row[0] = rte_nm
-                row[1] = begin_msr
-                row[2] = end_msr
-                cur.updateRow(row)
-                
-    else:
-        print(rte_nm, begin_msr, end_msr)
+    def compute():
+        oid, layer_geom = [row for row in arcpy.da.SearchCursor(layer, ['OID@', 'SHAPE@'])][0]
+        rte_nm = [row[0] for row in arcpy.da.SearchCursor(lrs, 'RTE_NM')][0]
+
+        if incremental:
+            namespace = measure_cache.namespace(layer, lrs)
+            rowHash = measure_cache.row_hash(rte_nm, layer_geom.WKB)
+            cached = measure_cache.lookup(namespace, {oid: rowHash})
+            if oid in cached:
+                return cached[oid]
+
+        begin_msr, end_msr = get_line_mp(layer_geom, lrs, rte_nm)
+        if incremental and begin_msr is not None:
+            measure_cache.store(namespace, {oid: (rowHash, [rte_nm, begin_msr, end_msr])})
+        return rte_nm, begin_msr, end_msr
+
+    def on_done(result):
+        rte_nm, begin_msr, end_msr = result
+        if rte_nm_update:
+            with arcpy.da.UpdateCursor(layer, [rte_nm_update, begin_msr_update, end_msr_update]) as cur:
+                for row in cur:
+                    row[0] = rte_nm
+                    row[1] = begin_msr
+                    row[2] = end_msr
+                    cur.updateRow(row)
+                    
+        else:
+            print(rte_nm, begin_msr, end_msr)
+
+    if run_in_background is None:
+        on_done(compute())
+        return
+
+    task = run_in_background(compute, on_done, background)
+    if background:
+        return task
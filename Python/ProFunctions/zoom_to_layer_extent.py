@@ -7,11 +7,24 @@
 # of the camera needs to be updated to match the extent of the input layer.  If
 # any records in the input layer are selected, then the selected features extent
 # will be used
+#
+# The project, map, layer, and active view are looked up through the shared
+# registry in layer_registry.py, so only the first call has to search the
+# project.  The ProFunctions folder must be on the path:
+#   sys.path.append(r'path\to\vdot-gis-cookbook\Python\ProFunctions')
+# Otherwise they are looked up in the current project each time.
 #===============================================================================
 # Written for ArcGIS Pro in Python 3.7
 # By Dan Fourquet
 #===============================================================================
 
+import arcpy
+
+try:
+    from layer_registry import registry
+except ImportError:
+    registry = None
+
 
 def zoom_to_layer(layerName):
     """ Zooms to the selected features of the input layer.  The layerName
@@ -21,15 +34,18 @@ def zoom_to_layer(layerName):
         Important caveat - the Map tab must be selected for this to work
         (if something else like the attributes table is active, it will return
         an error).  This is a built-in limitation of arcpy. """
-    prj = arcpy.mp.ArcGISProject("CURRENT")
-    map = prj.listMaps()[0]
-
-    mapView = prj.activeView
+    if registry:
+        mapView = registry.active_view()
+        layer = registry.layer(layerName)
+    else:
+        prj = arcpy.mp.ArcGISProject("CURRENT")
+        mapView = prj.activeView
+        layer = prj.listMaps()[0].listLayers(layerName)[0]
     camera = mapView.camera
 
-    layer = map.listLayers(layerName)[0]
     newExtent = mapView.getLayerExtent(layer)
     camera.setExtent(newExtent)
 
-layerName = "LaneCountUpdate"
-zoom_to_layer(layerName)
\ No newline at end of file
+if __name__ == '__main__':
+    layerName = "LaneCountUpdate"
+    zoom_to_layer(layerName)
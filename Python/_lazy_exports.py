@@ -0,0 +1,41 @@
+""" Lazy loading for the recipe packages (GeoPandas, ProFunctions, misc, and
+    tools)
+
+    Each package's __init__.py only lists {name: script module} in _EXPORTS
+    and calls lazy_exports().  Importing the package doesn't import any of the
+    scripts (or geopandas or arcpy), and each name is loaded from its script
+    the first time it is used.
+
+    The scripts import each other by module name (from m_value_store import
+    MValueStore) so that they can still be run as scripts or pasted into the
+    python window, so the package's folder is added to sys.path.  A package
+    whose scripts import from another recipe folder (eg the tools use
+    misc/instrumentation.py) lists those folders in uses. """
+
+import importlib
+import os
+import sys
+
+
+def lazy_exports(package, path, exports, uses=()):
+    """ Returns (__getattr__, __dir__, __all__) for a package
+
+        package = The package's __name__
+        path = The package's __file__
+        exports = Dictionary of {name: script module}
+        uses = Names of the other recipe folders that the scripts import from
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    for recipeFolder in [folder] + [os.path.join(os.path.dirname(folder), name) for name in uses]:
+        if recipeFolder not in sys.path:
+            sys.path.append(recipeFolder)
+
+    def __getattr__(name):
+        if name in exports:
+            return getattr(importlib.import_module(exports[name]), name)
+        raise AttributeError(f'module {package!r} has no attribute {name!r}')
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__, list(exports)
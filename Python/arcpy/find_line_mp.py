@@ -22,6 +22,8 @@
 # By Dan Fourquet
 #===============================================================================
 
+import arcpy
+
 
 def get_line_mp(inputPolyline, lrs, rte_nm):
     """ Locates the begin and end MP values of an input line along the LRS
@@ -90,13 +92,12 @@ def get_line_mp(inputPolyline, lrs, rte_nm):
 # situation, the rte_nm may not be known.  See match_line_to_rte_nm.py
 #===============================================================================
 
-import arcpy
-
-lrs = r'path\to\lrs'
-inputLines = r'path\to\line\feature\class'
+if __name__ == '__main__':
+    lrs = r'path\to\lrs'
+    inputLines = r'path\to\line\feature\class'
 
-# For each line in inputLines, print rte_nm, beginMP, and endMP
-with arcpy.da.SearchCursor(inputLines, ['rte_nm', 'SHAPE@']) as cur:
-    for rte_nm, geom in cur:
-        beginMP, endMP = get_line_mp(geom, lrs, rte_nm)
-        print(rte_nm, beginMP, endMP)
+    # For each line in inputLines, print rte_nm, beginMP, and endMP
+    with arcpy.da.SearchCursor(inputLines, ['rte_nm', 'SHAPE@']) as cur:
+        for rte_nm, geom in cur:
+            beginMP, endMP = get_line_mp(geom, lrs, rte_nm)
+            print(rte_nm, beginMP, endMP)
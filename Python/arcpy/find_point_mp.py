@@ -19,6 +19,9 @@
 # By Dan Fourquet
 #===============================================================================
 
+import arcpy
+
+
 def get_point_mp(inputPointGeometry, lrs, rte_nm):
     """ Locates the MP value of an input point along the LRS
 
@@ -66,18 +69,17 @@ def get_point_mp(inputPointGeometry, lrs, rte_nm):
 # situation, the rte_nm may not be known.  See match_point_to_rte_nm.py
 #===============================================================================
 
-import arcpy
-
-lrs = r'path\to\lrs'
-rte_nm = 'R-VA009SC00691EB'
+if __name__ == '__main__':
+    lrs = r'path\to\lrs'
+    rte_nm = 'R-VA009SC00691EB'
 
-# Example point uses WGS84 coordinates (EPSG 4326)
-point = arcpy.Point(-79.605, 37.28)
-PointGeometry = arcpy.PointGeometry(point, spatial_reference=arcpy.SpatialReference(4326))
+    # Example point uses WGS84 coordinates (EPSG 4326)
+    point = arcpy.Point(-79.605, 37.28)
+    PointGeometry = arcpy.PointGeometry(point, spatial_reference=arcpy.SpatialReference(4326))
 
-# Point must be projected to Web Mercator (EPSG 3857) to match the LRS
-PointGeometry = PointGeometry.projectAs(arcpy.SpatialReference(3857))
+    # Point must be projected to Web Mercator (EPSG 3857) to match the LRS
+    PointGeometry = PointGeometry.projectAs(arcpy.SpatialReference(3857))
 
 
-mp = get_point_mp(PointGeometry, lrs, rte_nm)
-print(mp)
\ No newline at end of file
+    mp = get_point_mp(PointGeometry, lrs, rte_nm)
+    print(mp)
@@ -0,0 +1,435 @@
+#===============================================================================
+# LRS benchmark suite
+#===============================================================================
+# How do I know if a change to one of the measure location recipes made it
+# faster or slower?
+#
+# This script generates a synthetic LRS (see synthetic_lrs.py) at one of the
+# 1k/100k/1m scale presets, times each benchmark case, and writes the results
+# to a JSON file along with the current git commit.  Two results files can
+# then be compared:
+#
+#   python benchmark_lrs.py run --scale 100k --output before.json
+#   (make changes)
+#   python benchmark_lrs.py run --scale 100k --output after.json
+#   python benchmark_lrs.py compare before.json after.json
+#
+# The recipes in this repo are written to be copy/pasted, so a copy of one may
+# run its example code when imported.  load_recipe() gets around this by only
+# running the imports, functions, classes, and constants of a recipe file.
+#
+# Cases that need arcpy (get_point_mp, get_line_mp, flip_event_table, and
+# DissolveRouteEvents) are recorded as skipped when arcpy isn't available.
+# select_nearby_routes tests one point at a time, so it is only run for the
+# first --queries points rather than every point in the scale preset.
+#===============================================================================
+# Written for Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import argparse
+import ast
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import synthetic_lrs
+
+RECIPE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# List of (name, function, requirements) tuples.  Add new cases with @case().
+CASES = []
+
+
+def case(name, requires=()):
+    """ Registers a benchmark case.  The decorated function receives the
+        benchmark context dictionary and returns the number of rows that it
+        processed. """
+    def decorator(func):
+        CASES.append((name, func, tuple(requires)))
+        return func
+    return decorator
+
+
+def load_recipe(relativePath):
+    """ Loads only the imports, functions, classes, constants (names in
+        capitals or starting with _), and the try/if blocks that set up
+        imports from a recipe file so that the example code at the bottom of
+        the recipe isn't run.  Returns a dictionary of the names defined in
+        the recipe. """
+    path = os.path.join(RECIPE_DIR, relativePath)
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    def isConstant(node):
+        return isinstance(node, ast.Assign) and all(isinstance(target, ast.Name) and (target.id.isupper() or target.id.startswith('_')) for target in node.targets)
+
+    def isMainGuard(node):
+        return isinstance(node, ast.If) and '__main__' in ast.dump(node.test)
+
+    keep = (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef, ast.Try, ast.If)
+    tree.body = [node for node in tree.body if (isinstance(node, keep) and not isMainGuard(node)) or isConstant(node)]
+    namespace = {'__name__': 'recipe', '__file__': path}
+    exec(compile(tree, path, 'exec'), namespace)
+    return namespace
+
+
+def has_module(name):
+    """ Returns True if the module can be imported.  Empty namespace packages
+        (such as this repo's arcpy folder) don't count. """
+    try:
+        module = __import__(name)
+    except ImportError:
+        return False
+    return getattr(module, '__file__', None) is not None
+
+
+def git_commit():
+    """ Returns the current git commit hash, or None outside of a git repo """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=RECIPE_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_csv_rows(path, limit=None):
+    """ Returns the rows of a CSV file as a list of dictionaries """
+    import csv
+    with open(path, newline='') as f:
+        rows = []
+        for row in csv.DictReader(f):
+            rows.append(row)
+            if limit and len(rows) >= limit:
+                break
+        return rows
+
+
+
+#===============================================================================
+# Benchmark cases
+#===============================================================================
+
+@case('load_m_values', requires=['shapefile'])
+def bench_load_m_values(ctx):
+    recipe = load_recipe(os.path.join('GeoPandas', 'lrs_in_geopandas.py'))
+    mValueDict = recipe['load_m_values'](ctx['paths']['lrs'])
+    return len(mValueDict)
+
+
+@case('read_lrs_geopandas', requires=['geopandas'])
+def bench_read_lrs(ctx):
+    import geopandas as gp
+    lrs = gp.read_file(ctx['paths']['lrs'])
+    ctx['lrs_gdf'] = lrs
+    return len(lrs)
+
+
+@case('read_lrs_region', requires=['geopandas', 'shapefile'])
+def bench_read_lrs_region(ctx):
+    # Reads the R-VA routes in the south west quarter of the synthetic extent
+    recipe = load_recipe(os.path.join('GeoPandas', 'lrs_dataset.py'))
+    lrs = recipe['LRSDataset'](ctx['paths']['lrs'], rte_prefix='R-VA', bbox=(-300000, -150000, 0, 0))
+    lrs.gdf
+    lrs.m_values()
+    return len(lrs)
+
+
+@case('point_at_measure', requires=['shapefile', 'numpy'])
+def bench_point_at_measure(ctx):
+    import numpy as np
+    recipe = load_recipe(os.path.join('GeoPandas', 'm_value_store.py'))
+    store = recipe['MValueStore'].from_shapefile(ctx['paths']['lrs'])
+
+    events = read_csv_rows(ctx['paths']['events'])
+    byRoute = {}
+    for event in events:
+        byRoute.setdefault(event['RTE_NM'], []).append(float(event['BEGIN_MSR']))
+    for rte_nm, measures in byRoute.items():
+        if rte_nm in store:
+            store.point_at_measure(rte_nm, np.array(measures))
+    return len(events)
+
+
+@case('build_event_geometry', requires=['geopandas', 'shapefile', 'shapely'])
+def bench_build_event_geometry(ctx):
+    import pandas as pd
+    # route_events.py imports m_value_store.py from its own folder
+    sys.path.insert(0, os.path.join(RECIPE_DIR, 'GeoPandas'))
+    try:
+        recipe = load_recipe(os.path.join('GeoPandas', 'route_events.py'))
+    finally:
+        sys.path.pop(0)
+    store = recipe['MValueStore'].from_shapefile(ctx['paths']['lrs'])
+    events = pd.read_csv(ctx['paths']['events'])
+    return len(recipe['build_event_geometry'](events, store))
+
+
+@case('scan_lrs', requires=['shapefile', 'pandas'])
+def bench_scan_lrs(ctx):
+    store = load_recipe(os.path.join('GeoPandas', 'm_value_store.py'))['MValueStore'].from_shapefile(ctx['paths']['lrs'])
+    recipe = load_recipe(os.path.join('GeoPandas', 'lrs_integrity.py'))
+    recipe['scan_lrs'](store)
+    return len(store.m)
+
+
+@case('route_catalog', requires=['shapefile', 'pandas'])
+def bench_route_catalog(ctx):
+    import pandas as pd
+    import shapefile
+    recipe = load_recipe(os.path.join('GeoPandas', 'route_catalog.py'))
+    with shapefile.Reader(ctx['paths']['lrs']) as sf:
+        lrs = pd.DataFrame(sf.records(fields=['RTE_NM', 'RTE_OPPOSI']), columns=['RTE_NM', 'RTE_OPPOSI'])
+    catalog = recipe['build_route_catalog'](lrs, opposite_field='RTE_OPPOSI')
+    events = pd.read_csv(ctx['paths']['events'])
+    recipe['opposite_routes'](catalog, events['RTE_NM'])
+    return len(events)
+
+
+@case('along_route', requires=['pandas'])
+def bench_along_route(ctx):
+    import pandas as pd
+    recipe = load_recipe(os.path.join('GeoPandas', 'along_route.py'))
+    events = pd.read_csv(ctx['paths']['events']).rename(columns={'BEGIN_MSR': 'MP'})
+    recipe['route_gaps'](events)
+    recipe['nearest_along_route'](events, events.iloc[::10], k=2)
+    return len(events)
+
+
+@case('sliding_windows', requires=['shapefile', 'pandas'])
+def bench_sliding_windows(ctx):
+    import pandas as pd
+    store = load_recipe(os.path.join('GeoPandas', 'm_value_store.py'))['MValueStore'].from_shapefile(ctx['paths']['lrs'])
+    recipe = load_recipe(os.path.join('GeoPandas', 'sliding_windows.py'))
+    events = pd.read_csv(ctx['paths']['events']).rename(columns={'BEGIN_MSR': 'MP'})
+    windows = recipe['sliding_windows'](events, recipe['route_extents'](store), length=0.5, step=0.1, sum_fields=['ATTRIBUTE'])
+    return len(windows)
+
+
+@case('coarse_select_nearby_routes', requires=['geopandas', 'shapely'])
+def bench_coarse_select_nearby_routes(ctx):
+    import geopandas as gp
+    import shapely
+    recipe = load_recipe(os.path.join('GeoPandas', 'coarse_lrs.py'))
+    CoarseLRS = recipe['CoarseLRS']
+
+    lrs = ctx.get('lrs_gdf')
+    if lrs is None:
+        lrs = gp.read_file(ctx['paths']['lrs'])
+
+    coarseLRS = CoarseLRS.from_lrs(lrs, tolerance=25)
+    points = read_csv_rows(ctx['paths']['points'], limit=ctx['queries'])
+    geometries = shapely.points([(float(point['X']), float(point['Y'])) for point in points])
+    coarseLRS.nearby_routes(geometries, 50)
+    return len(points)
+
+
+@case('select_nearby_routes', requires=['geopandas', 'shapely'])
+def bench_select_nearby_routes(ctx):
+    import geopandas as gp
+    from shapely.geometry import Point
+    recipe = load_recipe(os.path.join('GeoPandas', 'select_nearby_routes.py'))
+    select_nearby_routes = recipe['select_nearby_routes']
+
+    lrs = ctx.get('lrs_gdf')
+    if lrs is None:
+        lrs = gp.read_file(ctx['paths']['lrs'])
+
+    points = read_csv_rows(ctx['paths']['points'], limit=ctx['queries'])
+    for point in points:
+        select_nearby_routes(Point(float(point['X']), float(point['Y'])), 50, lrs)
+    return len(points)
+
+
+@case('get_point_mp', requires=['arcpy'])
+def bench_get_point_mp(ctx):
+    import arcpy
+    recipe = load_recipe(os.path.join('arcpy', 'find_point_mp.py'))
+    get_point_mp = recipe['get_point_mp']
+
+    points = read_csv_rows(ctx['paths']['points'], limit=ctx['queries'])
+    sr = arcpy.Describe(ctx['paths']['lrs']).spatialReference
+    for point in points:
+        geom = arcpy.PointGeometry(arcpy.Point(float(point['X']), float(point['Y'])), sr)
+        get_point_mp(geom, ctx['paths']['lrs'], point['RTE_NM'])
+    return len(points)
+
+
+@case('get_line_mp', requires=['arcpy'])
+def bench_get_line_mp(ctx):
+    import arcpy
+    recipe = load_recipe(os.path.join('arcpy', 'find_line_mp.py'))
+    get_line_mp = recipe['get_line_mp']
+
+    # Use pairs of test points on the same route as the input lines
+    lrsLayer = arcpy.management.MakeFeatureLayer(ctx['paths']['lrs'], 'bench_lrs')[0]
+    sr = arcpy.Describe(ctx['paths']['lrs']).spatialReference
+    points = read_csv_rows(ctx['paths']['points'], limit=ctx['queries'])
+    for point in points:
+        x, y = float(point['X']), float(point['Y'])
+        line = arcpy.Polyline(arcpy.Array([arcpy.Point(x, y), arcpy.Point(x + 10, y + 10)]), sr)
+        get_line_mp(line, lrsLayer, point['RTE_NM'])
+    arcpy.Delete_management(lrsLayer)
+    return len(points)
+
+
+@case('flip_event_table', requires=['arcpy', 'pandas'])
+def bench_flip_event_table(ctx):
+    import arcpy
+    # flip_event_table.py imports instrumentation.py from the misc folder
+    sys.path.insert(0, os.path.join(RECIPE_DIR, 'misc'))
+    try:
+        recipe = load_recipe(os.path.join('tools', 'flip_event_table.py'))
+    finally:
+        sys.path.pop(0)
+    arcpy.conversion.TableToTable(ctx['paths']['events'], 'memory', 'bench_events')
+    recipe['flip_event_table']('memory\\bench_events', 'ATTRIBUTE', ctx['paths']['lrs'], ctx['paths']['lrs'], 'memory\\bench_flipped', attribute_field_type='LONG')
+    return int(arcpy.GetCount_management('memory\\bench_events')[0])
+
+
+@case('dissolve_route_events', requires=['arcpy'])
+def bench_dissolve(ctx):
+    import arcpy
+    arcpy.conversion.TableToTable(ctx['paths']['events'], 'memory', 'bench_dissolve_input')
+    arcpy.lr.DissolveRouteEvents('memory\\bench_dissolve_input', "RTE_NM; Line; BEGIN_MSR; END_MSR", 'ATTRIBUTE', 'memory\\bench_dissolve_output', "RTE_NM; Line; BEGIN_MSR; END_MSR", "DISSOLVE", "INDEX")
+    return int(arcpy.GetCount_management('memory\\bench_dissolve_input')[0])
+
+
+
+#===============================================================================
+# Run and compare
+#===============================================================================
+
+def run_benchmarks(scale='1k', outputPath=None, dataDir=None, repeat=3, queries=1000, only=None, **generatorArgs):
+    """ Runs each benchmark case and returns a results dictionary.  If
+        outputPath is provided, the results are also written as JSON.
+
+        scale = One of the scale presets in synthetic_lrs.SCALES
+        dataDir = Where the synthetic data is written.  Existing data for the
+                  same scale is reused.  Defaults to a temporary directory
+        repeat = Number of times each case is run.  The best time is reported
+        queries = Maximum number of points used by the one-at-a-time cases
+        only = Optional list of case names to run
+    """
+    dataDir = dataDir or os.path.join(tempfile.gettempdir(), 'vdot_lrs_benchmark')
+    paths = {
+        'lrs': os.path.join(dataDir, f'lrs_{scale}.shp'),
+        'events': os.path.join(dataDir, f'events_{scale}.csv'),
+        'points': os.path.join(dataDir, f'points_{scale}.csv')
+    }
+    if generatorArgs or not all(os.path.exists(path) for path in paths.values()):
+        print(f'Generating {scale} synthetic LRS in {dataDir}')
+        paths = synthetic_lrs.generate_dataset(dataDir, scale=scale, **generatorArgs)
+
+    ctx = {'paths': paths, 'scale': scale, 'queries': queries}
+    results = []
+    for name, func, requires in CASES:
+        if only and name not in only:
+            continue
+
+        missing = [module for module in requires if not has_module(module)]
+        if missing:
+            print(f'{name}: skipped ({", ".join(missing)} not available)')
+            results.append({'case': name, 'status': 'skipped', 'reason': f'missing {", ".join(missing)}'})
+            continue
+
+        times = []
+        rows = None
+        try:
+            for _ in range(repeat):
+                gc.collect()
+                start = time.perf_counter()
+                rows = func(ctx)
+                times.append(time.perf_counter() - start)
+        except Exception as e:
+            print(f'{name}: error ({e})')
+            results.append({'case': name, 'status': 'error', 'reason': str(e)})
+            continue
+
+        best = min(times)
+        result = {
+            'case': name,
+            'status': 'ok',
+            'best_s': round(best, 6),
+            'mean_s': round(sum(times) / len(times), 6),
+            'rows': rows,
+            'rows_per_s': round(rows / best, 1) if rows and best else None
+        }
+        print(f'{name}: {result["best_s"]}s ({rows} rows)')
+        results.append(result)
+
+    output = {
+        'commit': git_commit(),
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'scale': scale,
+        'repeat': repeat,
+        'queries': queries,
+        'results': results
+    }
+
+    if outputPath:
+        with open(outputPath, 'w') as f:
+            json.dump(output, f, indent=2)
+
+    return output
+
+
+def compare_results(beforePath, afterPath):
+    """ Prints the change in the best time of each case between two results
+        files.  A ratio below 1 means that the case got faster. """
+    with open(beforePath) as f:
+        before = json.load(f)
+    with open(afterPath) as f:
+        after = json.load(f)
+
+    print(f'{before["commit"]} ({before["scale"]}) => {after["commit"]} ({after["scale"]})')
+    beforeResults = {r['case']: r for r in before['results']}
+    for result in after['results']:
+        old = beforeResults.get(result['case'])
+        if result['status'] != 'ok' or not old or old['status'] != 'ok':
+            print(f'    {result["case"]}: not comparable')
+            continue
+        ratio = result['best_s'] / old['best_s'] if old['best_s'] else float('nan')
+        print(f'    {result["case"]}: {old["best_s"]}s => {result["best_s"]}s (x{ratio:.2f})')
+
+
+
+#===============================================================================
+# Example - Command line interface
+#===============================================================================
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the LRS recipes on a synthetic LRS')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    runParser = subparsers.add_parser('run')
+    runParser.add_argument('--scale', choices=list(synthetic_lrs.SCALES), default='1k')
+    runParser.add_argument('--output', default='benchmark_results.json')
+    runParser.add_argument('--data-dir', default=None)
+    runParser.add_argument('--repeat', type=int, default=3)
+    runParser.add_argument('--queries', type=int, default=1000)
+    runParser.add_argument('--case', action='append', help='Only run this case (may be repeated)')
+    runParser.add_argument('--vertices-per-mile', type=float, default=None)
+    runParser.add_argument('--multipart-ratio', type=float, default=None)
+
+    compareParser = subparsers.add_parser('compare')
+    compareParser.add_argument('before')
+    compareParser.add_argument('after')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        generatorArgs = {}
+        if args.vertices_per_mile is not None:
+            generatorArgs['vertices_per_mile'] = args.vertices_per_mile
+        if args.multipart_ratio is not None:
+            generatorArgs['multipart_ratio'] = args.multipart_ratio
+        run_benchmarks(args.scale, args.output, args.data_dir, args.repeat, args.queries, args.case, **generatorArgs)
+    else:
+        compare_results(args.before, args.after)
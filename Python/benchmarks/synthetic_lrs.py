@@ -0,0 +1,272 @@
+#===============================================================================
+# Synthetic LRS generator
+#===============================================================================
+# How do I make a test LRS of any size without exporting the real one?
+#
+# The functions below write a PolyLineM shapefile that looks like the VDOT
+# Overlap LRS: prime and non-prime routes with VDOT-style RTE_NMs (eg
+# 'R-VA   IS00095NB' and 'R-VA   IS00095SB') linked with the
+# RTE_OPPOSITE_DIRECTION_RTE_NM field (RTE_OPPOSI in the shapefile), m-values
+# in miles, and a configurable share of multipart routes.  The gaps between parts of a multipart route are
+# also gaps in the m-values, just like the real LRS.
+#
+# Divided routes are drawn as two parallel lines a few meters apart.
+# Undivided routes use the same line for both directions, reversed for the
+# non-prime direction.  Streets ('S-VA...') only have one direction.
+#
+# Matching event tables and test points are written as CSV files.  The points
+# are placed a few meters off of a known route at a known MP, so the output of
+# the measure location functions can be checked against the truth columns.
+#
+# Coordinates are meters in Virginia Lambert (EPSG 3968).
+#===============================================================================
+# Written for Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import csv
+import math
+import os
+import random
+
+import shapefile
+
+METERS_PER_MILE = 1609.344
+
+# Scale presets used by the benchmark suite
+SCALES = {
+    '1k': {'route_count': 100, 'event_count': 1000},
+    '100k': {'route_count': 2000, 'event_count': 100000},
+    '1m': {'route_count': 10000, 'event_count': 1000000}
+}
+
+# Shapefile field names are limited to 10 characters, so
+# RTE_OPPOSITE_DIRECTION_RTE_NM is truncated the same way that ArcGIS
+# truncates it when the LRS is exported to a shapefile
+OPPOSITE_FIELD = 'RTE_OPPOSI'
+
+# Route systems that are given a statewide (blank) jurisdiction code
+STATEWIDE_SYSTEMS = ['IS', 'US', 'SR']
+
+
+def _route_name(prefix, juris, system, number, direction):
+    """ Builds a VDOT-style RTE_NM, eg 'R-VA   IS00095NB' or 'R-VA009SC00691EB' """
+    return f'{prefix}-VA{juris}{system}{number:05d}{direction}'
+
+
+def _random_walk(rng, vertexCount, spacing, extent):
+    """ Returns a list of [x, y] coordinates for a gently curving line """
+    x = rng.uniform(-extent, extent)
+    y = rng.uniform(-extent / 2, extent / 2)
+    heading = rng.uniform(0, 2 * math.pi)
+    coords = [[x, y]]
+    for _ in range(vertexCount - 1):
+        heading += rng.gauss(0, 0.15)
+        x += math.cos(heading) * spacing
+        y += math.sin(heading) * spacing
+        coords.append([x, y])
+    return coords
+
+
+def _offset(coords, distance):
+    """ Offsets a line to the right by the input distance """
+    output = []
+    for i, (x, y) in enumerate(coords):
+        x0, y0 = coords[max(i - 1, 0)]
+        x1, y1 = coords[min(i + 1, len(coords) - 1)]
+        length = math.hypot(x1 - x0, y1 - y0) or 1
+        output.append([x + (y1 - y0) / length * distance, y - (x1 - x0) / length * distance])
+    return output
+
+
+def _measure(coords, beginMsr=0):
+    """ Returns the cumulative m-values (miles) for each vertex """
+    mValues = [beginMsr]
+    for (x0, y0), (x1, y1) in zip(coords[:-1], coords[1:]):
+        mValues.append(mValues[-1] + math.hypot(x1 - x0, y1 - y0) / METERS_PER_MILE)
+    return mValues
+
+
+def _split_parts(rng, coords):
+    """ Splits a line into 2 or 3 parts by dropping a few vertices between
+        each part.  The m-values skip the dropped vertices, leaving an M gap. """
+    partCount = rng.choice([2, 3])
+    if len(coords) < partCount * 4:
+        return [coords]
+
+    cuts = sorted(rng.sample(range(2, len(coords) - 3), partCount - 1))
+    parts = []
+    start = 0
+    for cut in cuts:
+        if cut - start >= 2:
+            parts.append(coords[start:cut])
+        start = cut + 2
+    parts.append(coords[start:])
+    return [part for part in parts if len(part) >= 2]
+
+
+def generate_lrs(lrsPath, route_count=1000, vertices_per_mile=20, mean_route_miles=10,
+                 multipart_ratio=0.1, divided_ratio=0.3, street_ratio=0.2, extent=300000, seed=1):
+    """ Writes a synthetic PolyLineM LRS shapefile and returns a list of
+        route dictionaries (RTE_NM, opposite RTE_NM, parts) for the prime
+        routes
+
+        lrsPath = Path to the output shapefile
+        route_count = Number of prime routes.  Non-prime routes are added for
+                      every route that isn't a street
+        vertices_per_mile = Vertex density of the route geometry
+        mean_route_miles = Average route length in miles
+        multipart_ratio = Share of routes that are multipart (0 - 1)
+        divided_ratio = Share of two-direction routes that are divided (0 - 1)
+        street_ratio = Share of routes that are 'S-VA' streets (0 - 1)
+        extent = Half width of the area the routes are drawn in (meters)
+        seed = Random seed so that the output can be reproduced
+    """
+    rng = random.Random(seed)
+    spacing = METERS_PER_MILE / vertices_per_mile
+    routes = []
+    usedNames = set()
+
+    with shapefile.Writer(lrsPath, shapeType=shapefile.POLYLINEM) as w:
+        w.field('RTE_NM', 'C', size=50)
+        w.field(OPPOSITE_FIELD, 'C', size=50)
+        w.field('RTE_TYPE', 'C', size=5)
+
+        def write_route(rte_nm, opp_rte_nm, parts, routeType):
+            lines = []
+            for part in parts:
+                lines.append([[x, y, m] for (x, y), m in zip(part['coords'], part['m'])])
+            w.linem(lines)
+            w.record(rte_nm, opp_rte_nm or '', routeType)
+
+        for i in range(route_count):
+            isStreet = rng.random() < street_ratio
+            routeMiles = max(rng.expovariate(1 / mean_route_miles), 0.2)
+            coords = _random_walk(rng, max(int(routeMiles * vertices_per_mile), 2), spacing, extent)
+
+            # Build a unique route name
+            while True:
+                number = rng.randint(1, 99999)
+                if isStreet:
+                    rte_nm = f'S-VA{rng.randint(0, 999):03d}PR STREET {number}'
+                    opp_rte_nm = None
+                    routeType = 'S'
+                else:
+                    system = rng.choice(STATEWIDE_SYSTEMS + ['SC'])
+                    juris = '   ' if system in STATEWIDE_SYSTEMS else f'{rng.randint(0, 199):03d}'
+                    primeDir, oppDir = rng.choice([('NB', 'SB'), ('EB', 'WB')])
+                    rte_nm = _route_name('R', juris, system, number, primeDir)
+                    opp_rte_nm = _route_name('R', juris, system, number, oppDir)
+                    routeType = system
+                if rte_nm not in usedNames and opp_rte_nm not in usedNames:
+                    break
+            usedNames.update([name for name in (rte_nm, opp_rte_nm) if name])
+
+            # Prime direction
+            mValues = _measure(coords)
+            pieces = [list(zip(coords, mValues))]
+            if rng.random() < multipart_ratio:
+                pieces = _split_parts(rng, pieces[0])
+            parts = [{'coords': [p[0] for p in piece], 'm': [p[1] for p in piece]} for piece in pieces]
+            write_route(rte_nm, opp_rte_nm, parts, routeType)
+            routes.append({'RTE_NM': rte_nm, 'RTE_OPPOSITE_DIRECTION_RTE_NM': opp_rte_nm, 'parts': parts})
+
+            # Non-prime direction.  It is measured from its own start, so the
+            # same location has different m-values in each direction.
+            if opp_rte_nm:
+                isDivided = rng.random() < divided_ratio
+                oppCoords = _offset(coords, 15) if isDivided else coords
+                oppCoords = oppCoords[::-1]
+                oppM = _measure(oppCoords)
+                write_route(opp_rte_nm, rte_nm, [{'coords': oppCoords, 'm': oppM}], routeType)
+
+    return routes
+
+
+def _locate(part, mp):
+    """ Returns the x, y coordinates at the input m-value on a route part """
+    mValues = part['m']
+    for i in range(1, len(mValues)):
+        if mValues[i] >= mp:
+            m0, m1 = mValues[i - 1], mValues[i]
+            ratio = (mp - m0) / (m1 - m0) if m1 != m0 else 0
+            (x0, y0), (x1, y1) = part['coords'][i - 1], part['coords'][i]
+            return x0 + (x1 - x0) * ratio, y0 + (y1 - y0) * ratio
+    return part['coords'][-1]
+
+
+def generate_events(routes, eventsPath, pointsPath=None, event_count=1000, max_event_miles=2, point_noise=5, seed=2):
+    """ Writes a CSV event table (RTE_NM, BEGIN_MSR, END_MSR, ATTRIBUTE) on
+        the prime routes and, if pointsPath is provided, a CSV of test points
+        (X, Y, RTE_NM, MP) placed point_noise meters or less from the route
+
+        Events never cross the gaps between the parts of multipart routes.
+    """
+    rng = random.Random(seed)
+
+    with open(eventsPath, 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(['EVENT_ID', 'RTE_NM', 'BEGIN_MSR', 'END_MSR', 'ATTRIBUTE'])
+        for eventID in range(event_count):
+            route = rng.choice(routes)
+            part = rng.choice(route['parts'])
+            partBegin, partEnd = part['m'][0], part['m'][-1]
+            length = min(rng.uniform(0.01, max_event_miles), partEnd - partBegin)
+            begin = rng.uniform(partBegin, partEnd - length)
+            w.writerow([eventID, route['RTE_NM'], round(begin, 3), round(begin + length, 3), rng.randint(1, 5)])
+
+    if not pointsPath:
+        return
+
+    with open(pointsPath, 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(['POINT_ID', 'X', 'Y', 'RTE_NM', 'MP'])
+        for pointID in range(event_count):
+            route = rng.choice(routes)
+            part = rng.choice(route['parts'])
+            mp = rng.uniform(part['m'][0], part['m'][-1])
+            x, y = _locate(part, mp)
+            x += rng.uniform(-point_noise, point_noise)
+            y += rng.uniform(-point_noise, point_noise)
+            w.writerow([pointID, round(x, 3), round(y, 3), route['RTE_NM'], round(mp, 3)])
+
+
+def write_prj(lrsPath, epsg=3968):
+    """ Writes a .prj file next to the shapefile so that GeoPandas and ArcGIS
+        know that it is in Virginia Lambert.  Requires pyproj. """
+    import pyproj
+    wkt = pyproj.CRS.from_epsg(epsg).to_wkt(pyproj.enums.WktVersion.WKT1_ESRI)
+    with open(os.path.splitext(lrsPath)[0] + '.prj', 'w') as f:
+        f.write(wkt)
+
+
+def generate_dataset(outputDir, scale='1k', seed=1, **kwargs):
+    """ Writes the LRS shapefile, event table, and test points for one of the
+        scale presets in SCALES to outputDir.  Returns a dictionary of paths.
+        Any additional keyword arguments are passed to generate_lrs. """
+    os.makedirs(outputDir, exist_ok=True)
+    preset = SCALES[scale]
+    paths = {
+        'lrs': os.path.join(outputDir, f'lrs_{scale}.shp'),
+        'events': os.path.join(outputDir, f'events_{scale}.csv'),
+        'points': os.path.join(outputDir, f'points_{scale}.csv')
+    }
+
+    routes = generate_lrs(paths['lrs'], route_count=kwargs.pop('route_count', preset['route_count']), seed=seed, **kwargs)
+    try:
+        write_prj(paths['lrs'])
+    except ImportError:
+        print('pyproj is not installed.  No .prj file was written.')
+
+    generate_events(routes, paths['events'], paths['points'], event_count=preset['event_count'], seed=seed + 1)
+    return paths
+
+
+
+#===============================================================================
+# Example - Write a small LRS with 100 prime routes and 1000 events
+#===============================================================================
+
+if __name__ == '__main__':
+    paths = generate_dataset(r'.\data\synthetic', scale='1k', multipart_ratio=0.2)
+    print(paths)
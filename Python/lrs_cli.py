@@ -0,0 +1,251 @@
+#===============================================================================
+# LRS command line
+#===============================================================================
+# How do I run the LRS recipes on a file from the command line or from another
+# program?
+#
+# Each job reads CSV or NDJSON (one JSON object per line), works on it in
+# chunks, and writes each chunk as soon as it is done, so large files never
+# have to fit in memory and another program can read the results as they come
+# out.  Use - as the input or output to read from stdin or write to stdout.
+# The format is taken from the file extension (.csv, .ndjson, .jsonl), or set
+# it with --format.
+#
+#   locate  Finds the closest route and MP for each point
+#               python lrs_cli.py locate --lrs LRS.shp points.csv located.csv
+#   flip    Copies each event to the opposite direction route
+#               python lrs_cli.py flip --lrs LRS.shp events.csv flipped.csv
+#   overlay Turns polygons into an event table of the routes inside them
+#               python lrs_cli.py overlay --lrs LRS.shp areas.shp events.csv
+#   stats   Min/max/sum/avg of each number field, optionally grouped and
+#           weighted by event length
+#               python lrs_cli.py stats --group RTE_NM --weighted aadt.csv -
+#
+# geopandas, shapely, pyproj, and arcpy are only imported by the job that
+# needs them, and none of the recipes run anything when they are imported, so
+# `lrs_cli.py --help` and small jobs start in well under a second.
+#===============================================================================
+# Written for Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import argparse
+import os
+import sys
+
+_FOLDER = os.path.dirname(os.path.abspath(__file__))
+if _FOLDER not in sys.path:
+    sys.path.insert(0, _FOLDER)
+
+
+def _format(path, format=None):
+    if format:
+        return format
+    extension = os.path.splitext(path)[1].lower()
+    return 'ndjson' if extension in ('.ndjson', '.jsonl', '.json') else 'csv'
+
+
+def read_chunks(path, chunk_size=50000, format=None):
+    """ Yields DataFrames of up to chunk_size rows from a CSV or NDJSON file,
+        or from stdin if path is - """
+    import pandas as pd
+
+    source = sys.stdin if path == '-' else path
+    if _format(path, format) == 'ndjson':
+        chunks = pd.read_json(source, lines=True, chunksize=chunk_size)
+    else:
+        chunks = pd.read_csv(source, chunksize=chunk_size)
+    with chunks as reader:
+        for chunk in reader:
+            yield chunk
+
+
+class ChunkWriter:
+    """ Writes DataFrames to one CSV or NDJSON file (or stdout if path is -).
+        The CSV header is only written with the first chunk. """
+    def __init__(self, path, format=None):
+        self.format = _format(path, format)
+        self.file = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        self.rows = 0
+
+    def write(self, df):
+        if self.format == 'ndjson':
+            if len(df):
+                self.file.write(df.to_json(orient='records', lines=True, date_format='iso').rstrip('\n') + '\n')
+        else:
+            df.to_csv(self.file, index=False, header=self.rows == 0)
+        self.file.flush()
+        self.rows += len(df)
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _opposite_routes(args):
+    """ Returns a dictionary of {RTE_NM: opposite RTE_NM} from a route catalog
+        or the opposite direction field of the LRS """
+    if args.catalog:
+        from GeoPandas import load_route_catalog
+        catalog = load_route_catalog(args.catalog)
+        catalog = catalog.loc[catalog['OPPOSITE_RTE_NM'].notna()]
+        return dict(zip(catalog['RTE_NM'], catalog['OPPOSITE_RTE_NM']))
+
+    import shapefile
+    with shapefile.Reader(args.lrs) as shp:
+        return {rte_nm: opposite for rte_nm, opposite in shp.iterRecords(fields=['RTE_NM', args.opposite_field]) if opposite}
+
+
+def locate(args):
+    """ Adds RTE_NM, MP, and DISTANCE to each point.  Points are either x/y
+        columns in the LRS's coordinate system or a column of coordinate
+        strings (see GeoPandas/parse_coordinates.py) """
+    import numpy as np
+    from GeoPandas import LRSIndex, MValueStore, parse_coordinates
+
+    index = LRSIndex(MValueStore.from_shapefile(args.lrs))
+    with ChunkWriter(args.output, args.format) as writer:
+        for chunk in read_chunks(args.input, args.chunk_size, args.format):
+            if args.coords:
+                parsed = parse_coordinates(chunk[args.coords], crs=args.crs)
+                xy = parsed[['X', 'Y']].to_numpy()
+            else:
+                xy = chunk[[args.x, args.y]].to_numpy(dtype=float)
+
+            valid = ~np.isnan(xy).any(axis=1)
+            results = [None] * len(chunk)
+            for i, result in zip(np.flatnonzero(valid), index.locate(xy[valid], args.distance)):
+                results[i] = result
+            chunk['RTE_NM'] = [result['RTE_NM'] if result else None for result in results]
+            chunk['MP'] = [result['MP'] if result else None for result in results]
+            chunk['DISTANCE'] = [result['DISTANCE'] if result else None for result in results]
+            writer.write(chunk)
+
+
+def flip(args):
+    """ Writes each event and a copy of it on the opposite direction route,
+        with its measures found on the opposite route """
+    import numpy as np
+    import pandas as pd
+    from GeoPandas import MValueStore, to_opposite_route
+
+    opposite = _opposite_routes(args)
+    routes = set(opposite) | set(opposite.values())
+    store = MValueStore.from_shapefile(args.lrs, routes=routes)
+
+    with ChunkWriter(args.output, args.format) as writer:
+        for chunk in read_chunks(args.input, args.chunk_size, args.format):
+            begin = to_opposite_route(chunk[[args.rte_nm, args.begin_msr]], opposite, store, args.rte_nm, args.begin_msr)
+            end = to_opposite_route(chunk[[args.rte_nm, args.end_msr]], opposite, store, args.rte_nm, args.end_msr)
+
+            flipped = chunk.copy()
+            flipped[args.rte_nm] = begin[args.rte_nm]
+            # The opposite route usually runs the other way, so the measures
+            # are swapped to keep BEGIN_MSR <= END_MSR
+            flipped[args.begin_msr] = np.fmin(begin[args.begin_msr], end[args.end_msr])
+            flipped[args.end_msr] = np.fmax(begin[args.begin_msr], end[args.end_msr])
+            flipped = flipped.loc[flipped[args.rte_nm].notna() & flipped[args.begin_msr].notna() & flipped[args.end_msr].notna()]
+
+            writer.write(pd.concat([chunk, flipped]).sort_index(kind='stable'))
+
+
+def overlay(args):
+    """ Writes the RTE_NM, BEGIN_MSR, and END_MSR of the routes inside each
+        polygon, with the polygon's --attribute if given """
+    import geopandas as gp
+    from GeoPandas import MValueStore, polygon_to_events
+
+    store = MValueStore.from_shapefile(args.lrs)
+    polygons = gp.read_file(args.input)
+    lrsCRS = gp.read_file(args.lrs, rows=0).crs
+    if lrsCRS is not None and polygons.crs is not None:
+        polygons = polygons.to_crs(lrsCRS)
+
+    events = polygon_to_events(store, polygons, workers=args.workers)
+    if args.attribute:
+        events.insert(0, args.attribute, polygons[args.attribute].to_numpy()[events['POLYGON_INDEX'].to_numpy(dtype=int)])
+
+    with ChunkWriter(args.output, args.format) as writer:
+        for start in range(0, len(events), args.chunk_size):
+            writer.write(events.iloc[start:start + args.chunk_size])
+        if not len(events):
+            writer.write(events)
+
+
+def stats(args):
+    """ Writes the statistics of the number fields, optionally grouped and
+        weighted by event length """
+    from ProFunctions import chunked_statistics
+
+    # Only the running totals of each group are kept, so the input is never
+    # read into memory all at once
+    measureFields = [args.begin_msr, args.end_msr] if args.weighted else []
+    chunks = read_chunks(args.input, args.chunk_size, args.format)
+    output = chunked_statistics(chunks, args.fields, args.group, *measureFields)
+    statColumns = [column for column in output.columns if column in ('min', 'max', 'sum', 'avg', 'miles')]
+    output[statColumns] = output[statColumns].round(args.scale)
+    with ChunkWriter(args.output, args.format) as writer:
+        writer.write(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run LRS jobs on CSV or NDJSON files')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default=None, help='Input and output format.  Defaults to the file extension')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    locateParser = subparsers.add_parser('locate', help='Find the closest route and MP for each point')
+    locateParser.add_argument('input')
+    locateParser.add_argument('output')
+    locateParser.add_argument('--lrs', required=True, help='LRS shapefile with m-values')
+    locateParser.add_argument('--x', default='X')
+    locateParser.add_argument('--y', default='Y')
+    locateParser.add_argument('--coords', default=None, help='Column of coordinate strings to use instead of --x and --y')
+    locateParser.add_argument('--crs', type=int, default=3968, help='Coordinate system of the LRS, used with --coords')
+    locateParser.add_argument('--distance', type=float, default=50)
+    locateParser.set_defaults(job=locate)
+
+    flipParser = subparsers.add_parser('flip', help='Copy each event to the opposite direction route')
+    flipParser.add_argument('input')
+    flipParser.add_argument('output')
+    flipParser.add_argument('--lrs', required=True, help='LRS shapefile with m-values')
+    flipParser.add_argument('--catalog', default=None, help='Route catalog saved by GeoPandas/route_catalog.py')
+    flipParser.add_argument('--opposite-field', default='RTE_OPPOSI', help='Opposite route field in the LRS, used without --catalog')
+    flipParser.add_argument('--rte-nm', default='RTE_NM')
+    flipParser.add_argument('--begin-msr', default='BEGIN_MSR')
+    flipParser.add_argument('--end-msr', default='END_MSR')
+    flipParser.set_defaults(job=flip)
+
+    overlayParser = subparsers.add_parser('overlay', help='Turn polygons into an event table')
+    overlayParser.add_argument('input', help='Polygon file that geopandas can read')
+    overlayParser.add_argument('output')
+    overlayParser.add_argument('--lrs', required=True, help='LRS shapefile with m-values')
+    overlayParser.add_argument('--attribute', default=None, help='Polygon field to copy to the events')
+    overlayParser.add_argument('--workers', type=int, default=None)
+    overlayParser.set_defaults(job=overlay)
+
+    statsParser = subparsers.add_parser('stats', help='Statistics of the number fields')
+    statsParser.add_argument('input')
+    statsParser.add_argument('output')
+    statsParser.add_argument('--field', dest='fields', action='append', help='Number field to include (may be repeated).  Defaults to every number field')
+    statsParser.add_argument('--group', default=None)
+    statsParser.add_argument('--weighted', action='store_true', help='Weight averages by abs(END_MSR - BEGIN_MSR)')
+    statsParser.add_argument('--begin-msr', default='BEGIN_MSR')
+    statsParser.add_argument('--end-msr', default='END_MSR')
+    statsParser.add_argument('--scale', type=int, default=2, help='Decimal places')
+    statsParser.set_defaults(job=stats)
+
+    args = parser.parse_args(argv)
+    args.job(args)
+
+
+
+if __name__ == '__main__':
+    main()
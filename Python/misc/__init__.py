@@ -0,0 +1,24 @@
+""" Misc Python recipes
+
+    Importing this package doesn't import any of the recipes.  Each name below
+    is loaded from its recipe the first time it is used, eg
+
+        from misc import EventTable """
+
+from _lazy_exports import lazy_exports
+
+# {name: recipe module}
+_EXPORTS = {
+    'EventRow': 'event_records',
+    'EventTable': 'event_records',
+    'MEASURE_SCALE': 'fixed_measures',
+    'NULL_MEASURE': 'fixed_measures',
+    'to_fixed': 'fixed_measures',
+    'from_fixed': 'fixed_measures',
+    'is_fixed': 'fixed_measures',
+    'dissolve_events': 'fixed_measures',
+    'Instrumentation': 'instrumentation',
+    'setup_queue_logging': 'logging_setup'
+}
+
+__getattr__, __dir__, __all__ = lazy_exports(__name__, __file__, _EXPORTS)
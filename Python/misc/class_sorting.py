@@ -3,6 +3,8 @@
 #===============================================================================
 # How do I sort a list of class instances by an attribute?
 # 
+# This is fine for a few thousand objects.  For millions of event records, see
+# event_records.py, which sorts NumPy arrays instead of objects.
 #===============================================================================
 # Written for Python 3.7
 # By Dan Fourquet
@@ -17,17 +19,19 @@ class Color:
     def __repr__(self):
         return f'{self.color}: {self.rank}'
 
-# Create a list containing color instances
-colors = []
 
-colors.append(Color(id=1, color='Blue', rank=1))
-colors.append(Color(2, 'Green', 3))
-colors.append(Color(3, 'Orange', 2))
+if __name__ == '__main__':
+    # Create a list containing color instances
+    colors = []
 
-# Create a list sorted by color rank
-colorsSorted = sorted(colors, key=lambda x: x.rank)
+    colors.append(Color(id=1, color='Blue', rank=1))
+    colors.append(Color(2, 'Green', 3))
+    colors.append(Color(3, 'Orange', 2))
 
-print('unsorted:')
-print(colors)
-print('\nsorted:')
-print(colorsSorted)
\ No newline at end of file
+    # Create a list sorted by color rank
+    colorsSorted = sorted(colors, key=lambda x: x.rank)
+
+    print('unsorted:')
+    print(colors)
+    print('\nsorted:')
+    print(colorsSorted)
@@ -0,0 +1,240 @@
+#===============================================================================
+# Sorting and grouping millions of event records
+#===============================================================================
+# How do I sort and group a large number of event records without creating a
+# python object for each one?
+#
+# class_sorting.py sorts a list of class instances with
+# sorted(colors, key=lambda x: x.rank).  That works well for a few thousand
+# objects, but an event table with millions of rows uses a lot of memory when
+# every row is an object with its own __dict__, and the sort has to call the
+# key function for each one.
+#
+# The EventTable below keeps the events in a NumPy structured array instead.
+# RTE_NM is stored as an integer code into a sorted array of unique route
+# names, so sorting by route is an integer sort and each row only takes a few
+# bytes for the route.  Sorting on several keys uses np.lexsort, which is
+# stable, so rows with equal keys keep their original order.
+#
+# Rows are only turned into objects when you ask for them.  EventRow is a
+# small view with __slots__ that reads its values from the table, and
+# iter_slices() yields the table in chunks so that a loop can work on arrays
+# rather than one row at a time.
+#
+# With fixed_measures=True, BEGIN_MSR and END_MSR are stored as int32
+# thousandths of a mile (see fixed_measures.py), which halves their memory and
+# makes dissolve() and comparisons between measures exact.
+#===============================================================================
+# Written for Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import numpy as np
+
+
+class EventRow:
+    """ A view of a single row in an EventTable.  Values are read from the
+        table when they are accessed. """
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __getattr__(self, name):
+        if name == 'RTE_NM':
+            return self._table.routes[self._table.data['RTE_CODE'][self._index]]
+        try:
+            return self._table.data[name][self._index].item()
+        except ValueError:
+            raise AttributeError(name) from None
+
+    def as_tuple(self):
+        return tuple(getattr(self, name) for name in self._table.fields)
+
+    def __repr__(self):
+        return f'{self.RTE_NM}: {self.BEGIN_MSR} - {self.END_MSR}'
+
+
+class EventTable:
+    """ A table of linear events backed by a NumPy structured array
+
+        data = A structured array with RTE_CODE, BEGIN_MSR, and END_MSR fields
+               plus any attribute fields
+        routes = A sorted array of unique RTE_NMs.  RTE_CODE is the index of
+                 each row's RTE_NM in this array
+    """
+    __slots__ = ('data', 'routes')
+
+    def __init__(self, data, routes):
+        self.data = data
+        self.routes = routes
+
+    @classmethod
+    def from_columns(cls, rte_nm, begin_msr, end_msr, fixed_measures=False, **attributes):
+        """ Creates an EventTable from arrays or lists of values.  Any keyword
+            arguments are added as attribute fields.  If fixed_measures is
+            True, the measures are stored as int32 thousandths of a mile. """
+        routes, codes = np.unique(np.asarray(rte_nm, dtype=object).astype(str), return_inverse=True)
+        attributes = {name: np.asarray(values) for name, values in attributes.items()}
+
+        measureType = np.float64
+        if fixed_measures:
+            from fixed_measures import to_fixed
+            begin_msr, end_msr, measureType = to_fixed(begin_msr), to_fixed(end_msr), np.int32
+
+        dtype = [('RTE_CODE', np.int32), ('BEGIN_MSR', measureType), ('END_MSR', measureType)]
+        dtype += [(name, values.dtype) for name, values in attributes.items()]
+
+        data = np.empty(len(codes), dtype=dtype)
+        data['RTE_CODE'] = codes
+        data['BEGIN_MSR'] = begin_msr
+        data['END_MSR'] = end_msr
+        for name, values in attributes.items():
+            data[name] = values
+
+        return cls(data, routes.astype(object))
+
+    @classmethod
+    def from_records(cls, records, attribute_fields=(), fixed_measures=False):
+        """ Creates an EventTable from an iterable of (rte_nm, begin_msr,
+            end_msr, *attributes) tuples, such as an arcpy SearchCursor """
+        columns = list(zip(*records)) or [[] for _ in range(3 + len(attribute_fields))]
+        attributes = dict(zip(attribute_fields, columns[3:]))
+        return cls.from_columns(columns[0], columns[1], columns[2], fixed_measures, **attributes)
+
+    @property
+    def fields(self):
+        """ The field names, with RTE_NM in place of RTE_CODE """
+        return ['RTE_NM'] + [name for name in self.data.dtype.names if name != 'RTE_CODE']
+
+    @property
+    def fixed_measures(self):
+        """ True if the measures are stored as integer thousandths """
+        return np.issubdtype(self.data['BEGIN_MSR'].dtype, np.integer)
+
+    @property
+    def rte_nm(self):
+        """ An array of the RTE_NM of each row """
+        return self.routes[self.data['RTE_CODE']]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        """ table[i] returns an EventRow.  table[i:j], table[mask], or
+            table[indexes] return a new EventTable. """
+        if isinstance(key, (int, np.integer)):
+            return EventRow(self, key)
+        if isinstance(key, str):
+            return self.rte_nm if key == 'RTE_NM' else self.data[key]
+        return EventTable(self.data[key], self.routes)
+
+    def __iter__(self):
+        for i in range(len(self.data)):
+            yield EventRow(self, i)
+
+    def iter_slices(self, size=100000):
+        """ Yields the table in EventTables of up to size rows.  The slices are
+            views of the same array, so no data is copied. """
+        for start in range(0, len(self.data), size):
+            yield EventTable(self.data[start:start + size], self.routes)
+
+    def argsort(self, *keys):
+        """ Returns the indexes that would sort the table.  Keys are field
+            names, with the first key sorted first.  Prefix a field with '-' to
+            sort it in descending order.  RTE_NM sorts alphabetically. """
+        columns = []
+        for key in keys:
+            descending = key.startswith('-')
+            name = key.lstrip('-')
+            column = self.data['RTE_CODE'] if name == 'RTE_NM' else self.data[name]
+            if descending:
+                # Negating doesn't work for strings and wraps around for
+                # unsigned integers, so the values are replaced with their
+                # rank and the ranks are reversed
+                ranks = np.unique(column, return_inverse=True)[1].reshape(-1)
+                column = ranks.max(initial=0) - ranks
+            columns.append(column)
+
+        # np.lexsort sorts by the last key first
+        return np.lexsort(columns[::-1])
+
+    def sort(self, *keys):
+        """ Returns a new EventTable sorted by the input keys, eg
+            table.sort('RTE_NM', 'BEGIN_MSR') """
+        return self[self.argsort(*keys)]
+
+    def is_sorted_by_route(self):
+        codes = self.data['RTE_CODE']
+        return bool(np.all(codes[1:] >= codes[:-1]))
+
+    def group_by_route(self):
+        """ Yields (rte_nm, EventTable) for each route.  If the table isn't
+            already sorted by route, it is sorted first (keeping the original
+            order of rows within each route). """
+        if len(self) == 0:
+            return
+        table = self if self.is_sorted_by_route() else self[np.argsort(self.data['RTE_CODE'], kind='stable')]
+        codes = table.data['RTE_CODE']
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[starts[1:], len(codes)]
+        for start, end in zip(starts, ends):
+            yield table.routes[codes[start]], EventTable(table.data[start:end], table.routes)
+
+    def dissolve(self, *attribute_fields):
+        """ Returns a new EventTable where events on the same route with the
+            same attribute_fields values that touch or overlap are merged into
+            one event.  Other attribute fields are taken from the first event.
+            Float measures are compared in thousandths of a mile.  Events with
+            a missing measure are kept as they are. """
+        from fixed_measures import dissolve_events, to_fixed, from_fixed
+
+        keys = [self.data['RTE_CODE']] + [np.unique(self.data[name], return_inverse=True)[1] for name in attribute_fields]
+        begin, end = self.data['BEGIN_MSR'], self.data['END_MSR']
+        if not self.fixed_measures:
+            begin, end = to_fixed(begin), to_fixed(end)
+
+        rows, begin, end = dissolve_events(keys, begin, end)
+        data = self.data[rows]
+        if self.fixed_measures:
+            data['BEGIN_MSR'], data['END_MSR'] = begin, end
+        else:
+            data['BEGIN_MSR'], data['END_MSR'] = from_fixed(begin), from_fixed(end)
+        return EventTable(data, self.routes)
+
+    def to_dataframe(self, miles=True):
+        """ Returns the table as a pandas DataFrame.  Fixed measures are
+            converted back to miles unless miles is False. """
+        import pandas as pd
+        df = pd.DataFrame({name: self.data[name] for name in self.data.dtype.names if name != 'RTE_CODE'})
+        if miles and self.fixed_measures:
+            from fixed_measures import from_fixed
+            df['BEGIN_MSR'] = from_fixed(df['BEGIN_MSR'].to_numpy())
+            df['END_MSR'] = from_fixed(df['END_MSR'].to_numpy())
+        df.insert(0, 'RTE_NM', pd.Categorical.from_codes(self.data['RTE_CODE'], categories=self.routes))
+        return df
+
+
+
+#===============================================================================
+# Example - Sort events by route and begin measure, and find the longest event
+# on each route
+#===============================================================================
+
+if __name__ == '__main__':
+    events = EventTable.from_columns(
+        rte_nm=['R-VA   IS00095NB', 'R-VA   US00050EB', 'R-VA   IS00095NB', 'R-VA   US00050EB'],
+        begin_msr=[4.2, 0.0, 1.5, 2.25],
+        end_msr=[6.0, 2.25, 4.2, 3.0],
+        AADT=[52000, 18000, 61000, 17500]
+    )
+
+    eventsSorted = events.sort('RTE_NM', 'BEGIN_MSR')
+    print(list(eventsSorted))
+    # [R-VA   IS00095NB: 1.5 - 4.2, R-VA   IS00095NB: 4.2 - 6.0, R-VA   US00050EB: 0.0 - 2.25, R-VA   US00050EB: 2.25 - 3.0]
+
+    for rte_nm, routeEvents in eventsSorted.group_by_route():
+        lengths = routeEvents['END_MSR'] - routeEvents['BEGIN_MSR']
+        longest = routeEvents[int(np.argmax(lengths))]
+        print(rte_nm, longest.BEGIN_MSR, longest.END_MSR, longest.AADT)
@@ -0,0 +1,134 @@
+#===============================================================================
+# Fixed-point measures
+#===============================================================================
+# How do I compare and merge event measures without floating point errors?
+#
+# The locators round every measure with round(mp, 3), so an event table is
+# really in thousandths of a mile.  Stored as floats, though, 1.1 + 2.2 isn't
+# 3.3, so checking whether one event ends where the next begins, or whether
+# two tables have the same segments, needs a tolerance or more rounding.
+#
+# to_fixed() stores measures as integer thousandths of a mile (1.234 -> 1234)
+# and from_fixed() turns them back into miles.  With integers:
+#
+#   - Equal measures are exactly equal, so joins on (RTE_NM, BEGIN_MSR,
+#     END_MSR) and checks for touching events are exact
+#   - int32 takes half the memory of float64 (and holds measures up to about
+#     two million miles)
+#   - Sorting and comparing integers is faster than floats
+#
+# Missing measures can't be NaN in an integer array, so they are stored as
+# NULL_MEASURE (the smallest int32).  from_fixed() turns them back into NaN.
+#
+# dissolve_events() merges events on the same route (and with the same
+# attribute values) that touch or overlap, like DissolveRouteEvents, using the
+# integer measures.  EventTable in event_records.py and write_events() in
+# tools/event_output.py can both keep their measures in this form.
+#===============================================================================
+# Written for Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import numpy as np
+
+# Measures are stored as thousandths of a mile
+MEASURE_SCALE = 1000
+
+# Stored in place of a missing measure
+NULL_MEASURE = np.iinfo(np.int32).min
+
+
+def to_fixed(measures, dtype=np.int32):
+    """ Returns an integer array of measures in thousandths of a mile.  NaN and
+        None become NULL_MEASURE. """
+    measures = np.asarray(measures, dtype=np.float64)
+    fixed = np.rint(measures * MEASURE_SCALE)
+    missing = np.isnan(fixed)
+    fixed[missing] = 0
+    fixed = fixed.astype(dtype)
+    fixed[missing] = np.iinfo(dtype).min
+    return fixed
+
+
+def from_fixed(fixed):
+    """ Returns a float array of measures in miles.  NULL_MEASURE becomes
+        NaN. """
+    fixed = np.asarray(fixed)
+    measures = fixed / MEASURE_SCALE
+    measures[fixed == np.iinfo(fixed.dtype).min] = np.nan
+    return measures
+
+
+def is_fixed(measures):
+    """ Returns True if the measures are already stored as integers """
+    return np.issubdtype(np.asarray(measures).dtype, np.integer)
+
+
+def dissolve_events(keys, begin, end):
+    """ Merges events that have the same keys and touch or overlap
+
+        keys = List of integer arrays that events must match on to be merged,
+               eg [route codes, attribute codes]
+        begin, end = Integer measures (see to_fixed()).  Events with begin >
+                     end are flipped first.
+
+        Returns (rows, begin, end), where rows is the index of the first input
+        row of each output event (use it to copy attribute values), and the
+        output is sorted by keys and begin.  Events with a NULL_MEASURE aren't
+        merged with anything.  They are passed through unchanged after the
+        other events, in their input order.
+    """
+    begin = np.asarray(begin)
+    end = np.asarray(end)
+    missing = (begin == np.iinfo(begin.dtype).min) | (end == np.iinfo(end.dtype).min)
+    if missing.any():
+        valid = np.flatnonzero(~missing)
+        rows, newBegin, newEnd = dissolve_events([np.asarray(key)[valid] for key in keys], begin[valid], end[valid])
+        missing = np.flatnonzero(missing)
+        return np.r_[valid[rows], missing], np.r_[newBegin, begin[missing]], np.r_[newEnd, end[missing]]
+
+    if len(begin) == 0:
+        return np.array([], dtype=np.intp), begin[:0], end[:0]
+    low = np.minimum(begin, end).astype(np.int64)
+    high = np.maximum(begin, end).astype(np.int64)
+
+    order = np.lexsort([high, low] + [np.asarray(key) for key in reversed(keys)])
+    low, high = low[order], high[order]
+
+    newGroup = np.zeros(len(order), dtype=bool)
+    newGroup[0] = True
+    for key in keys:
+        key = np.asarray(key)[order]
+        newGroup[1:] |= key[1:] != key[:-1]
+
+    # The running end of the current event.  Adding a large offset for each
+    # group stops the running maximum from carrying into the next group.
+    group = np.cumsum(newGroup) - 1
+    offset = group * (high.max() - low.min() + 1)
+    runningEnd = np.maximum.accumulate(high + offset) - offset
+
+    starts = newGroup.copy()
+    starts[1:] |= low[1:] > runningEnd[:-1]
+    startIndex = np.flatnonzero(starts)
+    stopIndex = np.r_[startIndex[1:], len(order)] - 1
+
+    return order[startIndex], low[startIndex].astype(begin.dtype), runningEnd[stopIndex].astype(end.dtype)
+
+
+
+#===============================================================================
+# Example - Merge AADT segments that touch and have the same AADT
+#===============================================================================
+
+if __name__ == '__main__':
+    routes = np.array([0, 0, 0, 1])
+    aadt = np.array([5000, 5000, 7000, 5000])
+    begin = to_fixed([0.0, 1.1, 3.3, 0.0])
+    end = to_fixed([1.1, 3.3, 4.0, 2.5])
+
+    rows, newBegin, newEnd = dissolve_events([routes, aadt], begin, end)
+    for row, b, e in zip(rows, from_fixed(newBegin), from_fixed(newEnd)):
+        print(routes[row], aadt[row], b, e)
+    # 0 5000 0.0 3.3
+    # 0 7000 3.3 4.0
+    # 1 5000 0.0 2.5
@@ -0,0 +1,288 @@
+#===============================================================================
+# Timing and profiling instrumentation
+#===============================================================================
+# How do I find out where the time goes when one of the tools runs?
+#
+# The tools print messages like 'Create route event layer' as they run, but
+# those messages don't say how long each step took, how many rows were
+# processed, or how much memory was used.  The Instrumentation class below
+# wraps each step (a "stage") in a context manager that records:
+#
+#   - elapsed time
+#   - a row counter and the rows per second rate
+#   - the peak memory (RSS) sampled by a background thread during the stage
+#   - optionally, a cProfile or pyinstrument profile of the stage
+#
+# Each finished stage is written as one JSON object per line (JSON lines), so a
+# log from a production run can be loaded with pandas.read_json(path,
+# lines=True) and sorted by elapsed time.
+#
+# Stages can be nested.  The "path" value of each record contains the names of
+# the parent stages separated by " / ".
+#
+# psutil is used to read memory if it is installed (it is included with ArcGIS
+# Pro).  Otherwise /proc/self/statm is used on Linux.  If neither is
+# available, peak_mem_mb will be None.
+#===============================================================================
+# Written for Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+
+
+def _rss_bytes():
+    """ Returns the resident memory of the current process in bytes, or None
+        if it can't be determined """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class NullStage:
+    """ Stand-in for a Stage when a tool is run without an Instrumentation
+        object.  Nothing is timed or written, and rows are ignored. """
+    rows = 0
+
+    def __init__(self, name=None, profile=None, **fields):
+        pass
+
+    def add_rows(self, n=1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Stage:
+    """ A single timed stage.  Use Instrumentation.stage() to create one. """
+    def __init__(self, instrumentation, name, profile=None, **fields):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.profile = profile
+        self.fields = fields
+        self.rows = 0
+        self.path = None
+        self.start = None
+        self.elapsed = None
+        self.peak_rss = None
+        self._profiler = None
+
+    def add_rows(self, n=1):
+        """ Adds n to the row counter for this stage """
+        self.rows += n
+
+    def _sample(self, rss):
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+    def __enter__(self):
+        self.instrumentation._push(self)
+        self._sample(_rss_bytes())
+        self._start_profile()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        self.elapsed = time.perf_counter() - self.start
+        profilePath = self._stop_profile()
+        self._sample(_rss_bytes())
+        self.instrumentation._pop(self)
+
+        record = {
+            "stage": self.name,
+            "path": self.path,
+            "elapsed_s": round(self.elapsed, 6),
+            "rows": self.rows,
+            "rows_per_s": round(self.rows / self.elapsed, 1) if self.rows and self.elapsed else None,
+            "peak_mem_mb": round(self.peak_rss / 1048576, 1) if self.peak_rss else None,
+            "status": "error" if excType else "ok"
+        }
+        if excType:
+            record["error"] = f'{excType.__name__}: {excValue}'
+        if profilePath:
+            record["profile"] = profilePath
+        record.update(self.fields)
+        self.instrumentation.write(record)
+
+        return False
+
+    def _start_profile(self):
+        if not self.profile:
+            return
+
+        if self.profile == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == 'pyinstrument':
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+            self._profiler.start()
+        else:
+            raise ValueError(f'Unknown profiler "{self.profile}".  Use "cprofile" or "pyinstrument"')
+
+    def _stop_profile(self):
+        """ Stops the profiler and saves its output to the profile directory.
+            Returns the path to the output file. """
+        if not self._profiler:
+            return None
+
+        fileName = ''.join(c if c.isalnum() else '_' for c in self.path)
+        profileDir = self.instrumentation.profile_dir
+        os.makedirs(profileDir, exist_ok=True)
+
+        if self.profile == 'cprofile':
+            self._profiler.disable()
+            outputPath = os.path.join(profileDir, f'{fileName}.prof')
+            self._profiler.dump_stats(outputPath)
+        else:
+            self._profiler.stop()
+            outputPath = os.path.join(profileDir, f'{fileName}.html')
+            with open(outputPath, 'w') as f:
+                f.write(self._profiler.output_html())
+
+        self._profiler = None
+        return outputPath
+
+
+class Instrumentation:
+    """ Records stage timings, row counts, and peak memory as JSON lines
+
+        output = Path to the output .jsonl file.  If None, records are written
+                 to stdout
+        run = A name for this run that is added to every record.  Defaults to
+              the start time
+        memory_interval = Seconds between memory samples.  If None, memory is
+                          only sampled at the beginning and end of each stage
+        profile = "cprofile" or "pyinstrument" to profile every stage, or None.
+                  Individual stages can also be profiled with stage(profile=...)
+        profile_dir = Directory where profiler output is saved
+    """
+    def __init__(self, output=None, run=None, memory_interval=0.1, profile=None, profile_dir='profiles'):
+        self.output = output
+        self.run = run or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.memory_interval = memory_interval
+        self.profile = profile
+        self.profile_dir = profile_dir
+
+        self._file = open(output, 'a') if output else sys.stdout
+        self._stack = []
+        self._lock = threading.Lock()
+        self._stopSampler = threading.Event()
+        self._sampler = None
+
+        if memory_interval:
+            self._sampler = threading.Thread(target=self._sample_memory, daemon=True)
+            self._sampler.start()
+
+    # Tools that take an optional instrument use
+    #   stage = instrument.stage if instrument else Instrumentation.null_stage
+    null_stage = NullStage
+
+    def stage(self, name, profile=None, **fields):
+        """ Returns a context manager that times the code inside of it.  Any
+            additional keyword arguments are added to the output record.
+
+            with instrument.stage('Locate measures') as stage:
+                for row in cur:
+                    ...
+                    stage.rows += 1
+        """
+        return Stage(self, name, profile=profile or self.profile, **fields)
+
+    def timed(self, name=None, **fields):
+        """ Decorator that runs the decorated function inside of a stage.  The
+            stage name defaults to the function name. """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name or func.__name__, **fields):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def write(self, record):
+        """ Writes a single record as a line of JSON """
+        record = {"run": self.run, "time": datetime.now().isoformat(timespec='seconds'), **record}
+        with self._lock:
+            self._file.write(json.dumps(record, default=str) + '\n')
+            self._file.flush()
+
+    def close(self):
+        """ Stops the memory sampler and closes the output file """
+        self._stopSampler.set()
+        if self._sampler:
+            self._sampler.join()
+        if self._file is not sys.stdout:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _push(self, stage):
+        with self._lock:
+            stage.path = ' / '.join([s.name for s in self._stack] + [stage.name])
+            self._stack.append(stage)
+
+    def _pop(self, stage):
+        with self._lock:
+            self._stack.remove(stage)
+
+    def _sample_memory(self):
+        while not self._stopSampler.wait(self.memory_interval):
+            rss = _rss_bytes()
+            if rss is None:
+                return
+            with self._lock:
+                for stage in self._stack:
+                    stage._sample(rss)
+
+
+
+#===============================================================================
+# Example - Time the stages of a script and profile the slowest one
+#===============================================================================
+
+if __name__ == '__main__':
+    with Instrumentation('timings.jsonl') as instrument:
+
+        @instrument.timed()
+        def build_list(n):
+            return [i ** 2 for i in range(n)]
+
+        with instrument.stage('Whole job'):
+            with instrument.stage('Build values') as stage:
+                values = build_list(1000000)
+                stage.rows = len(values)
+
+            with instrument.stage('Sum values', profile='cprofile') as stage:
+                total = 0
+                for value in values:
+                    total += value
+                    stage.rows += 1
+
+    # {"run": "20230101_120000", ..., "stage": "Sum values", "path": "Whole job / Sum values",
+    #  "elapsed_s": 0.08, "rows": 1000000, "rows_per_s": 12500000.0, "peak_mem_mb": 52.1,
+    #  "status": "ok", "profile": "profiles/Whole_job___Sum_values.prof"}
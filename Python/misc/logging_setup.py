@@ -28,17 +28,162 @@
 # INFO	    20
 # DEBUG	    10
 # NOTSET	  0
+#
+# The basic setup at the bottom of this file writes each message to the log
+# file as soon as it is logged.  That's fine for most scripts, but if a tool
+# logs a debug message for every row of a million-row cursor, writing to disk
+# can take longer than the work itself.  setup_queue_logging() below is set up
+# for those tools:
+#
+#   - Messages are put on a queue by a QueueHandler and written by a
+#     QueueListener on a background thread, so the cursor loop never waits on
+#     the disk
+#   - Messages are formatted on the background thread.  Use the logging
+#     module's lazy arguments (log.debug('Row %s', oid)) rather than
+#     f-strings so that the string is only built if the message is written
+#   - The log file rotates when it gets too large
+#   - Messages can be written as JSON lines
+#   - Per-row debug messages can be sampled (eg only 1 in 1000 is written) and
+#     rate limited (eg at most 50 per second for each message)
 # 
 #===============================================================================
 # Written for Python 3.7
 # By Dan Fourquet
 #===============================================================================
 
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import time
+
+
+class JsonFormatter(logging.Formatter):
+    """ Formats each log record as a single line of JSON """
+    def format(self, record):
+        output = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            output["exception"] = self.formatException(record.exc_info)
+        return json.dumps(output, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """ Drops some of the records at or below max_level so that per-row
+        messages don't flood the log.  Records above max_level always pass.
+
+        sample_rate = Share of records that are kept (eg 0.001 keeps 1 in 1000)
+        max_per_second = Maximum number of records per second for each message.
+                         Records are grouped by their unformatted message, so
+                         log.debug('Row %s', oid) is limited as one message
+        max_level = Records at this level or lower are filtered
+    """
+    def __init__(self, sample_rate=1.0, max_per_second=None, max_level=logging.DEBUG):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self.max_level = max_level
+        self._windows = {}
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+
+        if self.max_per_second:
+            second = int(time.monotonic())
+            key = (record.name, record.msg)
+            windowSecond, count = self._windows.get(key, (second, 0))
+            if windowSecond != second:
+                windowSecond, count = second, 0
+            if count >= self.max_per_second:
+                return False
+            self._windows[key] = (windowSecond, count + 1)
+
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """ A QueueHandler that leaves the message formatting to the listener's
+        thread.  The standard QueueHandler formats the message before putting it
+        on the queue so that it can be sent to another process, which isn't
+        needed when the listener is a thread in the same process. """
+    def prepare(self, record):
+        return record
+
+
+def setup_queue_logging(logger, logPath, level=logging.DEBUG, json_format=True, max_bytes=50000000, backup_count=5, sample_rate=1.0, max_per_second=None):
+    """ Sets up a logger that writes to a rotating log file on a background
+        thread.  Returns the QueueListener, which must be stopped at the end of
+        the script (listener.stop()) to write the remaining messages.
+
+        logger = The logger to set up, eg logging.getLogger(__name__)
+        logPath = Path to the log file
+        level = The logging level
+        json_format = If True, each message is written as a line of JSON
+        max_bytes = The log file is rotated when it reaches this size
+        backup_count = The number of rotated log files to keep
+        sample_rate, max_per_second = See SampleFilter.  Only debug messages
+                                      are sampled
+    """
+    fileHandler = logging.handlers.RotatingFileHandler(logPath, maxBytes=max_bytes, backupCount=backup_count)
+    if json_format:
+        fileHandler.setFormatter(JsonFormatter())
+    else:
+        fileHandler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    logQueue = queue.SimpleQueue()
+    queueHandler = LazyQueueHandler(logQueue)
+
+    # The filter is added to the logger so that dropped records are thrown out
+    # before they are put on the queue
+    if sample_rate < 1 or max_per_second:
+        logger.addFilter(SampleFilter(sample_rate, max_per_second))
+
+    logger.setLevel(level)
+    logger.addHandler(queueHandler)
+
+    listener = logging.handlers.QueueListener(logQueue, fileHandler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+
+#===============================================================================
+# Example 1 - Basic setup
+#===============================================================================
+
+if __name__ == '__main__':
+    log = logging.getLogger(__name__)
+    log.setLevel(logging.DEBUG) # Set the debug level here
+    fileHandler = logging.FileHandler(f'my.log', mode='w')
+    log.addHandler(fileHandler)
+
+    log.debug('Message to write to log')
+
+
+
+#===============================================================================
+# Example 2 - Non-blocking setup for a tool that logs a message for every row
+#===============================================================================
+
+if __name__ == '__main__':
+    rowLog = logging.getLogger('rows')
+    listener = setup_queue_logging(rowLog, 'rows.log', sample_rate=0.01, max_per_second=100)
 
-log = logging.getLogger(__name__)
-log.setLevel(logging.DEBUG) # Set the debug level here
-fileHandler = logging.FileHandler(f'my.log', mode='w')
-log.addHandler(fileHandler)
+    # Checking isEnabledFor once before the loop skips the logging calls
+    # entirely when the level is set above DEBUG
+    debug = rowLog.isEnabledFor(logging.DEBUG)
+    for oid in range(1000000):
+        if debug:
+            rowLog.debug('Updated row %s', oid)
 
-log.debug('Message to write to log')
+    rowLog.info('Finished')
+    listener.stop()
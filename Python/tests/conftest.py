@@ -0,0 +1,20 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+_RECIPES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _folder in ('GeoPandas', 'misc', 'tools'):
+    sys.path.insert(0, os.path.join(_RECIPES, _folder))
+
+from m_value_store import MValueStore
+
+
+@pytest.fixture
+def two_part_store():
+    """ One route with parts at MP 0-2 and 5-7 and a gap between them """
+    x = np.array([0, 1, 2, 10, 11, 12], dtype=np.float64)
+    m = np.array([0, 1, 2, 5, 6, 7], dtype=np.float64)
+    partStart = np.array([True, False, False, True, False, False])
+    return MValueStore(x, np.zeros(6), m, partStart, {'R': (0, 6)})
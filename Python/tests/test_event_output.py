@@ -0,0 +1,28 @@
+import pandas as pd
+
+from event_output import read_route_events, write_events
+from fixed_measures import NULL_MEASURE
+
+
+def test_read_route_events_filters_without_rte_nm_column(tmp_path):
+    df = pd.DataFrame({'RTE_NM': ['A'] * 2 + ['B'] * 3, 'BEGIN_MSR': [0.0, 1, 0, 1, 2], 'END_MSR': [1.0, 2, 1, 2, 3], 'AADT': [10, 20, 30, 40, 50]})
+    path = tmp_path / 'events.parquet'
+    write_events(df, path, max_group_rows=100)
+
+    output = read_route_events(path, 'A', columns=['BEGIN_MSR', 'AADT'])
+
+    assert output.columns.tolist() == ['BEGIN_MSR', 'AADT']
+    assert output['AADT'].tolist() == [10, 20]
+
+
+def test_fixed_measures_store_null_measure_as_null(tmp_path):
+    df = pd.DataFrame({'RTE_NM': ['A', 'A', 'A'], 'BEGIN_MSR': [0.0, 1.25, float('nan')], 'END_MSR': [1.25, 2.5, 3.0]})
+    path = tmp_path / 'events.parquet'
+    write_events(df, path, fixed_measures=True)
+
+    miles = read_route_events(path, 'A')
+    fixed = read_route_events(path, 'A', fixed_measures=True)
+
+    assert miles['BEGIN_MSR'].isna().tolist() == [False, False, True]
+    assert miles['END_MSR'].tolist() == [1.25, 2.5, 3.0]
+    assert fixed['BEGIN_MSR'].tolist() == [0, 1250, NULL_MEASURE]
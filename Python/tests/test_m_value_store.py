@@ -0,0 +1,6 @@
+def test_segment_ending_at_next_part_does_not_cross_gap(two_part_store):
+    pieces = two_part_store.segment_between('R', [1.5, 2, 1.5], [5, 5, 6])
+
+    assert [piece.tolist() for piece in pieces[0]] == [[[1.5, 0, 1.5], [2, 0, 2]]]
+    assert pieces[1] == []
+    assert [piece[:, 2].tolist() for piece in pieces[2]] == [[1.5, 2], [5, 6]]
@@ -0,0 +1,11 @@
+import pandas as pd
+
+from route_events import build_event_geometry
+
+
+def test_event_ending_at_next_part_does_not_cross_gap(two_part_store):
+    events = pd.DataFrame({'RTE_NM': ['R', 'R'], 'BEGIN_MSR': [2.0, 1.5], 'END_MSR': [5.0, 5.0]})
+    output = build_event_geometry(events, two_part_store)
+
+    assert output['EVENT_INDEX'].tolist() == [1]
+    assert [list(coords) for coords in output.geometry.iloc[0].coords] == [[1.5, 0], [2, 0]]
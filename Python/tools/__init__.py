@@ -0,0 +1,25 @@
+""" VDOT tools
+
+    Importing this package doesn't import any of the tools (or arcpy).  Each
+    name below is loaded from its tool the first time it is used, eg
+
+        from tools import write_events
+
+    The tools time their steps with misc/instrumentation.py, look up layers
+    with ProFunctions/layer_registry.py, and read route catalogs with
+    GeoPandas/route_catalog.py, so those folders are added to the path too. """
+
+from _lazy_exports import lazy_exports
+
+# {name: tool module}
+_EXPORTS = {
+    'add_districts': 'add_district',
+    'write_events': 'event_output',
+    'read_route_events': 'event_output',
+    'write_table': 'event_output',
+    'flip_event_table': 'flip_event_table',
+    'polygon_to_event_csv': 'polygon_to_event_table',
+    'update_line_events_known_rte_nm': 'update_line_events_known_rte_nm'
+}
+
+__getattr__, __dir__, __all__ = lazy_exports(__name__, __file__, _EXPORTS, uses=['misc', 'ProFunctions', 'GeoPandas'])
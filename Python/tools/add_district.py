@@ -9,12 +9,26 @@
 #
 # This can easily be modified to work with any other polygon layer, such as
 # jurisdictions for example.
+#
+# For large inputs, GeoPandas/parallel_overlay.py does the same thing with a
+# pool of processes.
 #===============================================================================
 # Written for ArcGIS Pro in Python 3
 # By Dan Fourquet
 #===============================================================================
 
-def add_districts(inputFC, districtFC, district_field="Districts", district_name_field="DISTRICT_NAME"):
+# Stages are timed with misc/instrumentation.py.  Importing the tools package
+# adds the misc folder to the path.  When this script is run on its own, add
+# it first:
+#   sys.path.append(r'path\to\vdot-gis-cookbook\Python\misc')
+from instrumentation import Instrumentation
+
+
+def add_districts(inputFC, districtFC, district_field="Districts", district_name_field="DISTRICT_NAME", instrument=None):
+    # instrument is an optional Instrumentation object (see misc/instrumentation.py)
+    # that records the time spent on each district
+    stage = instrument.stage if instrument else Instrumentation.null_stage
+
     # Check if district_field_name exists in inputFC
     if district_field not in [field for field in arcpy.ListFields(inputFC)]:
         arcpy.AddField_management(inputFC, district_field, 'TEXT')
@@ -24,10 +38,12 @@ def add_districts(inputFC, districtFC, district_field="Districts", district_name
 
     # Add districts to inputFC by location
     for district in districts:
-        arcpy.management.SelectLayerByAttribute(districtFC, 'NEW_SELECTION', f"{district_name_field} = '{district}'")
-        arcpy.management.SelectLayerByLocation(inputFC, 'HAVE_THEIR_CENTER_IN', districtFC)
+        with stage('Add district', district=district) as s:
+            arcpy.management.SelectLayerByAttribute(districtFC, 'NEW_SELECTION', f"{district_name_field} = '{district}'")
+            arcpy.management.SelectLayerByLocation(inputFC, 'HAVE_THEIR_CENTER_IN', districtFC)
 
-        with arcpy.da.UpdateCursor(inputFC, district_field) as cur:
-            for row in cur:
-                row[0] = district
-                cur.updateRow(row)
\ No newline at end of file
+            with arcpy.da.UpdateCursor(inputFC, district_field) as cur:
+                for row in cur:
+                    row[0] = district
+                    cur.updateRow(row)
+                    s.rows += 1
\ No newline at end of file
@@ -0,0 +1,209 @@
+#===============================================================================
+# Write event tables to Parquet and GeoParquet
+#===============================================================================
+# How do I save an event table so that it is small, fast to write, and quick
+# to read one route at a time?
+#
+# Event tables from the tools are usually written to CSV or a file geodatabase
+# table.  CSV files are large and slow to write, every value is stored as
+# text, and a job that needs one route has to read the whole file.
+#
+# write_events() writes an event table to Parquet instead:
+#
+#   - RTE_NM is dictionary encoded, so each route name is only stored once per
+#     row group
+#   - BEGIN_MSR and END_MSR are stored as float64, or with
+#     fixed_measures=True as int32 thousandths of a mile (see
+#     misc/fixed_measures.py), which is half the size and exact.  The scale is
+#     saved in the file's metadata and read_route_events() converts the
+#     measures back to miles unless it is also given fixed_measures=True.
+#     Missing measures (NaN or NULL_MEASURE) are stored as Parquet nulls.
+#   - Rows are sorted by RTE_NM and BEGIN_MSR, and row groups only start at the
+#     beginning of a route.  Each row group records the first and last RTE_NM
+#     that it contains, so read_route_events() only reads the row groups that
+#     contain the route that you need.
+#
+# One row group per route would mean tens of thousands of tiny row groups for
+# a statewide table, and the metadata for each one would make the file larger
+# than the CSV.  Instead, whole routes are packed into row groups of about
+# max_group_rows rows.  Set max_group_rows=1 for exactly one route per row
+# group.
+#
+# GeoDataFrames are written as GeoParquet (geometry stored as WKB with the
+# "geo" metadata), so they can be opened with geopandas.read_parquet or QGIS.
+#
+# write_table() picks the format from the file extension (.parquet or .csv) so
+# that the tools can offer both.
+#===============================================================================
+# Written for Python 3.7
+# By Dan Fourquet
+#===============================================================================
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Fixed measures are converted with misc/fixed_measures.py.  Importing the
+# tools package adds the misc folder to the path.
+from fixed_measures import MEASURE_SCALE, NULL_MEASURE, to_fixed
+
+
+def _route_groups(routes, max_group_rows):
+    """ Returns a list of (start, stop) row ranges so that each range holds
+        whole routes and about max_group_rows rows.  routes must be sorted. """
+    routes = pd.Series(routes).reset_index(drop=True)
+    starts = routes.index[routes.ne(routes.shift())].tolist() + [len(routes)]
+
+    groups = []
+    groupStart = 0
+    for routeStart, routeEnd in zip(starts[:-1], starts[1:]):
+        if routeStart > groupStart and routeEnd - groupStart > max_group_rows:
+            groups.append((groupStart, routeStart))
+            groupStart = routeStart
+    if len(routes):
+        groups.append((groupStart, len(routes)))
+    return groups
+
+
+def _geo_metadata(gdf, geometryColumn):
+    """ Returns the GeoParquet "geo" metadata for a GeoDataFrame """
+    crs = gdf.crs.to_json_dict() if gdf.crs else None
+    return {
+        "version": "1.0.0",
+        "primary_column": geometryColumn,
+        "columns": {
+            geometryColumn: {
+                "encoding": "WKB",
+                "geometry_types": sorted(gdf.geom_type.dropna().unique().tolist()),
+                "crs": crs,
+                "bbox": [float(v) for v in gdf.total_bounds] if len(gdf) else None
+            }
+        }
+    }
+
+
+def _to_fixed(measures):
+    """ Returns a nullable Int32 Series of measures in thousandths, with
+        missing measures and NULL_MEASURE as nulls """
+    if pd.api.types.is_integer_dtype(measures):
+        fixed = measures.astype('Int32')
+    else:
+        fixed = pd.Series(to_fixed(measures.astype('float64')), index=measures.index, dtype='Int32')
+    return fixed.mask(fixed.eq(NULL_MEASURE).fillna(False))
+
+
+def write_events(df, path, rte_nm='RTE_NM', begin_msr='BEGIN_MSR', end_msr='END_MSR', max_group_rows=65536, compression='zstd', fixed_measures=False):
+    """ Writes an event table (DataFrame or GeoDataFrame) to Parquet
+
+        df = The event table
+        path = Output .parquet path
+        rte_nm, begin_msr, end_msr = The LRS field names in df
+        max_group_rows = Whole routes are packed into row groups of about this
+                         many rows
+        compression = Parquet compression codec
+        fixed_measures = If True, the measures are stored as int32 thousandths
+                         of a mile.  Measures that are already integers are
+                         taken to be thousandths.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = df.sort_values([rte_nm, begin_msr], kind='stable').reset_index(drop=True)
+
+    metadata = {}
+    geometryColumn = getattr(df, '_geometry_column_name', None)
+    if geometryColumn:
+        metadata[b'geo'] = json.dumps(_geo_metadata(df, geometryColumn)).encode()
+        wkb = df[geometryColumn].to_wkb()
+        df = pd.DataFrame(df.drop(columns=geometryColumn))
+        df[geometryColumn] = wkb.values
+
+    if fixed_measures:
+        df[begin_msr] = _to_fixed(df[begin_msr])
+        df[end_msr] = _to_fixed(df[end_msr])
+        metadata[b'measure_scale'] = str(MEASURE_SCALE).encode()
+    else:
+        df[begin_msr] = df[begin_msr].astype('float64')
+        df[end_msr] = df[end_msr].astype('float64')
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    routeIndex = table.schema.get_field_index(rte_nm)
+    table = table.set_column(routeIndex, rte_nm, table.column(rte_nm).cast(pa.string()).dictionary_encode())
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+
+    with pq.ParquetWriter(path, table.schema, compression=compression) as writer:
+        for start, stop in _route_groups(df[rte_nm], max_group_rows):
+            writer.write_table(table.slice(start, stop - start), row_group_size=stop - start)
+
+
+def read_route_events(path, routes, columns=None, rte_nm='RTE_NM', begin_msr='BEGIN_MSR', end_msr='END_MSR', fixed_measures=False):
+    """ Reads the events for one route or a list of routes from a Parquet file
+        written by write_events().  Only the row groups that contain the routes
+        are read.  Returns a DataFrame.
+
+        Measures that were written with fixed_measures=True are converted back
+        to miles unless fixed_measures is True here too. """
+    import pyarrow.parquet as pq
+
+    routes = [routes] if isinstance(routes, str) else list(routes)
+    pf = pq.ParquetFile(path)
+    routeColumn = pf.schema_arrow.get_field_index(rte_nm)
+
+    groups = []
+    for i in range(pf.num_row_groups):
+        stats = pf.metadata.row_group(i).column(routeColumn).statistics
+        if stats is None or not stats.has_min_max:
+            groups.append(i)
+        elif any(stats.min <= route <= stats.max for route in routes):
+            groups.append(i)
+
+    if not groups:
+        return pf.schema_arrow.empty_table().to_pandas()[columns or slice(None)]
+
+    # RTE_NM is always read so that the rows can be filtered, and dropped
+    # afterwards if it wasn't asked for
+    readColumns = columns if columns is None or rte_nm in columns else list(columns) + [rte_nm]
+    df = pf.read_row_groups(groups, columns=readColumns).to_pandas()
+    df = df.loc[df[rte_nm].isin(routes)].reset_index(drop=True)
+    df[rte_nm] = df[rte_nm].cat.remove_unused_categories()
+    if columns is not None:
+        df = df[list(columns)]
+
+    # Nulls come back as NaN in miles, or as NULL_MEASURE in thousandths
+    scale = (pf.schema_arrow.metadata or {}).get(b'measure_scale')
+    if scale:
+        for column in (begin_msr, end_msr):
+            if column not in df:
+                continue
+            if fixed_measures:
+                df[column] = df[column].fillna(NULL_MEASURE).astype(np.int32)
+            else:
+                df[column] = df[column].astype('float64') / int(scale)
+    return df
+
+
+def write_table(df, path, **kwargs):
+    """ Writes an event table to Parquet/GeoParquet or CSV based on the file
+        extension of path.  Keyword arguments are passed to write_events(). """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        write_events(df, path, **kwargs)
+    elif extension == '.csv':
+        df.to_csv(path, index=False)
+    else:
+        raise ValueError(f'Unknown output format "{extension}".  Use .parquet or .csv')
+
+
+
+#===============================================================================
+# Example - Write an event table to Parquet and read back a single route
+#===============================================================================
+
+if __name__ == '__main__':
+    df = pd.read_csv(r'path\to\events.csv')
+    write_events(df, r'path\to\events.parquet')
+
+    i95 = read_route_events(r'path\to\events.parquet', 'R-VA   IS00095NB')
+    print(i95)
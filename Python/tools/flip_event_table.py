@@ -10,6 +10,15 @@
 # This was originally created for VTrans Mid-Term needs, which
 # requires input datasets to be directional, but often the input datasets are
 # only on the master rote in the prime direction.
+#
+# To draw an event table on the LRS outside of ArcGIS (eg on Linux), see
+# GeoPandas/route_events.py.
+#
+# If a route catalog has been saved with GeoPandas/route_catalog.py, pass its
+# path as route_catalog and the opposite routes are read from it rather than
+# from the overlap LRS, and D-TE routes are found with its PREFIX and STATE
+# columns.  The GeoPandas folder must be on the path for this (importing the
+# tools package adds it).
 #===============================================================================
 # Written for ArcGIS Pro in Python 3
 # By Dan Fourquet
@@ -20,6 +29,12 @@ import arcpy
 import pandas as pd
 import os
 
+# Stages are timed with misc/instrumentation.py.  Importing the tools package
+# adds the misc folder to the path.  When this script is run on its own, add
+# it first:
+#   sys.path.append(r'path\to\vdot-gis-cookbook\Python\misc')
+from instrumentation import Instrumentation
+
 def get_point_mp(inputPointGeometry, RouteGeom):
     """ Locates the MP value of an input point along the LRS
 
@@ -57,7 +72,8 @@ def get_point_mp(inputPointGeometry, RouteGeom):
         return None
 
 
-def flip_event_table(tbl_input, attribute_field, master_lrs, overlap_lrs, output_tbl_path, rte_nm='RTE_NM', begin_msr='BEGIN_MSR', end_msr='END_MSR', attribute_field_type='TEXT', export_both_directions=True):
+
+def flip_event_table(tbl_input, attribute_field, master_lrs, overlap_lrs, output_tbl_path, rte_nm='RTE_NM', begin_msr='BEGIN_MSR', end_msr='END_MSR', attribute_field_type='TEXT', export_both_directions=True, instrument=None, route_catalog=None):
     """ Description
 
     Input:
@@ -65,7 +81,9 @@ def flip_event_table(tbl_input, attribute_field, master_lrs, overlap_lrs, output
         attribute_field - the field in tbl_input to preserve 
         master_lrs - a reference to the lrs layer
         overlap_lrs - the lrs rte_nm that the polyline will be placed on
-        output_tbl_path - gdb path for output event table
+        output_tbl_path - gdb path for output event table.  If the path ends
+            with .parquet, the dissolved table is written to Parquet with
+            event_output.py (the tools folder must be on the path)
         rte_nm - the field name that contains the RTE_NM data from the LRS
         begin_msr - the field name that contains the from M-value
         end_msr - the field naem that contains the to M-value
@@ -73,40 +91,55 @@ def flip_event_table(tbl_input, attribute_field, master_lrs, overlap_lrs, output
         export_both_directions - *NOT YET IMPLEMENTED* both directions will be exported
             to the output event table.  If False, only opposite direction routes from
             the input will be exported
+        instrument - an optional Instrumentation object (see misc/instrumentation.py)
+            used to record the time, row count, and memory of each step
+        route_catalog - optional path to a route catalog (.parquet or .csv)
+            saved by GeoPandas/route_catalog.py.  If given, the opposite routes
+            and route types are read from the catalog instead of the overlap LRS
     Output:
         Event table with both directions included
     """
+    stage = instrument.stage if instrument else Instrumentation.null_stage
+
     arcpy.env.overwriteOutput = True
-    print('Create a copy of the input')
-    arcpy.TableToTable_conversion(tbl_input, 'memory', 'tbl_input')
-    tbl_input = 'memory//tbl_input'
+    with stage('Create a copy of the input') as s:
+        print('Create a copy of the input')
+        arcpy.TableToTable_conversion(tbl_input, 'memory', 'tbl_input')
+        tbl_input = 'memory//tbl_input'
+        if instrument:
+            s.rows = int(arcpy.GetCount_management(tbl_input)[0])
     
 
-    print('Create route event layer')
-    arcpy.lr.MakeRouteEventLayer(overlap_lrs, "RTE_NM", tbl_input, f"{rte_nm}; Line; {begin_msr}; {end_msr}", "tbl_input Events", None, "NO_ERROR_FIELD", "NO_ANGLE_FIELD", "NORMAL", "ANGLE", "LEFT", "POINT")
-    arcpy.conversion.FeatureClassToFeatureClass("tbl_input Events", 'memory', "tbl_input_events")
-    arcpy.Delete_management("tbl_input Events")
-    tbl_input_events = 'memory//tbl_input_events'
-
-
-    print('Input layer must not contain multipart geometry')
-    # Check for multipart geometry
-    isMultipart = False
-    with arcpy.da.SearchCursor(tbl_input_events, 'SHAPE@') as cur:
-        for row in cur:
-            if row[0] and row[0].isMultipart:
-                isMultipart = True
-                break
-    
-    if isMultipart:
-        print('    Multipart geometry found')
-        print('    Converting to single part')
-        tbl_input_events_singlepart = 'memory\\tbl_input_event_singlepart'
-        arcpy.MultipartToSinglepart_management(tbl_input_events, tbl_input_events_singlepart)
-        tbl_input_events = 'memory\\tbl_input_event_singlepart'
-        arcpy.Delete_management('memory\\tbl_input_events')
-    else:
-        print('    No multipart geometry found')
+    with stage('Create route event layer') as s:
+        print('Create route event layer')
+        arcpy.lr.MakeRouteEventLayer(overlap_lrs, "RTE_NM", tbl_input, f"{rte_nm}; Line; {begin_msr}; {end_msr}", "tbl_input Events", None, "NO_ERROR_FIELD", "NO_ANGLE_FIELD", "NORMAL", "ANGLE", "LEFT", "POINT")
+        arcpy.conversion.FeatureClassToFeatureClass("tbl_input Events", 'memory', "tbl_input_events")
+        arcpy.Delete_management("tbl_input Events")
+        tbl_input_events = 'memory//tbl_input_events'
+        if instrument:
+            s.rows = int(arcpy.GetCount_management(tbl_input_events)[0])
+
+
+    with stage('Check for multipart geometry') as s:
+        print('Input layer must not contain multipart geometry')
+        # Check for multipart geometry
+        isMultipart = False
+        with arcpy.da.SearchCursor(tbl_input_events, 'SHAPE@') as cur:
+            for row in cur:
+                s.rows += 1
+                if row[0] and row[0].isMultipart:
+                    isMultipart = True
+                    break
+        
+        if isMultipart:
+            print('    Multipart geometry found')
+            print('    Converting to single part')
+            tbl_input_events_singlepart = 'memory\\tbl_input_event_singlepart'
+            arcpy.MultipartToSinglepart_management(tbl_input_events, tbl_input_events_singlepart)
+            tbl_input_events = 'memory\\tbl_input_event_singlepart'
+            arcpy.Delete_management('memory\\tbl_input_events')
+        else:
+            print('    No multipart geometry found')
 
 
 
@@ -118,73 +151,113 @@ def flip_event_table(tbl_input, attribute_field, master_lrs, overlap_lrs, output
         
 
     print('Calculate new_rte_nm as opposite route from old rte_nm')
-    print('    Build opposite route dictionary')
-    opp_route_dict = {row[0]:row[1] for row in arcpy.da.SearchCursor(overlap_lrs, ['RTE_NM', 'RTE_OPPOSITE_DIRECTION_RTE_NM'])}
+    with stage('Build opposite route dictionary') as s:
+        print('    Build opposite route dictionary')
+        if route_catalog:
+            from route_catalog import load_route_catalog
+            catalog = load_route_catalog(route_catalog)
+            opposite = catalog.loc[catalog['OPPOSITE_RTE_NM'].notna()]
+            opp_route_dict = dict(zip(opposite['RTE_NM'], opposite['OPPOSITE_RTE_NM']))
+        else:
+            opp_route_dict = {row[0]:row[1] for row in arcpy.da.SearchCursor(overlap_lrs, ['RTE_NM', 'RTE_OPPOSITE_DIRECTION_RTE_NM'])}
+        s.rows = len(opp_route_dict)
     
-    print('    Calculate opposite route')
-    with arcpy.da.UpdateCursor(tbl_input_events, [rte_nm, 'NEW_RTE_NM']) as cur:
-        for row in cur:
-            new_rte_nm = opp_route_dict.get(row[0])
-            row[1] = new_rte_nm
-            cur.updateRow(row)
-
-
-    print('Prepare LRS')
-    print('    Identify required route names')
-    required_routes = set([row[0] for row in arcpy.da.SearchCursor(tbl_input_events, 'NEW_RTE_NM')])
-    
-    print('    Create route geometry dictionary')
-    route_geom_dict = {row[0]:row[1] for row in arcpy.da.SearchCursor(overlap_lrs, ['RTE_NM', 'SHAPE@']) if row[0] in required_routes}
-
-
-    print('Locate new begin and end measures based on old geometry')
-    with arcpy.da.UpdateCursor(tbl_input_events, ['SHAPE@', 'NEW_RTE_NM', 'NEW_BEGIN_MSR', 'NEW_END_MSR']) as cur:
-        for row in cur:
-            geom = row[0]
-            new_rte_nm = row[1]
-
-            firstPoint = arcpy.PointGeometry(geom.firstPoint)
-            lastPoint = arcpy.PointGeometry(geom.lastPoint)
-            lrs_geom = route_geom_dict.get(new_rte_nm)
-            if lrs_geom:
-                this_begin_msr = get_point_mp(firstPoint, lrs_geom)
-                this_end_msr = get_point_mp(lastPoint, lrs_geom)
-                row[2] = this_begin_msr
-                row[3] = this_end_msr
+    with stage('Calculate opposite route') as s:
+        print('    Calculate opposite route')
+        with arcpy.da.UpdateCursor(tbl_input_events, [rte_nm, 'NEW_RTE_NM']) as cur:
+            for row in cur:
+                new_rte_nm = opp_route_dict.get(row[0])
+                row[1] = new_rte_nm
                 cur.updateRow(row)
+                s.rows += 1
 
 
-    print('Create DataFrame with new data')
-    cols = [rte_nm, begin_msr, end_msr, 'NEW_RTE_NM', 'NEW_BEGIN_MSR', 'NEW_END_MSR', attribute_field]
-    print(cols)
-    df = pd.DataFrame([row for row in arcpy.da.SearchCursor(tbl_input_events, cols)], columns=cols)
-    df.rename(columns={rte_nm: 'RTE_NM', begin_msr: 'BEGIN_MSR', end_msr: 'END_MSR'}, inplace=True)
-    df_ori = df[['RTE_NM', 'BEGIN_MSR', 'END_MSR', attribute_field]]
-    df_flipped = df[['NEW_RTE_NM', 'NEW_BEGIN_MSR', 'NEW_END_MSR', attribute_field]]
-    df_flipped.rename(columns={'NEW_RTE_NM':'RTE_NM', 'NEW_BEGIN_MSR':'BEGIN_MSR', 'NEW_END_MSR':'END_MSR'}, inplace=True)
-    df_flipped = df_flipped.loc[df_flipped['RTE_NM'].notnull()]
-
-    df_merge = df_ori.merge(df_flipped, 'outer')
-    df_dte = df_merge.loc[df_merge['RTE_NM'].str.startswith('D-TE')].index
-    df_merge.drop(df_dte, inplace=True)
-
-
-    print('Create output table')
-    arcpy.CreateTable_management('memory', 'output_table')
-    arcpy.AddField_management('memory\\output_table', 'RTE_NM', 'TEXT')
-    arcpy.AddField_management('memory\\output_table', 'BEGIN_MSR', 'DOUBLE')
-    arcpy.AddField_management('memory\\output_table', 'END_MSR', 'DOUBLE')
-    arcpy.AddField_management('memory\\output_table', attribute_field, attribute_field_type)
-
-    output_table_records = df_merge.values.tolist()
-    print(output_table_records[:4])
-    with arcpy.da.InsertCursor('memory\\output_table', ['RTE_NM', 'BEGIN_MSR', 'END_MSR', attribute_field]) as cur:
-        for row in output_table_records:
-            cur.insertRow(row)
-
-    print('Dissolve table')
-    arcpy.lr.DissolveRouteEvents('memory\\output_table', f"RTE_NM; Line; BEGIN_MSR; END_MSR", attribute_field, output_tbl_path, f"RTE_NM; Line; BEGIN_MSR; END_MSR", "DISSOLVE", "INDEX")
-
+    print('Prepare LRS')
+    with stage('Create route geometry dictionary') as s:
+        print('    Identify required route names')
+        required_routes = set([row[0] for row in arcpy.da.SearchCursor(tbl_input_events, 'NEW_RTE_NM')])
+        
+        print('    Create route geometry dictionary')
+        route_geom_dict = {row[0]:row[1] for row in arcpy.da.SearchCursor(overlap_lrs, ['RTE_NM', 'SHAPE@']) if row[0] in required_routes}
+        s.rows = len(route_geom_dict)
+
+
+    with stage('Locate new begin and end measures') as s:
+        print('Locate new begin and end measures based on old geometry')
+        with arcpy.da.UpdateCursor(tbl_input_events, ['SHAPE@', 'NEW_RTE_NM', 'NEW_BEGIN_MSR', 'NEW_END_MSR']) as cur:
+            for row in cur:
+                s.rows += 1
+                geom = row[0]
+                new_rte_nm = row[1]
+
+                firstPoint = arcpy.PointGeometry(geom.firstPoint)
+                lastPoint = arcpy.PointGeometry(geom.lastPoint)
+                lrs_geom = route_geom_dict.get(new_rte_nm)
+                if lrs_geom:
+                    this_begin_msr = get_point_mp(firstPoint, lrs_geom)
+                    this_end_msr = get_point_mp(lastPoint, lrs_geom)
+                    row[2] = this_begin_msr
+                    row[3] = this_end_msr
+                    cur.updateRow(row)
+
+
+    with stage('Create DataFrame with new data') as s:
+        print('Create DataFrame with new data')
+        cols = [rte_nm, begin_msr, end_msr, 'NEW_RTE_NM', 'NEW_BEGIN_MSR', 'NEW_END_MSR', attribute_field]
+        print(cols)
+        df = pd.DataFrame([row for row in arcpy.da.SearchCursor(tbl_input_events, cols)], columns=cols)
+        df.rename(columns={rte_nm: 'RTE_NM', begin_msr: 'BEGIN_MSR', end_msr: 'END_MSR'}, inplace=True)
+        df_ori = df[['RTE_NM', 'BEGIN_MSR', 'END_MSR', attribute_field]]
+        df_flipped = df[['NEW_RTE_NM', 'NEW_BEGIN_MSR', 'NEW_END_MSR', attribute_field]]
+        df_flipped.rename(columns={'NEW_RTE_NM':'RTE_NM', 'NEW_BEGIN_MSR':'BEGIN_MSR', 'NEW_END_MSR':'END_MSR'}, inplace=True)
+        df_flipped = df_flipped.loc[df_flipped['RTE_NM'].notnull()]
+
+        df_merge = df_ori.merge(df_flipped, 'outer')
+        if route_catalog:
+            # The route types are already parsed in the catalog
+            route_types = df_merge[['RTE_NM']].merge(catalog[['RTE_NM', 'PREFIX', 'STATE']], 'left', on='RTE_NM')
+            is_dte = ((route_types['PREFIX'] == 'D') & (route_types['STATE'] == 'TE')).to_numpy()
+            df_merge = df_merge.loc[~is_dte]
+        else:
+            # Check each distinct RTE_NM once rather than every row
+            route_names = pd.Index(df_merge['RTE_NM'].dropna().unique())
+            dte_routes = route_names[route_names.str.startswith('D-TE')]
+            df_merge = df_merge.loc[~df_merge['RTE_NM'].isin(dte_routes)]
+        s.rows = len(df_merge)
+
+
+    with stage('Create output table') as s:
+        print('Create output table')
+        arcpy.CreateTable_management('memory', 'output_table')
+        arcpy.AddField_management('memory\\output_table', 'RTE_NM', 'TEXT')
+        arcpy.AddField_management('memory\\output_table', 'BEGIN_MSR', 'DOUBLE')
+        arcpy.AddField_management('memory\\output_table', 'END_MSR', 'DOUBLE')
+        arcpy.AddField_management('memory\\output_table', attribute_field, attribute_field_type)
+
+        output_table_records = df_merge.values.tolist()
+        print(output_table_records[:4])
+        with arcpy.da.InsertCursor('memory\\output_table', ['RTE_NM', 'BEGIN_MSR', 'END_MSR', attribute_field]) as cur:
+            for row in output_table_records:
+                cur.insertRow(row)
+                s.rows += 1
+
+    with stage('Dissolve table') as s:
+        print('Dissolve table')
+        parquetPath = output_tbl_path if output_tbl_path.lower().endswith('.parquet') else None
+        if parquetPath:
+            output_tbl_path = 'memory\\output_dissolve'
+        arcpy.lr.DissolveRouteEvents('memory\\output_table', f"RTE_NM; Line; BEGIN_MSR; END_MSR", attribute_field, output_tbl_path, f"RTE_NM; Line; BEGIN_MSR; END_MSR", "DISSOLVE", "INDEX")
+        if instrument:
+            s.rows = int(arcpy.GetCount_management(output_tbl_path)[0])
+
+    if parquetPath:
+        with stage('Write Parquet') as s:
+            print('Write Parquet')
+            from event_output import write_events
+            fields = ['RTE_NM', 'BEGIN_MSR', 'END_MSR', attribute_field]
+            df_output = pd.DataFrame(arcpy.da.TableToNumPyArray(output_tbl_path, fields, null_value={'BEGIN_MSR': float('nan'), 'END_MSR': float('nan')}))
+            write_events(df_output, parquetPath)
+            s.rows = len(df_output)
 
 
 if __name__ == '__main__':
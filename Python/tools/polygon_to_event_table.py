@@ -1,30 +1,61 @@
 import arcpy
+import os
 
-def polygon_to_event_csv(lrs, input_polygon, output_path, output_filename):
+# Stages are timed with misc/instrumentation.py.  Importing the tools package
+# adds the misc folder to the path.  When this script is run on its own, add
+# it first:
+#   sys.path.append(r'path\to\vdot-gis-cookbook\Python\misc')
+from instrumentation import Instrumentation
+
+
+def polygon_to_event_csv(lrs, input_polygon, output_path, output_filename, instrument=None):
     """ Given an input polygon feature class, this function
-        will return an event table """
+        will return an event table.  To split the work across every core,
+        see polygon_to_events() in GeoPandas/parallel_overlay.py
+
+        output_filename - the name of the output table.  If it ends with
+            .parquet, the table is written to Parquet with event_output.py
+            (the tools folder must be on the path).  Otherwise it is written
+            to CSV
+
+        instrument - an optional Instrumentation object (see
+            misc/instrumentation.py) used to time each step """
+    stage = instrument.stage if instrument else Instrumentation.null_stage
 
     # Clip lrs by input_polygon
-    arcpy.Clip_analysis(lrs, input_polygon, 'memory/lrs_clip')
+    with stage('Clip LRS') as s:
+        arcpy.Clip_analysis(lrs, input_polygon, 'memory/lrs_clip')
+        if instrument:
+            s.rows = int(arcpy.GetCount_management('memory/lrs_clip')[0])
 
     # Remove multipart geometries
-    arcpy.MultipartToSinglepart_management('memory/lrs_clip', 'memory/lrs_clip_explode')
+    with stage('Multipart to singlepart') as s:
+        arcpy.MultipartToSinglepart_management('memory/lrs_clip', 'memory/lrs_clip_explode')
+        if instrument:
+            s.rows = int(arcpy.GetCount_management('memory/lrs_clip_explode')[0])
 
     # Identify begin/end points
-    arcpy.AddField_management('memory/lrs_clip_explode', 'BEGIN_MSR', 'DOUBLE')
-    arcpy.AddField_management('memory/lrs_clip_explode', 'END_MSR', 'DOUBLE')
-    with arcpy.da.UpdateCursor('memory/lrs_clip_explode', ['BEGIN_MSR','END_MSR', 'SHAPE@']) as cur:
-        for row in cur:
-            geom = row[-1]
-            begin_msr = geom.firstPoint.M
-            end_msr = geom.lastPoint.M
-            row[0] = begin_msr
-            row[1] = end_msr
-            cur.updateRow(row)
+    with stage('Identify begin and end measures') as s:
+        arcpy.AddField_management('memory/lrs_clip_explode', 'BEGIN_MSR', 'DOUBLE')
+        arcpy.AddField_management('memory/lrs_clip_explode', 'END_MSR', 'DOUBLE')
+        with arcpy.da.UpdateCursor('memory/lrs_clip_explode', ['BEGIN_MSR','END_MSR', 'SHAPE@']) as cur:
+            for row in cur:
+                geom = row[-1]
+                begin_msr = geom.firstPoint.M
+                end_msr = geom.lastPoint.M
+                row[0] = begin_msr
+                row[1] = end_msr
+                cur.updateRow(row)
+                s.rows += 1
 
     # Export event table to csv
-    import pandas as pd
-    import os
-    data = [(row[0], row[1], row[2]) for row in arcpy.da.SearchCursor('memory/lrs_clip_explode', ['RTE_NM','BEGIN_MSR','END_MSR'])]
-    df = pd.DataFrame(data, columns=(['RTE_NM','BEGIN_MSR','END_MSR']))
-    df.to_csv(os.path.join(output_path, output_filename), index=False)
\ No newline at end of file
+    with stage('Export event table') as s:
+        import pandas as pd
+        data = [(row[0], row[1], row[2]) for row in arcpy.da.SearchCursor('memory/lrs_clip_explode', ['RTE_NM','BEGIN_MSR','END_MSR'])]
+        df = pd.DataFrame(data, columns=(['RTE_NM','BEGIN_MSR','END_MSR']))
+        if output_filename.lower().endswith('.parquet'):
+            from event_output import write_events
+            write_events(df, os.path.join(output_path, output_filename))
+        else:
+            df.to_csv(os.path.join(output_path, output_filename), index=False)
+        s.rows = len(df)
@@ -1,6 +1,19 @@
 import arcpy
+import logging
 
-def get_line_mp(inputPolyline, lrs, rte_nm, check_for_multipart=False):
+# Layers are looked up through the shared registry in
+# ProFunctions/layer_registry.py.  Importing the tools package adds it to the
+# path.  When this script is run on its own, add it first:
+#   sys.path.append(r'path\to\vdot-gis-cookbook\Python\ProFunctions')
+from layer_registry import get_layer
+
+
+# Each row is logged at the DEBUG level.  For large tables, use
+# setup_queue_logging() in misc/logging_setup.py so that the messages are
+# written on a background thread and sampled.
+log = logging.getLogger(__name__)
+
+def get_line_mp(inputPolyline, lrs, rte_nm, check_for_multipart=False, route_handling=None):
     """ Locates the begin and end MP values of an input line along the LRS
         ** The spatial reference of the input must match the spatial reference
            of the lrs! **
@@ -8,10 +21,20 @@ def get_line_mp(inputPolyline, lrs, rte_nm, check_for_multipart=False):
         inputPolyline - an arcpy Polyline object
         lrs - a reference to the lrs layer
         rte_nm - the lrs rte_nm that the polyline will be placed on
+        check_for_multipart - if True, the closest part of a multipart route
+            is used
+        route_handling - optional {rte_nm: handling} dictionary from
+            GeoPandas/lrs_integrity.py.  Routes marked 'unsafe' are skipped
+            and routes marked 'closest_part' use the closest part
     Output:
         (beginMP, endMP)
     """
 
+    handling = route_handling.get(rte_nm, 'simple') if route_handling else 'simple'
+    if handling == 'unsafe':
+        log.warning('Route "%s" has m-value issues in the integrity report - measures not located', rte_nm)
+        return None, None
+
     try:
         # Get the geometry for the LRS route
         RouteGeom = None
@@ -27,7 +50,7 @@ def get_line_mp(inputPolyline, lrs, rte_nm, check_for_multipart=False):
 
         # Check for multipart geometry.  If multipart, find closest part to
         # ensure that the correct MP is returned
-        if check_for_multipart and RouteGeom.isMultipart:
+        if (check_for_multipart or handling == 'closest_part') and RouteGeom.isMultipart:
             # Get list of parts
             parts = [arcpy.Polyline(RouteGeom[i], has_m=True) for i in range(RouteGeom.partCount)]
 
@@ -38,7 +61,7 @@ def get_line_mp(inputPolyline, lrs, rte_nm, check_for_multipart=False):
             partDists = {midPoint.distanceTo(part):part for part in parts}
 
             # Replace RouteGeom with closest polyline part
-        #     RouteGeom = partDists[min(partDists)]
+            RouteGeom = partDists[min(partDists)]
 
         def get_mp_from_point(route, point):
             """ Returns the m-value along the input route geometry
@@ -61,28 +84,39 @@ def get_line_mp(inputPolyline, lrs, rte_nm, check_for_multipart=False):
         return None, None
 
         
-def update_line_events_known_rte_nm(layer, lrs, rte_nm_field, begin_msr_update, end_msr_update):
+def update_line_events_known_rte_nm(layer, lrs, rte_nm_field, begin_msr_update, end_msr_update, route_handling=None):
     """ Updates the input layer with updated measures based on the input lrs.
         the measures will be updated in the begin_msr_update and end_msr_update
         fields
     
         The input layer and lrs must be in the same projection.
-    """
 
-    def get_layer(name):
-        prj = arcpy.mp.ArcGISProject("CURRENT")
-        map = prj.listMaps()[0]
-        layer = map.listLayers(name)[0]
-        return layer
+        route_handling is an optional {rte_nm: handling} dictionary from
+        GeoPandas/lrs_integrity.py (eg load_route_handling(reportPath))
+    """
 
-    if type(layer) == str:
-        layer = get_layer(layer)
-    if type(lrs) == str:
-        lrs = get_layer(lrs)
+    layer = get_layer(layer)
+    lrs = get_layer(lrs)
 
+    debug = log.isEnabledFor(logging.DEBUG)
+    rowCount = 0
+    skipCount = 0
     with arcpy.da.UpdateCursor(layer, [rte_nm_field, begin_msr_update, end_msr_update, 'SHAPE@']) as cur:
         for row in cur:
-            begin_msr, end_msr = get_line_mp(row[-1], lrs, row[0])
+            begin_msr, end_msr = get_line_mp(row[-1], lrs, row[0], route_handling=route_handling)
+
+            # Unsafe routes and lines that couldn't be located keep their
+            # existing measures
+            if begin_msr is None and end_msr is None:
+                log.warning('%s: measures not found, keeping %s, %s', row[0], row[1], row[2])
+                skipCount += 1
+                continue
+
+            if debug:
+                log.debug('%s: %s => %s, %s => %s', row[0], row[1], begin_msr, row[2], end_msr)
             row[1] = begin_msr
             row[2] = end_msr
             cur.updateRow(row)
+            rowCount += 1
+
+    log.info('Updated measures for %s rows, skipped %s rows', rowCount, skipCount)